@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: nivel anuncio con una consulta síncrona por día vs reportes asíncronos.
+
+Usa la API sintética (synthetic_meta.py) con un reloj falso: la latencia por
+página y la duración de los jobs avanzan el reloj sin esperas reales. Compara
+los segundos simulados de un backfill (el comportamiento de AsyncReportRunner
+se verifica en tests/test_async_reports.py).
+
+Uso:
+    python benchmarks/bench_async_reports.py --days 90 --ads 5
+"""
+
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from async_reports import AsyncReportRunner
+from backfill import day_span
+from extraction_engine import run_windows
+from insights_planner import InsightsPlanner
+from synthetic_meta import SyntheticMeta
+
+DAY = date(2026, 1, 1)
+FIELDS = ['ad_id', 'campaign_id', 'impressions', 'video_play_actions']
+PARAMS = {'level': 'ad', 'time_increment': 1}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        self.slept += seconds
+
+
+def window(account, offset, days=1):
+    since = DAY + timedelta(days=offset)
+    return (account, account[-3:], since, since + timedelta(days=days - 1))
+
+
+def runner(client, clock, **kw):
+    kw.setdefault('poll_interval', 5.0)
+    return AsyncReportRunner(client, FIELDS, PARAMS, clock=clock, sleep=clock.sleep, **kw)
+
+
+def simulate(mode, args):
+    """Segundos simulados de un backfill nivel anuncio de args.days días para 2 cuentas."""
+    clock = FakeClock()
+    client = SyntheticMeta(campaigns=args.campaigns, ads=args.ads, latency_s=args.latency_s,
+                           page_size=args.page_size, job_latency_s=args.job_latency_s,
+                           clock=clock, sleep=clock.sleep)
+    accounts = ['act_1', 'act_2']
+    if mode == 'síncrono':
+        # Una consulta por cuenta y día, de a una (el reloj falso no es seguro entre hilos)
+        planner = InsightsPlanner(client, FIELDS, PARAMS)
+        windows = [(a, a, d, d) for a in accounts for d in sorted(day_span(DAY, DAY + timedelta(days=args.days - 1)))]
+        rows = sum(len(r) for _, r, _ in run_windows(planner.fetch_range, windows, max_workers=1))
+        return clock.now, rows, planner.requests_made
+    windows = [window(a, 0, days=args.days) for a in accounts]
+    r = runner(client, clock, max_in_flight=4)
+    rows = sum(len(list(rows)) for _, rows, _ in r.run(windows))
+    return clock.now, rows, r.jobs_submitted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--campaigns", type=int, default=20)
+    parser.add_argument("--ads", type=int, default=5)
+    parser.add_argument("--page-size", type=int, default=25)
+    parser.add_argument("--latency-s", type=float, default=0.8, help="segundos por página de la consulta síncrona")
+    parser.add_argument("--job-latency-s", type=float, default=120.0, help="segundos hasta que termina un job")
+    args = parser.parse_args()
+
+    print(f"Backfill de {args.days} días, 2 cuentas x {args.campaigns} campañas x {args.ads} anuncios "
+          f"(páginas de {args.page_size}, {args.latency_s} s por página, jobs de {args.job_latency_s:.0f} s)")
+    print(f"{'modo':<12}{'segundos':>10}{'filas':>10}{'requests':>10}")
+    for mode in ('síncrono', 'asíncrono'):
+        seconds, rows, requests = simulate(mode, args)
+        print(f"{mode:<12}{seconds:>10.0f}{rows:>10,}{requests:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: tablas del reporte semanal por posición (una semana a la vez) vs
+comparaciones WoW / MoM / YoY de todas las semanas en una pasada.
+
+Las funciones legacy_* son las que estaban en a01.py (offsets 1/4/52 sobre
+df.iloc). Sobre semanas completas las tablas deben coincidir para todas las
+semanas; luego se elimina una semana y se muestra que la versión por posición
+compara contra otra semana mientras que la de calendario deja la celda vacía.
+
+Uso:
+    python benchmarks/bench_comparisons.py --campaigns 100 --days 1826
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import numpy as np
+import pandas as pd
+
+from comparisons import tabla_valores, tabla_variaciones, weekly_comparisons, weekly_frame
+from rollups import aggregate
+from synthetic_payloads import synthetic_campaign_1d
+from weekly import preparar_weekly_rollup
+
+
+def _legacy_rows(dfw, map_period, periodo_label):
+    if periodo_label not in map_period.index:
+        raise KeyError(f"Periodo '{periodo_label}' no encontrado.")
+    semana_inicio = pd.to_datetime(map_period.loc[periodo_label])
+    df = dfw.copy().sort_index()
+    df.index = pd.to_datetime(df.index)
+    idx = df.index.get_loc(semana_inicio)
+
+    def fila(idx_offset):
+        pos = idx - idx_offset
+        if 0 <= pos < len(df):
+            return df.iloc[pos]
+        return pd.Series({c: np.nan for c in df.columns})
+
+    metricas = ['spend', 'messaging_started', 'cpl', 'ctr', 'unique_link_clicks_ctr']
+    return metricas, [fila(o)[metricas].astype(float) for o in (0, 1, 4, 52)]
+
+
+def _safe_div(a, b):
+    if pd.isna(a) or pd.isna(b) or float(b) == 0.0:
+        return np.nan
+    return float(a) / float(b)
+
+
+def _change_pct(a, b):
+    if pd.isna(a) or pd.isna(b) or float(b) == 0.0:
+        return np.nan
+    return np.round((float(a) - float(b)) / float(b) * 100, 2)
+
+
+def legacy_pct(dfw, map_period, periodo_label):
+    metricas, (fa, pw, pm, py) = _legacy_rows(dfw, map_period, periodo_label)
+    resumen = pd.DataFrame({
+        "Métrica": metricas,
+        "Semana Actual": [float(fa[m]) for m in metricas],
+        "Cambio vs Semana Anterior (%)": [_change_pct(fa[m], pw[m]) for m in metricas],
+        "Cambio vs Misma Semana Mes Anterior (%)": [_change_pct(fa[m], pm[m]) for m in metricas],
+        "Cambio vs Misma Semana Año Anterior (%)": [_change_pct(fa[m], py[m]) for m in metricas],
+    })
+    r = [_safe_div(x['ctr'], x['unique_link_clicks_ctr']) for x in (fa, pw, pm, py)]
+    ratio_row = {
+        'Métrica': 'CTR (todos / links)',
+        'Semana Actual': np.round(r[0], 2) if not pd.isna(r[0]) else np.nan,
+        'Cambio vs Semana Anterior (%)': _change_pct(r[0], r[1]),
+        'Cambio vs Misma Semana Mes Anterior (%)': _change_pct(r[0], r[2]),
+        'Cambio vs Misma Semana Año Anterior (%)': _change_pct(r[0], r[3]),
+    }
+    return pd.concat([resumen, pd.DataFrame([ratio_row])], ignore_index=True)
+
+
+def legacy_valores(dfw, map_period, periodo_label):
+    metricas, (fa, pw, pm, py) = _legacy_rows(dfw, map_period, periodo_label)
+    resumen = pd.DataFrame({
+        'Métrica': metricas,
+        'Semana Actual': fa.values,
+        'Semana Anterior': pw.values,
+        'Misma Semana Mes Anterior': pm.values,
+        'Misma Semana Año Anterior': py.values,
+    })
+    r = [_safe_div(x['ctr'], x['unique_link_clicks_ctr']) for x in (fa, pw, pm, py)]
+    ratio_row = {
+        'Métrica': 'CTR (todos / links)',
+        'Semana Actual': np.round(r[0], 4) if not pd.isna(r[0]) else np.nan,
+        'Semana Anterior': np.round(r[1], 4) if not pd.isna(r[1]) else np.nan,
+        'Misma Semana Mes Anterior': np.round(r[2], 4) if not pd.isna(r[2]) else np.nan,
+        'Misma Semana Año Anterior': np.round(r[3], 4) if not pd.isna(r[3]) else np.nan,
+    }
+    return pd.concat([resumen, pd.DataFrame([ratio_row])], ignore_index=True)
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=3)
+    parser.add_argument("--campaigns", type=int, default=100)
+    parser.add_argument("--days", type=int, default=1826)
+    args = parser.parse_args()
+
+    df = synthetic_campaign_1d(args.accounts, args.campaigns, args.days)
+    cube = aggregate(df, 'week', 'account')
+    dfw, map_period = preparar_weekly_rollup(cube)
+    print(f"Semanas: {len(dfw)} ({args.accounts} cuentas, {len(cube)} filas en el cubo)")
+
+    def legacy_all():
+        return {p: (legacy_pct(dfw, map_period, p), legacy_valores(dfw, map_period, p))
+                for p in map_period.index}
+
+    def engine_all():
+        comp = weekly_comparisons(dfw)
+        return {p: (tabla_variaciones(comp, w), tabla_valores(comp, w)) for p, w in map_period.items()}
+
+    t_legacy, out_legacy = timed(legacy_all)
+    t_engine, out_engine = timed(engine_all)
+    t_pass, comp = timed(lambda: weekly_comparisons(dfw))
+    for p in map_period.index:
+        for a, b in zip(out_legacy[p], out_engine[p]):
+            pd.testing.assert_frame_equal(a, b, check_dtype=False)
+    print(f"{len(map_period)} periodos: tablas idénticas a la versión por posición")
+
+    t_acc, comp_acc = timed(lambda: weekly_comparisons(weekly_frame(cube, by=['account_id']), by=['account_id']))
+    print(f"Por cuenta: {len(comp_acc):,} filas (semana x cuenta x métrica) en {t_acc:.3f}s")
+
+    # Semana faltante: la versión por posición se corre una semana
+    semanas = dfw.index.sort_values()
+    hueco, actual = semanas[-10], semanas[-9]
+    con_hueco = dfw.drop(index=hueco)
+    periodo = con_hueco.loc[actual, 'period']
+    vieja = legacy_valores(con_hueco, map_period, periodo).loc[0, 'Semana Anterior']
+    nueva = tabla_valores(weekly_comparisons(con_hueco), actual).loc[0, 'Semana Anterior']
+    print(f"Sin la semana {hueco.date()}: 'Semana Anterior' de spend por posición = {vieja:,.2f} "
+          f"(semana {semanas[-11].date()}), por calendario = {nueva}")
+
+    print(f"{'versión':<30}{'segundos':>10}")
+    print(f"{'por posición (todas)':<30}{t_legacy:>10.3f}")
+    print(f"{'una pasada + cortes (todas)':<30}{t_engine:>10.3f}")
+    print(f"{'solo la pasada':<30}{t_pass:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark: aplanado de actions fila por fila vs por chunk.
+
+Compara parse_campaign_row / parse_ad_row (bucles por fila con try/except por
+valor) contra flatten_campaign_chunk / flatten_ad_chunk sobre el mismo chunk
+sintético, y verifica que ambos produzcan las mismas columnas. Los dos modos
+se alternan en cada repetición (con gc.collect() antes de cada una) y se
+informa la mediana, porque el orden y el GC mueven los tiempos más que la
+diferencia a nivel campaña. Referencia con 100k filas: campaña ~1.1x, anuncio
+~1.7x.
+
+Uso:
+    python benchmarks/bench_flatten_actions.py --rows 200000
+"""
+
+import argparse
+import gc
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import pandas as pd
+
+from flatten_actions import flatten_ad_chunk, flatten_campaign_chunk
+from record_stream import AD_SCHEMA, CAMPAIGN_SCHEMA
+from row_parsers import ColumnBuffer, parse_ad_row, parse_campaign_row
+from synthetic_payloads import synthetic_ad_rows, synthetic_campaign_rows
+
+
+def timed(fns, repeat):
+    """Mediana de segundos y último resultado de cada fn, alternándolas en cada repetición."""
+    times = [[] for _ in fns]
+    outs = [None] * len(fns)
+    for _ in range(repeat):
+        for k, fn in enumerate(fns):
+            gc.collect()
+            t0 = time.perf_counter()
+            outs[k] = fn()
+            times[k].append(time.perf_counter() - t0)
+    return [statistics.median(t) for t in times], outs
+
+
+def loop_frame(schema, parse, rows):
+    buf = ColumnBuffer(schema, chunk_size=len(rows) + 1)
+    buf.extend(rows, parse, "tla")
+    return buf.to_frame()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cases = [
+        ("campaña", CAMPAIGN_SCHEMA, parse_campaign_row, flatten_campaign_chunk,
+         list(synthetic_campaign_rows(args.rows))),
+        ("anuncio", AD_SCHEMA, parse_ad_row, flatten_ad_chunk,
+         list(synthetic_ad_rows(args.rows))),
+    ]
+
+    print(f"Filas por chunk: {args.rows:,} (mediana de {args.repeat})")
+    print(f"{'nivel':<10}{'bucle s':>10}{'por chunk s':>15}{'speedup':>10}")
+    for name, schema, parse, flatten, rows in cases:
+        (t_loop, t_vec), (df_loop, df_vec) = timed(
+            [lambda: loop_frame(schema, parse, rows), lambda: flatten(["tla"] * len(rows), rows)], args.repeat)
+        pd.testing.assert_frame_equal(df_loop, df_vec, check_dtype=False)
+        print(f"{name:<10}{t_loop:>10.3f}{t_vec:>15.3f}{t_loop / t_vec:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de punta a punta: a01.py contra la API sintética (synthetic_meta.py).
+
+Por cada tamaño (campañas x anuncios x días de histórico) arma una carpeta
+temporal con campaign_1d sintético hasta hace --extract-days días, lo migra al
+store (como una instalación existente) y corre a01.py --force con META_SYNTHETIC (sin
+credenciales ni SDK). Los tiempos salen de las métricas de la corrida
+(run_metrics.py): extracción de campañas y anuncios, merge de campaign_1d,
+rollups, reporte semanal, transformación para Power BI y Excel. Las etapas que
+fallan (p. ej. Excel sin xlsxwriter) se informan con su estado.
+
+Con --save agrega cada resultado a un JSONL y lo compara con la última corrida
+guardada del mismo tamaño: marca las etapas que tardan más de --tolerance.
+
+Uso:
+    python benchmarks/bench_pipeline.py --sizes 20x2x180,50x3x365,100x4x730 \\
+        --save benchmarks/results/pipeline.jsonl
+"""
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS = os.path.join(HERE, "..", "scripts")
+A01 = os.path.join(SCRIPTS, "a01.py")
+sys.path.insert(0, SCRIPTS)
+
+from storage import DatasetStore
+from synthetic_payloads import synthetic_campaign_1d
+
+# Mismas cuentas que account_map en a01.py (cuenta0 / cuenta1 del generador)
+ACCOUNT_LABELS = {'cuenta0': 'tla', 'cuenta1': 'illapa'}
+STAGES = ['extract_campaign', 'extract_ads', 'rollups', 'weekly_report', 'powerbi_transform', 'excel_export']
+
+
+def parse_size(text):
+    campaigns, ads, days = (int(x) for x in text.lower().split('x'))
+    return {'size': text, 'campaigns': campaigns, 'ads': ads, 'history_days': days}
+
+
+def seed_history(base, size, extract_days):
+    """campaign_1d sintético que termina extract_days días antes de ayer."""
+    end = date.today() - timedelta(days=1 + extract_days)
+    start = end - timedelta(days=size['history_days'] - 1)
+    df = synthetic_campaign_1d(len(ACCOUNT_LABELS), size['campaigns'], size['history_days'], start=start.isoformat())
+    df['account_id'] = df['account_id'].map(ACCOUNT_LABELS)
+    path = os.path.join(base, "datasets", "data", "campaign_1d")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_csv(path, index=False, encoding='utf-8-sig')
+    # Misma migración que hace a01.py en su primera extracción (STORAGE_BACKEND='parquet')
+    DatasetStore(path + "_store", 'account_id', 'date', keys=['account_id', 'date', 'campaign_id'],
+                 text_cols=['campaign_id', 'campaign_name'], backend='parquet').import_csv(path)
+    return len(df)
+
+
+def run_a01(base, args, spec, *extra):
+    env = dict(os.environ, META_BASE_DIR=base, META_SYNTHETIC=json.dumps(spec), PYTHONIOENCODING='utf-8')
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, A01, *extra], env=env, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.DEVNULL)
+    return time.perf_counter() - t0, proc.returncode
+
+
+def read_metrics(base):
+    paths = sorted(glob.glob(os.path.join(base, "logs", "*.metrics.jsonl")))
+    with open(paths[-1], encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def measure(size, args):
+    """Una corrida completa en una carpeta nueva; devuelve el resultado."""
+    spec = {'campaigns': size['campaigns'], 'ads': size['ads'], 'seed': args.seed,
+            'latency_s': args.latency_ms / 1000, 'page_size': args.page_size}
+    with tempfile.TemporaryDirectory() as base:
+        rows = seed_history(base, size, args.extract_days)
+        wall, code = run_a01(base, args, spec, '--force')
+        events = read_metrics(base)
+
+    stages = {e['stage']: {'status': e['status'], 'seconds': e['seconds']}
+              for e in events if e['kind'] == 'stage'}
+    calls = [e for e in events if e['kind'] == 'api_call']
+    merge = [e['seconds'] for e in events if e['kind'] == 'step' and e.get('step') == 'merge']
+    rss = [e['peak_rss_mb'] for e in events if e['kind'] == 'stage' and e.get('peak_rss_mb')]
+    return {
+        'rows_history': rows,
+        'wall_s': round(wall, 3),
+        'exit_code': code,
+        'stages': stages,
+        'merge_s': merge[0] if merge else None,
+        'api_calls': len(calls),
+        'api_rows': sum(e['rows'] for e in calls),
+        'peak_rss_mb': max(rss) if rss else None,
+    }
+
+
+def median_result(results):
+    """Mediana de los segundos de varias corridas (estados y conteos de la primera)."""
+    out = dict(results[0])
+    out['wall_s'] = round(statistics.median(r['wall_s'] for r in results), 3)
+    merges = [r['merge_s'] for r in results if r['merge_s'] is not None]
+    out['merge_s'] = round(statistics.median(merges), 3) if merges else None
+    out['stages'] = {
+        name: {'status': st['status'],
+               'seconds': round(statistics.median(r['stages'][name]['seconds'] for r in results
+                                                  if name in r['stages']), 3)}
+        for name, st in results[0]['stages'].items()
+    }
+    return out
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def previous_results(path, result):
+    """Última corrida guardada comparable (mismo tamaño y parámetros)."""
+    if not path or not os.path.exists(path):
+        return None
+    key = ('size', 'extract_days', 'latency_ms', 'page_size')
+    last = None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                r = json.loads(line)
+            except ValueError:
+                continue
+            if all(r.get(k) == result[k] for k in key):
+                last = r
+    return last
+
+
+def print_result(result, previous, tolerance):
+    print(f"\n=== {result['size']} (campañas x anuncios x días): {result['rows_history']:,} filas de histórico ===")
+    print(f"{'etapa':<22}{'estado':<18}{'segundos':>10}{'anterior':>10}{'cambio':>9}")
+    regressions = []
+    rows = [(n, result['stages'].get(n)) for n in STAGES] + [('merge (campaign_1d)', None), ('proceso completo', None)]
+    for name, st in rows:
+        if name == 'merge (campaign_1d)':
+            status, seconds, prev = '-', result['merge_s'], previous and previous.get('merge_s')
+        elif name == 'proceso completo':
+            status, seconds, prev = f"exit {result['exit_code']}", result['wall_s'], previous and previous.get('wall_s')
+        elif st is None:
+            print(f"{name:<22}{'sin datos':<18}")
+            continue
+        else:
+            status, seconds = st['status'], st['seconds']
+            prev = previous and previous.get('stages', {}).get(name, {}).get('seconds')
+        if seconds is None:
+            print(f"{name:<22}{status:<18}{'-':>10}")
+            continue
+        change = ''
+        if prev:
+            ratio = seconds / prev - 1
+            change = f"{ratio:+.0%}"
+            # Regresión: más lento que la tolerancia y al menos 0.2 s más
+            if ratio > tolerance and seconds - prev > 0.2:
+                change += ' ⚠'
+                regressions.append(name)
+        print(f"{name:<22}{status:<18}{seconds:>10.2f}{(f'{prev:.2f}' if prev else '-'):>10}{change:>9}")
+    print(f"Llamadas a la API: {result['api_calls']} ({result['api_rows']:,} filas). "
+          f"Pico RSS: {result['peak_rss_mb'] or '-'} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="20x2x180,50x3x365",
+                        help="tamaños campañas x anuncios x días de histórico, separados por coma")
+    parser.add_argument("--extract-days", type=int, default=7, help="días nuevos que extrae la corrida")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="latencia por página de la API sintética")
+    parser.add_argument("--page-size", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="aumento relativo que cuenta como regresión")
+    parser.add_argument("--save", help="JSONL donde agregar los resultados")
+    args = parser.parse_args()
+
+    regressions = []
+    for text in args.sizes.split(','):
+        size = parse_size(text.strip())
+        result = median_result([measure(size, args) for _ in range(args.repeat)])
+        result = {'timestamp': datetime.now().isoformat(timespec='seconds'), 'commit': git_commit(), **size,
+                  'extract_days': args.extract_days, 'latency_ms': args.latency_ms,
+                  'page_size': args.page_size, 'repeat': args.repeat, **result}
+        previous = previous_results(args.save, result)
+        regressions += [f"{size['size']}: {n}" for n in print_result(result, previous, args.tolerance)]
+        if args.save:
+            os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+            with open(args.save, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    if args.save:
+        print(f"\nResultados agregados a {args.save}")
+    if regressions:
+        print(f"Posibles regresiones (>{args.tolerance:.0%}): {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
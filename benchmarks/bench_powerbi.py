@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: primera_tabla con tipos object / date vs tipos compactos.
+
+Arma primera_tabla como lo hacía transformar_para_powerbi (fechas como objetos
+date, texto object) y la versión compacta de powerbi_frame. Verifica que el
+CSV exportado sea idéntico byte a byte y compara memoria (memory_usage con
+deep=True) y tamaño en disco de CSV vs Parquet.
+
+Uso:
+    python benchmarks/bench_powerbi.py --campaigns 200 --days 1095
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import pandas as pd
+
+from powerbi_frame import compact_powerbi_frame, memory_report
+from synthetic_payloads import synthetic_campaign_1d
+
+REQUIRED_COLS = [
+    'account', 'date_start', 'date_stop', 'campaign_id', 'campaign_name', 'spend',
+    'impressions', 'reach', 'video_25pct', 'clicks_all', 'link_clicks', 'ctr',
+    'unique_link_clicks_ctr', 'first_replies', 'two_way_conversations',
+]
+
+
+def base_frame(df, legacy):
+    df = df.copy()
+    df['date_start'] = pd.to_datetime(df['date'], errors='coerce')
+    if legacy:
+        df['date_start'] = df['date_start'].dt.date
+    df['date_stop'] = df['date_start']
+    df = df.rename(columns={'messaging_started': 'first_replies', 'account_id': 'account'})
+    out = df[REQUIRED_COLS].copy()
+    out['account'] = out['account'].replace('illapa', 'illa')
+    return out
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=2)
+    parser.add_argument("--campaigns", type=int, default=200)
+    parser.add_argument("--days", type=int, default=1095)
+    args = parser.parse_args()
+
+    df = synthetic_campaign_1d(args.accounts, args.campaigns, args.days)
+    print(f"Filas: {len(df):,}")
+
+    t_legacy, legacy = timed(lambda: base_frame(df, legacy=True))
+    t_new, compact = timed(lambda: compact_powerbi_frame(base_frame(df, legacy=False)))
+    memory_report(legacy, compact, title="primera_tabla: original vs compacta")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {k: os.path.join(tmp, f"{k}.csv") for k in ('legacy', 'compact')}
+        t_csv_legacy, _ = timed(lambda: legacy.to_csv(paths['legacy'], index=False, encoding='utf-8-sig',
+                                                      date_format='%Y-%m-%d'))
+        t_csv_new, _ = timed(lambda: compact.to_csv(paths['compact'], index=False, encoding='utf-8-sig',
+                                                    date_format='%Y-%m-%d'))
+        with open(paths['legacy'], 'rb') as a, open(paths['compact'], 'rb') as b:
+            assert a.read() == b.read(), "el CSV cambió"
+        print("\nCSV idéntico byte a byte")
+
+        parquet = os.path.join(tmp, "powerbi_ready.parquet")
+        t_pq, _ = timed(lambda: compact.to_parquet(parquet, index=False))
+        back = pd.read_parquet(parquet)
+        pd.testing.assert_frame_equal(back, compact, check_dtype=False, check_categorical=False)
+        csv_mb = os.path.getsize(paths['compact']) / 1024 / 1024
+        pq_mb = os.path.getsize(parquet) / 1024 / 1024
+
+    print(f"{'paso':<30}{'segundos':>10}")
+    print(f"{'armar tabla (original)':<30}{t_legacy:>10.2f}")
+    print(f"{'armar tabla (compacta)':<30}{t_new:>10.2f}")
+    print(f"{'CSV (original)':<30}{t_csv_legacy:>10.2f}")
+    print(f"{'CSV (compacta)':<30}{t_csv_new:>10.2f}")
+    print(f"{'Parquet':<30}{t_pq:>10.2f}")
+    print(f"Disco: CSV {csv_mb:.1f} MB, Parquet {pq_mb:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
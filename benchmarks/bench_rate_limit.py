@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: pausas fijas entre llamadas vs TokenBucket compartido + pool de hilos.
+
+Compara los segundos simulados de una corrida (el comportamiento del
+planificador, el limitador y el pool se verifica en tests/):
+- anterior: time.sleep(5) después de cada llamada, cuentas en secuencia;
+- nuevo: TokenBucket(API_RATE_PER_SEC, API_BURST).
+
+Uso:
+    python benchmarks/bench_rate_limit.py --accounts 4 --windows 30
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from rate_limit import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        self.slept += seconds
+
+
+def bucket(clock, **kw):
+    return TokenBucket(clock=clock, sleep=clock.sleep, **kw)
+
+
+def simulate(mode, args):
+    """Segundos simulados de llamar args.windows ventanas por cuenta."""
+    clock = FakeClock()
+    calls = args.accounts * args.windows
+    if mode == 'anterior':
+        for _ in range(calls):
+            clock.sleep(args.latency_s)
+            clock.sleep(5)
+        return clock.now
+    # Con el limitador las llamadas se solapan hasta max_workers: el tiempo lo fija
+    # la tasa o la latencia repartida entre los hilos (la mayor), más el último request
+    tb = bucket(clock, rate=args.rate, capacity=args.burst)
+    for _ in range(calls):
+        tb.acquire()
+    return max(clock.now, args.latency_s * calls / min(args.workers, calls)) + args.latency_s
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=2)
+    parser.add_argument("--windows", type=int, default=7, help="ventanas (requests) por cuenta")
+    parser.add_argument("--rate", type=float, default=1.0, help="API_RATE_PER_SEC")
+    parser.add_argument("--burst", type=int, default=4, help="API_BURST")
+    parser.add_argument("--workers", type=int, default=4, help="MAX_WORKERS")
+    parser.add_argument("--latency-s", type=float, default=1.5, help="segundos por request")
+    args = parser.parse_args()
+
+    print(f"\n{args.accounts} cuentas x {args.windows} requests, {args.latency_s} s por request")
+    print(f"{'modo':<12}{'segundos':>10}")
+    for mode in ('anterior', 'nuevo'):
+        print(f"{mode:<12}{simulate(mode, args):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
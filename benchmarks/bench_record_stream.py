@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: pico de memoria (RSS) al parsear insights nivel anuncio.
+
+Compara el enfoque anterior (lista de dicts -> DataFrame, con parse_ad_row de
+row_parsers.py) con RowChunker + flatten_ad_chunk (lo que usa a01.py) sobre
+payloads sintéticos. Los modos ventana_* pasan todas las filas como una sola
+ventana por InsightsPlanner.fetch_range con un cliente falso: ventana_lista
+junta el cursor en una lista antes de aplanar, ventana_paginas lo aplana página
+por página con consume=chunk_rows (como a01.py). Cada modo corre en un
+subproceso aparte para que el pico de RSS de uno no contamine al otro.
+
+Uso:
+    python benchmarks/bench_record_stream.py --rows 1000000
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from synthetic_payloads import synthetic_ad_rows
+
+
+MODES = ("dicts", "columnar", "ventana_lista", "ventana_paginas")
+
+
+def peak_rss_mb():
+    # ru_maxrss: KB en Linux, bytes en macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_mode(mode, rows, chunk_size):
+    import pandas as pd
+    from flatten_actions import flatten_ad_chunk
+    from insights_planner import InsightsPlanner
+    from record_stream import AD_SCHEMA, RowChunker, chunk_rows
+    from row_parsers import parse_ad_row
+
+    class Client:
+        def get_insights(self, account_id, fields, params):
+            return synthetic_ad_rows(rows)
+
+    names = [c for c, _ in AD_SCHEMA]
+    t0 = time.perf_counter()
+    if mode == "dicts":
+        records = []
+        for r in synthetic_ad_rows(rows):
+            records.append(dict(zip(names, parse_ad_row("tla", r))))
+        df = pd.DataFrame(records)
+    elif mode.startswith("ventana"):
+        planner = InsightsPlanner(Client(), fields=[], params={})
+        chunker = RowChunker(flatten_ad_chunk, AD_SCHEMA, chunk_size=chunk_size)
+        day = date(2024, 1, 1)
+        if mode == "ventana_lista":
+            chunker.extend(planner.fetch_range("act_1", day, day), "tla")
+        else:
+            consume = lambda account_id, cursor: chunk_rows(cursor, "tla", flatten_ad_chunk, AD_SCHEMA, chunk_size)
+            chunker.add_chunks(planner.fetch_range("act_1", day, day, consume))
+        df = chunker.to_frame()
+    else:
+        chunker = RowChunker(flatten_ad_chunk, AD_SCHEMA, chunk_size=chunk_size)
+        chunker.extend(synthetic_ad_rows(rows), "tla")
+        df = chunker.to_frame()
+    elapsed = time.perf_counter() - t0
+    print(f"{mode},{len(df)},{elapsed:.2f},{peak_rss_mb():.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--mode", choices=MODES)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.rows, args.chunk_size)
+        return
+
+    print(f"Filas sintéticas: {args.rows:,} (chunk {args.chunk_size:,})")
+    print(f"{'modo':<16}{'filas':>12}{'segundos':>10}{'pico RSS MB':>14}")
+    for mode in MODES:
+        out = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--rows", str(args.rows),
+             "--chunk-size", str(args.chunk_size)],
+            check=True, capture_output=True, text=True,
+        ).stdout.strip().splitlines()[-1]
+        m, n, secs, rss = out.split(",")
+        print(f"{m:<16}{int(n):>12,}{float(secs):>10.2f}{float(rss):>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
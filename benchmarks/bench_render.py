@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: render de tablas del reporte a PNG.
+
+Compara el export_table_png original (iterrows + figura pyplot nueva por
+tabla) contra table_render: formato por columnas, una Figure Agg reutilizada
+y pool de procesos. Verifica que el texto de las celdas sea idéntico para
+todas las tablas y que los PNG de una muestra coincidan píxel a píxel.
+
+Uso:
+    python benchmarks/bench_render.py --tables 200 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+t0 = time.perf_counter()
+import numpy as np
+import pandas as pd
+T_IMPORT_BASE = time.perf_counter() - t0
+
+from comparisons import tabla_valores, tabla_variaciones, weekly_comparisons
+from rollups import aggregate
+from synthetic_payloads import synthetic_campaign_1d
+from table_render import format_table, render_tables
+from weekly import preparar_weekly_rollup
+
+METRIC_MAP = {
+    'spend': 'Total Spend',
+    'messaging_started': 'WhatsApp Leads',
+    'cpl': 'CPL',
+    'ctr': 'CTR (todos)',
+    'unique_link_clicks_ctr': 'CTR (links)',
+    'ratio ctr (todos / links)': 'CTR (todos / links)',
+    'ctr (todos / links)': 'CTR (todos / links)',
+}
+
+
+def legacy_text(df_in, metric_map):
+    """Celdas como las armaba export_table_png (fila por fila)."""
+    df = df_in.copy().reset_index(drop=True)
+
+    def map_display_name(v):
+        kk = str(v).strip().lower()
+        return metric_map.get(kk, v)
+
+    df_display = df.copy()
+    df_display['Métrica'] = df_display['Métrica'].apply(map_display_name)
+    text_table = [df_display.columns.tolist()]
+    percent_metrics = {"ctr", "unique_link_clicks_ctr"}
+
+    for i, row in df_display.iterrows():
+        row_txt = []
+        mkey = str(df.loc[i, "Métrica"]).strip().lower()
+        for col in df_display.columns:
+            val = row[col]
+            if col == "Métrica":
+                row_txt.append(str(val))
+                continue
+            if pd.isna(val):
+                row_txt.append('')
+                continue
+            if "(%)" in str(col):
+                try:
+                    vf = float(val)
+                    row_txt.append(f"{vf:,.2f}%")
+                    continue
+                except Exception:
+                    pass
+            if mkey in percent_metrics:
+                try:
+                    vf = float(val)
+                    row_txt.append(f"{vf * 100:,.2f}%")
+                    continue
+                except Exception:
+                    pass
+            if isinstance(val, (float, np.floating)):
+                row_txt.append(f"{val:,.2f}")
+            elif isinstance(val, (int, np.integer)):
+                row_txt.append(f"{val:,d}")
+            else:
+                try:
+                    vf = float(str(val).replace('%', '').replace(',', '').strip())
+                    row_txt.append(f"{vf:,.2f}")
+                except Exception:
+                    row_txt.append(str(val))
+        text_table.append(row_txt)
+    return text_table
+
+
+def legacy_export(df_in, output_path, metric_map):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    text_table = legacy_text(df_in, metric_map)
+    nrows, ncols = df_in.shape
+    fig_width = max(8, ncols * 1.5)
+    fig_height = max(2 + nrows * 0.5, 1.8 + nrows * 0.45)
+
+    plt.close('all')
+    fig, ax = plt.subplots(figsize=(fig_width, fig_height))
+    ax.axis('off')
+    table = ax.table(cellText=text_table, cellLoc='center', loc='center')
+    table.auto_set_font_size(False)
+    table.set_fontsize(10)
+    table.scale(1, 1.2)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    plt.tight_layout()
+    fig.savefig(output_path, dpi=200, bbox_inches='tight')
+    plt.close(fig)
+    return output_path
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+
+def same_pixels(a, b):
+    from matplotlib.image import imread
+    x, y = imread(a), imread(b)
+    return x.shape == y.shape and np.array_equal(x, y)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tables", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--dpi", type=int, default=200)
+    args = parser.parse_args()
+
+    # Tablas reales del reporte: variaciones y valores de las últimas semanas
+    cube = aggregate(synthetic_campaign_1d(2, 20, 1200), 'week', 'account')
+    dfw, _ = preparar_weekly_rollup(cube)
+    comp = weekly_comparisons(dfw)
+    weeks = dfw.index[-(args.tables // 2 + 1):]
+    tables = []
+    for w in weeks:
+        tables += [tabla_variaciones(comp, w), tabla_valores(comp, w)]
+    tables = tables[:args.tables]
+
+    for t in tables:
+        assert format_table(t, METRIC_MAP) == legacy_text(t, METRIC_MAP)
+    print(f"{len(tables)} tablas: texto de celdas idéntico al original")
+
+    t0 = time.perf_counter()
+    import matplotlib  # noqa: F401
+    t_mpl = time.perf_counter() - t0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = lambda tag, i: os.path.join(tmp, tag, f"tabla_{i:04d}.png")
+        t_legacy, _ = timed(lambda: [legacy_export(t, path('legacy', i), METRIC_MAP)
+                                     for i, t in enumerate(tables)])
+        jobs = lambda tag: [(t, path(tag, i)) for i, t in enumerate(tables)]
+        t_single, _ = timed(lambda: render_tables(jobs('single'), METRIC_MAP, workers=1, dpi=args.dpi))
+        t_pool, _ = timed(lambda: render_tables(jobs('pool'), METRIC_MAP, workers=args.workers, dpi=args.dpi))
+
+        sample = range(0, len(tables), max(1, len(tables) // 10))
+        iguales = sum(same_pixels(path('legacy', i), path('pool', i)) for i in sample)
+        print(f"PNG idénticos píxel a píxel: {iguales}/{len(sample)} de la muestra")
+
+    print(f"Import pandas+numpy: {T_IMPORT_BASE:.2f}s, matplotlib: {t_mpl:.2f}s (solo si se renderiza)")
+    print(f"{'versión':<34}{'segundos':>10}{'tablas/s':>10}")
+    for name, t in (("original (pyplot por tabla)", t_legacy),
+                    ("figura reutilizada, 1 proceso", t_single),
+                    (f"pool de {args.workers} procesos", t_pool)):
+        print(f"{name:<34}{t:>10.2f}{len(tables) / t:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: reintentos anteriores vs capa de reintentos compartida (api_retry.py).
+
+Usa una API falsa que inyecta errores con los códigos de Meta (rate limit
+17/80004, transitorios 1/2) y un reloj falso (sin esperas reales). Simula una
+corrida con una tasa de errores y compara ventanas perdidas, llamadas y
+segundos de espera (el comportamiento de la capa se verifica en
+tests/test_api_retry.py):
+- anterior: campañas sin reintento; anuncios con 3 intentos y espera lineal
+  (BACKOFF * intento) ante cualquier error;
+- nuevo: RetryPolicy en ambos niveles.
+
+Uso:
+    python benchmarks/bench_retry.py --windows 200 --error-rate 0.2
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from api_retry import DeadLetters, RetryPolicy
+from insights_planner import InsightsPlanner
+
+DAY = date(2026, 1, 1)
+
+
+class FakeRequestError(Exception):
+    """Misma interfaz que FacebookRequestError para clasificar."""
+
+    def __init__(self, code, message="fake error", status=400):
+        super().__init__(f"({code}) {message}")
+        self._code = code
+        self._status = status
+
+    def api_error_code(self):
+        return self._code
+
+    def http_status(self):
+        return self._status
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        self.slept += seconds
+
+
+class FlakyClient:
+    """get_insights que falla al azar con error_rate (códigos de Meta)."""
+
+    def __init__(self, error_rate=0.0, seed=3):
+        self.error_rate = error_rate
+        self.rnd = random.Random(seed)
+        self.calls = 0
+
+    def get_insights(self, account_id, fields, params):
+        self.calls += 1
+        since = params['time_range']['since']
+        if self.error_rate and self.rnd.random() < self.error_rate:
+            code = self.rnd.choice([1, 2, 2, 17, 80004])
+            raise FakeRequestError(code)
+        return [{'date_start': since, 'campaign_id': '1', 'spend': '1.0'}]
+
+
+def window(account, offset, days=1):
+    since = DAY + timedelta(days=offset)
+    return (account, account[-3:], since, since + timedelta(days=days - 1))
+
+
+def policy(clock, **kw):
+    kw.setdefault('rng', random.Random(0))
+    return RetryPolicy(clock=clock, sleep=clock.sleep, **kw)
+
+
+def planner(client, retry=None):
+    return InsightsPlanner(client, ['spend'], {'level': 'campaign'}, retry=retry)
+
+
+def simulate(mode, n_windows, error_rate, seed):
+    """Corrida simulada: ventanas nivel campaña y nivel anuncio con errores al azar."""
+    clock = FakeClock()
+    client = FlakyClient(error_rate=error_rate, seed=seed)
+    accounts = ['act_266875535124705', 'act_172227634833453']
+    windows = [window(accounts[i % 2], i // 2) for i in range(n_windows)]
+    lost = 0
+    if mode == 'anterior':
+        p = planner(client)
+        half = n_windows // 2
+        for w in windows[:half]:  # campañas: un intento
+            try:
+                p.fetch_range(w[0], w[2], w[3])
+            except FakeRequestError:
+                lost += 1
+        for w in windows[half:]:  # anuncios: 3 intentos, espera BACKOFF * intento
+            for tries in range(1, 4):
+                try:
+                    p.fetch_range(w[0], w[2], w[3])
+                    break
+                except FakeRequestError:
+                    if tries == 3:
+                        lost += 1
+                    else:
+                        clock.sleep(2 * tries)
+    else:
+        retry = policy(clock, rng=random.Random(seed), budget=max(10, n_windows // 2))
+        p = planner(client, retry)
+        with tempfile.TemporaryDirectory() as tmp:
+            dl = DeadLetters(os.path.join(tmp, "_dead_letters.json"))
+            for w in windows:
+                try:
+                    p.fetch_range(w[0], w[2], w[3])
+                except Exception as e:
+                    lost += 1
+                    dl.add('campaign', w, e)
+            assert len(dl.entries) == lost
+    return lost, client.calls, clock.slept
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--windows", type=int, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{args.windows} ventanas, {args.error_rate:.0%} de errores inyectados (1/2/17/80004)")
+    print(f"{'modo':<12}{'perdidas':>10}{'llamadas':>10}{'espera s':>10}")
+    for mode in ('anterior', 'nuevo'):
+        lost, calls, slept = simulate(mode, args.windows, args.error_rate, args.seed)
+        print(f"{mode:<12}{lost:>10}{calls:>10}{slept:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
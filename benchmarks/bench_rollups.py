@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: agregados desde el diario vs cubos de rollups.
+
+Genera campaign_1d sintético, arma los cubos con los días anteriores a los
+últimos --new-days y los actualiza incrementalmente con esos días (más una
+re-extracción de días ya existentes con valores distintos). Verifica que:
+- los cubos actualizados sean iguales a reconstruirlos desde cero;
+- df_weekly / map_period del reporte coincidan con la versión sobre el diario
+  (preparar_weekly_loop, weekly_reference.py);
+- los resúmenes mensuales por cuenta y campaña coincidan con el groupby diario.
+Luego compara tiempos.
+
+Uso:
+    python benchmarks/bench_rollups.py --campaigns 200 --days 1095
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import pandas as pd
+
+from rollups import GRAINS, LEVELS, RollupStore, month_start
+from synthetic_payloads import synthetic_campaign_1d
+from weekly import preparar_weekly_rollup
+from weekly_reference import preparar_weekly_loop
+
+MONTHLY_COLS = ['spend', 'impressions', 'clicks_all']
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+
+def slicer(df):
+    dates = pd.to_datetime(df['date'])
+    return lambda start, end: df[(dates >= pd.Timestamp(start)) & (dates <= pd.Timestamp(end))]
+
+
+def monthly_from_daily(df, keys):
+    df = df.assign(month_start=month_start(df['date']))
+    return df.groupby(keys + ['month_start'])[MONTHLY_COLS].sum().reset_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=2)
+    parser.add_argument("--campaigns", type=int, default=200)
+    parser.add_argument("--days", type=int, default=1095)
+    parser.add_argument("--new-days", type=int, default=7)
+    parser.add_argument("--backend", default="parquet", choices=["parquet", "feather", "csv"])
+    args = parser.parse_args()
+
+    df = synthetic_campaign_1d(args.accounts, args.campaigns, args.days)
+    print(f"Filas: {len(df):,} ({args.accounts} cuentas x {args.campaigns} campañas x {args.days} días)")
+
+    last = pd.to_datetime(df['date']).max()
+    cut = last - pd.Timedelta(days=args.new_days)
+    old = df[pd.to_datetime(df['date']) <= cut]
+    # Corrida: días nuevos + re-extracción de 3 días existentes con valores revisados
+    new = df[pd.to_datetime(df['date']) > cut - pd.Timedelta(days=3)].copy()
+    new['spend'] = (new['spend'] * 1.1).round(2)
+    final = pd.concat([old[pd.to_datetime(old['date']) <= cut - pd.Timedelta(days=3)], new], ignore_index=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inc = RollupStore(os.path.join(tmp, "inc"), backend=args.backend)
+        full = RollupStore(os.path.join(tmp, "full"), backend=args.backend)
+        inc.rebuild(old)
+        t_update, touched = timed(lambda: inc.update(slicer(final), new['date']))
+        t_rebuild, _ = timed(lambda: full.rebuild(final))
+        for grain in GRAINS:
+            for level in LEVELS:
+                pd.testing.assert_frame_equal(inc.read(grain, level), full.read(grain, level))
+        print(f"Update incremental ({touched['week']} semanas, {touched['month']} meses) = reconstrucción completa")
+
+        # Reporte semanal
+        cols = ['date', 'spend', 'messaging_started', 'impressions', 'clicks_all', 'link_clicks']
+        t_daily, (_, weekly_d, map_d) = timed(lambda: preparar_weekly_loop(final[cols]))
+        t_cube, (weekly_r, map_r) = timed(
+            lambda: preparar_weekly_rollup(inc.read('week', 'account', ratios=False)))
+        pd.testing.assert_frame_equal(weekly_d, weekly_r, check_dtype=False)
+        pd.testing.assert_series_equal(map_d.sort_index(), map_r.sort_index(), check_dtype=False)
+        print("Reporte semanal: df_weekly y map_period idénticos")
+
+        # Resúmenes mensuales del Excel
+        t_month_d, _ = timed(lambda: [monthly_from_daily(final, k) for k in ([], ['account_id'], ['campaign_name'])])
+        for keys, level in (([], 'account'), (['account_id'], 'account'), (['campaign_name'], 'campaign')):
+            cube = inc.read('month', level, ratios=False)
+            got = cube.groupby(keys + ['month_start'])[MONTHLY_COLS].sum().reset_index()
+            exp = monthly_from_daily(final, keys)
+            for k in keys:
+                got[k] = got[k].astype(str)
+                exp[k] = exp[k].astype(str)
+            pd.testing.assert_frame_equal(got, exp, check_dtype=False)
+        t_month_r, _ = timed(lambda: [inc.read('month', l, ratios=False) for l in ('account', 'campaign')])
+        print("Resúmenes mensuales: idénticos")
+
+    print(f"{'operación':<34}{'segundos':>10}")
+    print(f"{'rollups: reconstrucción completa':<34}{t_rebuild:>10.3f}")
+    print(f"{'rollups: update incremental':<34}{t_update:>10.3f}")
+    print(f"{'semanal desde diario':<34}{t_daily:>10.3f}")
+    print(f"{'semanal desde rollup':<34}{t_cube:>10.3f}")
+    print(f"{'mensual desde diario':<34}{t_month_d:>10.3f}")
+    print(f"{'mensual desde rollup':<34}{t_month_r:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
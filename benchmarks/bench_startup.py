@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: arranque del punto de entrada de Power BI.
+
+Arma datasets sintéticos ya procesados en una carpeta temporal (carpetas
+particionadas de primera_tabla y segunda_tabla) y mide, en procesos nuevos:
+- powerbi_entry.py completo (imports + carga de ambas tablas);
+- solo los imports de cabecera que pagaba a01.py antes de hacer nada
+  (facebook_business, matplotlib, xlsxwriter, ...; los que no estén instalados
+  se omiten).
+Con --save agrega el resultado a un JSONL para seguir la evolución.
+
+Uso:
+    python benchmarks/bench_startup.py --repeat 5 --save benchmarks/results/startup.jsonl
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS = os.path.join(HERE, "..", "scripts")
+sys.path.insert(0, SCRIPTS)
+
+import numpy as np
+import pandas as pd
+
+from powerbi_delta import PartitionedExport
+from synthetic_payloads import synthetic_campaign_1d
+
+A01_HEADER_MODULES = ['facebook_business.api', 'pandas', 'numpy', 'dateutil.relativedelta',
+                      'xlsxwriter', 'matplotlib.pyplot']
+
+
+def build_datasets(base, accounts, campaigns, days):
+    data = os.path.join(base, "datasets", "data", "powerbi")
+    df = synthetic_campaign_1d(accounts, campaigns, days)
+    primera = df.rename(columns={'account_id': 'account', 'date': 'date_start',
+                                 'messaging_started': 'first_replies'})
+    primera['date_stop'] = primera['date_start']
+    PartitionedExport(os.path.join(data, "primera_tabla"), 'account', 'date_start', fmt='parquet') \
+        .write_full(primera)
+
+    rng = np.random.default_rng(1)
+    ads = pd.DataFrame({
+        'account': primera['account'],
+        'ad_id': (primera['campaign_id'].astype(np.int64) * 10 + 1).astype(str),
+        'campaign_id': primera['campaign_id'],
+        'date_start': primera['date_start'],
+        'impressions': primera['impressions'],
+        'video_plays': rng.integers(0, 5000, len(primera)),
+        'thruplay': rng.integers(0, 500, len(primera)),
+    })
+    PartitionedExport(os.path.join(data, "segunda_tabla"), 'account', 'date_start', fmt='parquet') \
+        .write_full(ads)
+    return len(primera)
+
+
+def run(cmd, env=None):
+    t0 = time.perf_counter()
+    subprocess.run(cmd, check=True, env=env, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=2)
+    parser.add_argument("--campaigns", type=int, default=100)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", help="JSONL donde agregar el resultado")
+    args = parser.parse_args()
+
+    available = []
+    for mod in A01_HEADER_MODULES:
+        probe = subprocess.run([sys.executable, "-c", f"import {mod}"], capture_output=True)
+        if probe.returncode == 0:
+            available.append(mod)
+    missing = sorted(set(A01_HEADER_MODULES) - set(available))
+
+    with tempfile.TemporaryDirectory() as base:
+        rows = build_datasets(base, args.accounts, args.campaigns, args.days)
+        env = dict(os.environ, META_BASE_DIR=base)
+        entry = os.path.join(SCRIPTS, "powerbi_entry.py")
+        run([sys.executable, entry], env)  # calentar caché de disco
+        t_entry = [run([sys.executable, entry], env) for _ in range(args.repeat)]
+
+    header = "; ".join(f"import {m}" for m in available)
+    t_header = [run([sys.executable, "-c", header]) for _ in range(args.repeat)]
+    t_python = [run([sys.executable, "-c", "pass"]) for _ in range(args.repeat)]
+
+    result = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'rows': rows,
+        'entry_seconds': round(statistics.median(t_entry), 3),
+        'a01_header_imports_seconds': round(statistics.median(t_header), 3),
+        'python_seconds': round(statistics.median(t_python), 3),
+        'a01_header_modules': available,
+    }
+    print(f"Filas primera_tabla / segunda_tabla: {rows:,}")
+    print(f"{'proceso (mediana de ' + str(args.repeat) + ')':<40}{'segundos':>10}")
+    print(f"{'python vacío':<40}{result['python_seconds']:>10.3f}")
+    print(f"{'imports de cabecera de a01.py':<40}{result['a01_header_imports_seconds']:>10.3f}")
+    print(f"{'powerbi_entry.py (imports + carga)':<40}{result['entry_seconds']:>10.3f}")
+    if missing:
+        print(f"No instalados (omitidos): {', '.join(missing)}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(result) + "\n")
+        print(f"Resultado agregado a {args.save}")
+
+
+if __name__ == "__main__":
+    main()
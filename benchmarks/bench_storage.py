@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: CSV vs store columnar (Parquet / Feather particionado) para campaign_1d.
+
+Mide tamaño en disco y tiempo de carga de: lectura completa (como hoy con
+parse_dates), solo las columnas del reporte semanal, y un rango de fechas
+(último mes, como el Excel desde el corte). También compara agregar 7 días
+nuevos reescribiendo todo (concat + drop_duplicates) contra upsert_csv (primera
+vez armando su índice de claves y después con el índice ya guardado, solo
+filas nuevas o pisando los últimos días) y DatasetStore.upsert.
+
+Uso:
+    python benchmarks/bench_storage.py --campaigns 200 --days 1825
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import pandas as pd
+
+from storage import DatasetStore, upsert_csv
+from synthetic_payloads import synthetic_campaign_1d
+
+KEYS = ['account_id', 'date', 'campaign_id']
+WEEKLY_COLS = ['date', 'spend', 'messaging_started', 'impressions', 'clicks_all', 'link_clicks']
+
+
+def dir_size_mb(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 1e6
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total / 1e6
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=2)
+    parser.add_argument("--campaigns", type=int, default=100)
+    parser.add_argument("--days", type=int, default=1095)
+    args = parser.parse_args()
+
+    df = synthetic_campaign_1d(args.accounts, args.campaigns, args.days)
+    last = pd.to_datetime(df['date']).max()
+    month_start = last.replace(day=1)
+    print(f"Filas: {len(df):,} ({args.accounts} cuentas x {args.campaigns} campañas x {args.days} días)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "campaign_1d")
+        df.to_csv(csv_path, index=False, encoding='utf-8-sig', date_format='%Y-%m-%d')
+
+        stores = {}
+        for backend in ("parquet", "feather"):
+            store = DatasetStore(os.path.join(tmp, backend), 'account_id', 'date', keys=KEYS,
+                                 text_cols=['campaign_id', 'campaign_name'], backend=backend)
+            store.write(df)
+            stores[backend] = store
+
+        def csv_range():
+            d = pd.read_csv(csv_path, encoding='utf-8-sig', parse_dates=['date'])
+            return d[d['date'] >= month_start]
+
+        rows = [(
+            "csv",
+            dir_size_mb(csv_path),
+            timed(lambda: pd.read_csv(csv_path, encoding='utf-8-sig', parse_dates=['date'])),
+            timed(lambda: pd.read_csv(csv_path, encoding='utf-8-sig', usecols=WEEKLY_COLS, parse_dates=['date'])),
+            timed(csv_range),
+        )]
+        for backend, store in stores.items():
+            rows.append((
+                backend,
+                dir_size_mb(store.root),
+                timed(lambda: store.read()),
+                timed(lambda: store.read(columns=WEEKLY_COLS)),
+                timed(lambda: store.read(start=month_start)),
+            ))
+
+        # Una corrida semanal: 7 días nuevos, el primero ya existente (se pisa)
+        new = df[pd.to_datetime(df['date']) > last - pd.Timedelta(days=7)].copy()
+        new['date'] = (pd.to_datetime(new['date']) + pd.Timedelta(days=6)).dt.date
+        new['campaign_id'] = new['campaign_id'].astype(str)
+
+        def full_rewrite():
+            old = pd.read_csv(csv_path, encoding='utf-8-sig', dtype={'campaign_id': str})
+            old['date'] = pd.to_datetime(old['date']).dt.date
+            out = pd.concat([old, new], ignore_index=True).drop_duplicates(subset=KEYS, keep='last')
+            out.sort_values(KEYS).to_csv(csv_path + ".full", index=False, encoding='utf-8-sig')
+
+        def shifted(days):
+            out = new.copy()
+            out['date'] = (pd.to_datetime(out['date']) + pd.Timedelta(days=days)).dt.date
+            return out
+
+        t_full = timed(full_rewrite, repeat=1)
+        t_csv = timed(lambda: upsert_csv(csv_path, new, KEYS), repeat=1)
+        # Con el índice ya guardado: 7 días todos nuevos, y 7 días pisando 3 (BACKFILL_REFETCH_DAYS)
+        t_csv_append = timed(lambda: upsert_csv(csv_path, shifted(7), KEYS), repeat=1)
+        t_csv_tail = timed(lambda: upsert_csv(csv_path, shifted(11), KEYS), repeat=1)
+        t_store = timed(lambda: stores['parquet'].upsert(new), repeat=1)
+
+    print(f"{'formato':<10}{'MB':>8}{'completo s':>12}{'columnas s':>12}{'último mes s':>14}")
+    for name, mb, full, cols, rng in rows:
+        print(f"{name:<10}{mb:>8.1f}{full:>12.3f}{cols:>12.3f}{rng:>14.3f}")
+
+    print(f"\nAgregar {len(new):,} filas (7 días): reescritura completa {t_full:.3f}s | "
+          f"upsert_csv armando el índice {t_csv:.3f}s | upsert parquet {t_store:.3f}s")
+    print(f"upsert_csv con índice: 7 días nuevos {t_csv_append:.3f}s | pisando 3 días {t_csv_tail:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
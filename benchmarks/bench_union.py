@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: extracción separada (campaña + anuncio) vs una pasada a nivel anuncio.
+
+Genera filas nivel anuncio con la unión de fields y la respuesta nivel campaña
+equivalente (la que devolvería Meta sumando los anuncios). Verifica que
+campaign_1d derivado localmente coincida con el aplanado de la respuesta nivel
+campaña (métricas aditivas exactas, ctr recalculado) y que segunda_tabla sea
+igual a flatten_ad_chunk. Cuenta los requests de cada modo para un backfill
+de --days días con el plan de la corrida (nivel anuncio por día sin
+reportes asíncronos).
+
+Uso:
+    python benchmarks/bench_union.py --campaigns 50 --ads 4 --days 30
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import numpy as np
+import pandas as pd
+
+from flatten_actions import flatten_ad_chunk, flatten_campaign_chunk
+from insights_planner import contiguous_ranges
+from union_extract import (CAMPAIGN_KEYS, NON_ADDITIVE, RATIOS, ads_from_union, campaign_from_ads,
+                           flatten_union_chunk)
+
+ACTION_TYPES = ['link_click', 'onsite_conversion.messaging_conversation_started_7d',
+                'onsite_conversion.messaging_user_depth_2_message_send', 'post_engagement']
+
+
+def union_rows(accounts, campaigns, ads, days, seed=5):
+    """Filas nivel anuncio con la unión de fields: (labels, rows)."""
+    rnd = random.Random(seed)
+    labels, rows = [], []
+    start = date(2026, 1, 1)
+    for a in range(accounts):
+        for d in range(days):
+            day = (start + timedelta(days=d)).isoformat()
+            for c in range(campaigns):
+                for k in range(ads):
+                    impressions = rnd.randint(100, 20000)
+                    clicks = rnd.randint(0, impressions // 20)
+                    plays = rnd.randint(0, 3000)
+                    labels.append(f"cuenta{a}")
+                    rows.append({
+                        'date_start': day,
+                        'campaign_id': str(120100000000000 + c),
+                        'campaign_name': f"campaña_{c}",
+                        'ad_id': str(120200000000000 + c * 100 + k),
+                        'spend': f"{rnd.uniform(1, 100):.2f}",
+                        'impressions': str(impressions),
+                        'reach': str(int(impressions * 0.7)),
+                        'clicks': str(clicks),
+                        'unique_inline_link_clicks': str(clicks // 3),
+                        'ctr': f"{clicks / impressions * 100:.6f}",
+                        'unique_link_clicks_ctr': f"{rnd.uniform(0, 3):.6f}",
+                        'video_p25_watched_actions': [{'action_type': 'video_view', 'value': str(plays // 2)}],
+                        'actions': [{'action_type': t, 'value': str(rnd.randint(1, 50))} for t in ACTION_TYPES],
+                        'video_play_actions': [{'action_type': 'video_view', 'value': str(plays)}],
+                        'video_play_curve_actions': [{'action_type': 'video_view', 'value': [100, 80, 60, 45, 40]}],
+                        'video_p100_watched_actions': [{'action_type': 'video_view', 'value': str(plays // 10)}],
+                    })
+    return labels, rows
+
+
+def campaign_response(labels, rows):
+    """Respuesta nivel campaña equivalente: anuncios sumados por (cuenta, día, campaña)."""
+    groups = {}
+    for label, r in zip(labels, rows):
+        key = (label, r['date_start'], r['campaign_id'])
+        g = groups.setdefault(key, {'campaign_name': r['campaign_name'], 'num': {}, 'acts': {}})
+        for f in ('spend', 'impressions', 'reach', 'clicks', 'unique_inline_link_clicks'):
+            g['num'][f] = g['num'].get(f, 0) + float(r[f])
+        for field in ('actions', 'video_p25_watched_actions'):
+            for a in r[field]:
+                k = (field, a['action_type'])
+                g['acts'][k] = g['acts'].get(k, 0) + int(a['value'])
+    out_labels, out_rows = [], []
+    for (label, day, cid), g in groups.items():
+        n = g['num']
+        row = {
+            'date_start': day, 'campaign_id': cid, 'campaign_name': g['campaign_name'],
+            'spend': f"{n['spend']:.2f}", 'impressions': str(int(n['impressions'])),
+            'reach': str(int(n['reach'])), 'clicks': str(int(n['clicks'])),
+            'ctr': n['clicks'] / n['impressions'] * 100,
+            'unique_link_clicks_ctr': n['unique_inline_link_clicks'] / n['reach'] * 100,
+        }
+        for field in ('actions', 'video_p25_watched_actions'):
+            row[field] = [{'action_type': t, 'value': str(v)} for (f, t), v in g['acts'].items() if f == field]
+        out_labels.append(label)
+        out_rows.append(row)
+    return out_labels, out_rows
+
+
+def requests_per_run(accounts, days):
+    """Requests de un backfill de `days` días contiguos por cuenta."""
+    dates = [date(2026, 1, 1) + timedelta(days=i) for i in range(days)]
+    campaign = accounts * len(contiguous_ranges(dates))
+    ads = accounts * len(contiguous_ranges(dates, max_days=1))
+    union = accounts * len(contiguous_ranges(dates))
+    return campaign + ads, union
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=2)
+    parser.add_argument("--campaigns", type=int, default=50)
+    parser.add_argument("--ads", type=int, default=4)
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    labels, rows = union_rows(args.accounts, args.campaigns, args.ads, args.days)
+    c_labels, c_rows = campaign_response(labels, rows)
+    print(f"Filas nivel anuncio: {len(rows):,}. Filas nivel campaña: {len(c_rows):,}")
+
+    t0 = time.perf_counter()
+    legacy_campaign = flatten_campaign_chunk(c_labels, c_rows)
+    legacy_ads = flatten_ad_chunk(labels, rows)
+    t_legacy = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    wide = flatten_union_chunk(labels, rows)
+    union_campaign = campaign_from_ads(wide)
+    union_ads = ads_from_union(wide)
+    t_union = time.perf_counter() - t0
+
+    pd.testing.assert_frame_equal(union_ads, legacy_ads, check_dtype=False)
+    legacy_campaign = legacy_campaign.sort_values(CAMPAIGN_KEYS).reset_index(drop=True)
+    exact = [c for c in legacy_campaign.columns if c not in list(RATIOS) + ['spend']]
+    pd.testing.assert_frame_equal(union_campaign[exact], legacy_campaign[exact], check_dtype=False)
+    np.testing.assert_allclose(union_campaign['spend'], legacy_campaign['spend'], atol=0.011)
+    for col in RATIOS:
+        np.testing.assert_allclose(union_campaign[col], legacy_campaign[col], rtol=1e-9)
+    print("campaign_1d derivado = respuesta nivel campaña (aditivas exactas, ratios recalculados)")
+    print("segunda_tabla idéntica a flatten_ad_chunk")
+    print(f"No aditivas: {NON_ADDITIVE}")
+
+    print(f"\n{'paso':<40}{'segundos':>10}")
+    print(f"{'aplanar separado (campaña + anuncio)':<40}{t_legacy:>10.2f}")
+    print(f"{'aplanar union + agregar':<40}{t_union:>10.2f}")
+
+    print(f"\n{'días por corrida':<18}{'separado':>10}{'union':>10}")
+    for days in (3, 7, args.days):
+        sep, uni = requests_per_run(args.accounts, days)
+        print(f"{days:<18}{sep:>10}{uni:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: reporte semanal fila por fila sobre el diario vs desde el cubo semanal.
+
+Genera campaign_1d sintético (por defecto 5 años x 500 campañas), verifica que
+preparar_weekly_loop (la versión original, weekly_reference.py) y
+preparar_weekly_rollup sobre el cubo de rollups.py devuelvan el mismo df_weekly
+y map_period, y compara tiempos. La verificación se repite sobre una muestra
+con días faltantes. El cubo se arma una vez (en la corrida se actualiza
+incrementalmente), así que su construcción se informa aparte.
+
+Uso:
+    python benchmarks/bench_weekly.py --campaigns 500 --days 1826
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import pandas as pd
+
+from rollups import RollupStore
+from synthetic_payloads import synthetic_campaign_1d
+from weekly import preparar_weekly_rollup
+from weekly_reference import preparar_weekly_loop
+
+REPORT_COLS = ['date', 'spend', 'messaging_started', 'impressions', 'clicks_all', 'link_clicks']
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+
+def assert_same(loop_out, rollup_out):
+    _, weekly_a, map_a = loop_out
+    weekly_b, map_b = rollup_out
+    pd.testing.assert_frame_equal(weekly_a, weekly_b, check_dtype=False)
+    pd.testing.assert_series_equal(map_a.sort_index(), map_b.sort_index(), check_dtype=False)
+
+
+def weekly_cube(df, root):
+    store = RollupStore(root)
+    store.rebuild(df)
+    return store.read('week', 'account', ratios=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=1)
+    parser.add_argument("--campaigns", type=int, default=500)
+    parser.add_argument("--days", type=int, default=1826)
+    args = parser.parse_args()
+
+    df = synthetic_campaign_1d(args.accounts, args.campaigns, args.days)
+    print(f"Filas: {len(df):,} ({args.accounts} cuentas x {args.campaigns} campañas x {args.days} días)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Regresión sobre una muestra con huecos (ordenada por fecha, como el histórico)
+        sample = df.sample(frac=0.02, random_state=7).sort_values('date', kind='stable')
+        assert_same(preparar_weekly_loop(sample[REPORT_COLS]),
+                    preparar_weekly_rollup(weekly_cube(sample, os.path.join(tmp, "sample"))))
+        print(f"Muestra con huecos ({len(sample):,} filas): salida idéntica")
+
+        t_cube, cube = timed(lambda: weekly_cube(df, os.path.join(tmp, "full")))
+        t_loop, out_loop = timed(lambda: preparar_weekly_loop(df[REPORT_COLS]))
+        t_rollup, out_rollup = timed(lambda: preparar_weekly_rollup(cube))
+    assert_same(out_loop, out_rollup)
+    print("Dataset completo: salida idéntica")
+    print(f"{'versión':<22}{'segundos':>10}")
+    print(f"{'fila por fila (diario)':<22}{t_loop:>10.2f}")
+    print(f"{'desde el cubo':<22}{t_rollup:>10.2f}")
+    print(f"speedup: {t_loop / t_rollup:.1f}x (armar el cubo desde cero: {t_cube:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Parsers fila por fila de referencia (los bucles que usaba a01.py antes de
+flatten_actions) y ColumnBuffer, que acumula sus tuplas en arrays tipados.
+
+Solo los usan los benchmarks para comparar y verificar que flatten_campaign_chunk
+/ flatten_ad_chunk produzcan las mismas columnas.
+"""
+
+from array import array
+
+import numpy as np
+import pandas as pd
+
+_TYPECODES = {'f8': 'd', 'i8': 'q'}
+
+
+def parse_campaign_row(label, r):
+    """Fila de insights nivel campaña -> tupla en el orden de CAMPAIGN_SCHEMA."""
+    spend = float(r.get('spend', 0))
+    impressions = int(r.get('impressions', 0))
+    reach = int(r.get('reach', 0))
+    clicks_all = int(r.get('clicks', 0))
+    ctr = float(r.get('ctr', 0)) if r.get('ctr') is not None else 0.0
+    uniq_ctr = float(r.get('unique_link_clicks_ctr', 0)) if r.get('unique_link_clicks_ctr') is not None else 0.0
+
+    # video 25
+    video25 = 0
+    for v in r.get('video_p25_watched_actions', []) or []:
+        if isinstance(v, dict) and v.get('action_type') == 'video_view':
+            try:
+                video25 += int(v.get('value', 0))
+            except (TypeError, ValueError):
+                pass
+
+    # actions
+    link_clicks = 0
+    messaging_started = 0
+    two_way_conv = 0
+    for a in r.get('actions', []) or []:
+        at = a.get('action_type')
+        try:
+            val = int(a.get('value', 0))
+        except (TypeError, ValueError):
+            val = 0
+        if at == 'link_click':
+            link_clicks = val
+        elif at in ('onsite_conversion.messaging_conversation_started_7d',
+                    'onsite_conversion.messaging_conversation_started',
+                    'onsite_conversion.messaging_first_reply'):
+            messaging_started = val if messaging_started == 0 else messaging_started
+        elif at == 'onsite_conversion.messaging_user_depth_2_message_send':
+            two_way_conv = val
+
+    return (
+        label, r.get('date_start'), r.get('campaign_id'), r.get('campaign_name'),
+        spend, impressions, reach, video25, clicks_all, link_clicks,
+        ctr, uniq_ctr, messaging_started, two_way_conv,
+    )
+
+
+def extract_stats(record):
+    # 1) Total de reproducciones iniciadas (plays)
+    video_plays_total = 0
+    for v in record.get("video_play_actions", []) or []:
+        if isinstance(v, dict) and v.get("action_type") == "video_view":
+            try:
+                video_plays_total += int(v.get("value", 0))
+            except (TypeError, ValueError):
+                pass
+
+    # 2) Curva de retención: lista de % por segundo
+    curve_values = []
+    for entry in record.get("video_play_curve_actions", []) or []:
+        if not isinstance(entry, dict):
+            continue
+        if entry.get("action_type") != "video_view":
+            continue
+        vals = entry.get("value", [])
+        if isinstance(vals, list):
+            curve_values = vals
+        break
+
+    # % que llega al segundo 3
+    if len(curve_values) > 3:
+        try:
+            pct_3s = float(curve_values[3] or 0)
+        except (TypeError, ValueError):
+            pct_3s = 0.0
+    else:
+        pct_3s = 0.0
+
+    if video_plays_total > 0 and pct_3s > 0:
+        video_3s_views = round(video_plays_total * (pct_3s / 100.0))
+    else:
+        video_3s_views = 0
+
+    # 3) Vistas al 100%
+    video_100pct_views = 0
+    for v in record.get("video_p100_watched_actions", []) or []:
+        if isinstance(v, dict) and v.get("action_type") == "video_view":
+            try:
+                video_100pct_views += int(v.get("value", 0))
+            except (TypeError, ValueError):
+                pass
+
+    return video_3s_views, video_100pct_views, video_plays_total, pct_3s
+
+
+def parse_ad_row(label, r):
+    """Fila de insights nivel anuncio -> tupla en el orden de AD_SCHEMA."""
+    impressions = int(r.get("impressions", 0) or 0)
+    video_3s, video_100pct, video_plays, pct_3s = extract_stats(r)
+
+    retention_3s_pct = (video_3s / impressions) if impressions > 0 else 0
+    retention_complete_pct = (video_100pct / video_3s) if video_3s > 0 else 0
+
+    return (
+        label, r.get("ad_id"), r.get("campaign_id"), r.get("date_start"),
+        impressions, video_plays, video_3s, video_100pct,
+        retention_3s_pct, retention_complete_pct, video_100pct, pct_3s,
+    )
+
+
+class ColumnBuffer:
+    """
+    Acumula tuplas en arrays tipados por columna y las vuelca a DataFrames
+    de a lo más chunk_size filas.
+    """
+
+    def __init__(self, schema, chunk_size=50_000):
+        self.schema = list(schema)
+        self.chunk_size = chunk_size
+        self.chunks = []
+        self.rows = 0
+        self._reset()
+
+    def _reset(self):
+        self._cols = [array(_TYPECODES[t]) if t in _TYPECODES else [] for _, t in self.schema]
+        self._n = 0
+
+    def __len__(self):
+        return self.rows
+
+    def append(self, values):
+        for col, v in zip(self._cols, values):
+            col.append(v)
+        self._n += 1
+        self.rows += 1
+        if self._n >= self.chunk_size:
+            self.flush()
+
+    def extend(self, rows, parse, label):
+        """Parsea y agrega filas de un cursor/iterable sin materializarlo."""
+        for r in rows:
+            self.append(parse(label, r))
+
+    def flush(self):
+        if self._n == 0:
+            return
+        data = {}
+        for (name, t), col in zip(self.schema, self._cols):
+            if t in _TYPECODES:
+                data[name] = np.frombuffer(col, dtype=t)
+            else:
+                data[name] = pd.Series(col, dtype=object)
+        self.chunks.append(pd.DataFrame(data))
+        self._reset()
+
+    def to_frame(self) -> pd.DataFrame:
+        """Concatena todos los chunks en un DataFrame con los tipos del esquema."""
+        self.flush()
+        if not self.chunks:
+            return pd.DataFrame({
+                name: pd.Series(dtype=t if t in _TYPECODES else object) for name, t in self.schema
+            })
+        df = pd.concat(self.chunks, ignore_index=True)
+        self.chunks = [df]
+        return df
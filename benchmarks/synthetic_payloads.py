@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Payloads sintéticos con la forma de AdsInsights para los benchmarks.
+Deterministas (semilla fija) para que las corridas sean comparables.
+"""
+
+import random
+
+MESSAGING_TYPES = [
+    'onsite_conversion.messaging_conversation_started_7d',
+    'onsite_conversion.messaging_first_reply',
+    'onsite_conversion.messaging_user_depth_2_message_send',
+]
+
+
+def synthetic_ad_rows(n, seed=7):
+    """Genera n filas nivel anuncio (métricas de video)."""
+    rnd = random.Random(seed)
+    for i in range(n):
+        plays = rnd.randint(0, 5000)
+        yield {
+            "ad_id": str(120200000000000 + i % 5000),
+            "campaign_id": str(120100000000000 + i % 300),
+            "date_start": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            "impressions": str(rnd.randint(100, 50000)),
+            "video_play_actions": [{"action_type": "video_view", "value": str(plays)}],
+            "video_play_curve_actions": [{
+                "action_type": "video_view",
+                "value": [100, 80, 60, 45, 40, 35, 30, 25, 20, 18, 15, 12, 10, 8, 6, 4],
+            }],
+            "video_p100_watched_actions": [{"action_type": "video_view", "value": str(plays // 10)}],
+        }
+
+
+def synthetic_campaign_rows(n, seed=11):
+    """Genera n filas nivel campaña con arrays de actions realistas."""
+    rnd = random.Random(seed)
+    for i in range(n):
+        impressions = rnd.randint(500, 80000)
+        clicks = rnd.randint(0, impressions // 20)
+        actions = [
+            {"action_type": "post_engagement", "value": str(rnd.randint(0, 900))},
+            {"action_type": "link_click", "value": str(rnd.randint(0, clicks))},
+            {"action_type": "video_view", "value": str(rnd.randint(0, 4000))},
+        ]
+        for t in rnd.sample(MESSAGING_TYPES, rnd.randint(0, 3)):
+            actions.append({"action_type": t, "value": str(rnd.randint(0, 60))})
+        yield {
+            "date_start": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            "campaign_id": str(120100000000000 + i % 300),
+            "campaign_name": f"campaña_{i % 300}",
+            "spend": f"{rnd.uniform(1, 400):.2f}",
+            "impressions": str(impressions),
+            "reach": str(int(impressions * 0.7)),
+            "clicks": str(clicks),
+            "ctr": f"{clicks / impressions * 100:.6f}",
+            "unique_link_clicks_ctr": f"{rnd.uniform(0, 3):.6f}",
+            "video_p25_watched_actions": [{"action_type": "video_view", "value": str(rnd.randint(0, 3000))}],
+            "actions": actions,
+        }
+
+
+def synthetic_campaign_1d(accounts=2, campaigns=50, days=365, start='2022-01-01', seed=3):
+    """DataFrame con el esquema de campaign_1d (una fila por cuenta/campaña/día)."""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=days, freq='D')
+    acc = np.repeat([f"cuenta{a}" for a in range(accounts)], campaigns * days)
+    camp = np.tile(np.repeat(np.arange(campaigns), days), accounts)
+    n = len(acc)
+    impressions = rng.integers(100, 50_000, n)
+    clicks = (impressions * rng.uniform(0.001, 0.05, n)).astype(int)
+    link_clicks = (clicks * rng.uniform(0.2, 0.9, n)).astype(int)
+    return pd.DataFrame({
+        'account_id': acc,
+        'date': np.tile(dates.date, accounts * campaigns),
+        'campaign_id': (120100000000000 + camp).astype(str),
+        'campaign_name': np.char.add('campaña_', camp.astype(str)),
+        'spend': rng.uniform(1, 400, n).round(2),
+        'impressions': impressions,
+        'reach': (impressions * 0.7).astype(int),
+        'video_25pct': rng.integers(0, 3000, n),
+        'clicks_all': clicks,
+        'link_clicks': link_clicks,
+        'ctr': clicks / impressions * 100,
+        'unique_link_clicks_ctr': link_clicks / impressions * 100,
+        'messaging_started': rng.integers(0, 40, n),
+        'two_way_conversations': rng.integers(0, 20, n),
+    })
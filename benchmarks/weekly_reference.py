@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Agregación semanal de referencia sobre las filas diarias de campaign_1d: la
+versión original del reporte semanal (apply por fila), antes de los cubos de
+rollups.py. Los benchmarks la usan para verificar preparar_weekly_rollup.
+"""
+
+import pandas as pd
+
+from weekly import MES_MAP, weekly_metrics
+
+
+def preparar_weekly_loop(df_campaign_1d: pd.DataFrame):
+    """Versión original fila por fila (referencia)."""
+    df = df_campaign_1d.copy()
+    df['date'] = pd.to_datetime(df['date'])
+    df['week_period'] = df['date'].dt.to_period('W-MON')
+    df['week_start'] = df['week_period'].apply(lambda p: p.start_time)
+
+    df['semester'] = df['date'].dt.to_period('M')
+    df['week_of_month'] = (
+        df.groupby('semester')['week_period']
+          .transform(lambda x: pd.factorize(x)[0] + 1)
+    )
+
+    df['period'] = df.apply(
+        lambda r: f"{r['date'].year}_{MES_MAP[r['date'].month]}_semana{r['week_of_month']}",
+        axis=1
+    )
+
+    df_weekly = weekly_metrics(df)
+
+    map_period = (
+        df[['week_start', 'period']]
+          .drop_duplicates()
+          .set_index('period')['week_start']
+    )
+
+    inv_map = (
+        df[['week_start', 'period']]
+          .drop_duplicates(subset='week_start')
+          .set_index('week_start')['period']
+    )
+
+    df_weekly['period'] = df_weekly.index.map(inv_map)
+    return df, df_weekly, map_period
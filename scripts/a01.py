@@ -4,41 +4,83 @@ Script para extraer datos de campañas de Meta a nivel diario
 Convertido desde notebook meta_campaign_1d.ipynb
 """
 
-# Importar librerías
-from facebook_business.api import FacebookAdsApi
-from facebook_business.adobjects.adaccount import AdAccount
-from datetime import datetime, date, timedelta
-from dateutil.relativedelta import relativedelta
+# Importar librerías (facebook_business, matplotlib y xlsxwriter se importan al usarse)
+import argparse
+import json
+from datetime import datetime, date
 import pandas as pd
-import re
 import time
 import numpy as np
 import os
-from pathlib import Path
 import shutil
 import sys
-import traceback
+import threading
 import logging
-import xlsxwriter
 
 # Configurar logging para guardar en archivo en lugar de imprimir en consola
 # Detectar si se ejecuta en Power BI Desktop
 POWER_BI_MODE = 'powerbi' in sys.executable.lower() if sys.executable else False
 
-# Determinar rutas base según entorno
-if POWER_BI_MODE:
+# Determinar rutas base según entorno (META_BASE_DIR apunta a otra carpeta, p. ej. benchmarks)
+if os.environ.get('META_BASE_DIR'):
+    BASE_DIR = os.environ['META_BASE_DIR']
+elif POWER_BI_MODE:
     # En Power BI: usar rutas absolutas (directorio temporal)
     BASE_DIR = r"C:\Users\Lima - Rodrigo\Documents\3pro\meta\reporte_semanal"
 else:
     # En terminal: usar rutas relativas desde scripts/
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Módulos auxiliares (viven junto a este script)
+SCRIPTS_DIR = os.path.join(BASE_DIR, "scripts") if POWER_BI_MODE else os.path.dirname(os.path.abspath(__file__))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+from insights_planner import InsightsPlanner, MetaInsightsClient
+from rate_limit import TokenBucket
+from extraction_engine import run_windows
+from async_reports import AsyncReportRunner, MetaAsyncReportClient
+from record_stream import RowChunker, chunk_rows, CAMPAIGN_SCHEMA, AD_SCHEMA
+from flatten_actions import flatten_campaign_chunk, flatten_ad_chunk, load_action_mapping
+from storage import DatasetStore, upsert_csv
+from data_context import RunDataContext
+from manifest import Manifest, csv_coverage
+from weekly import MES_MAP, preparar_weekly_rollup
+from rollups import RollupStore, ADDITIVE_COLS
+from comparisons import weekly_comparisons, tabla_variaciones, tabla_valores
+from powerbi_frame import compact_powerbi_frame, memory_report
+from powerbi_delta import PartitionedExport, changed_partitions
+from backfill import day_span, missing_cells, plan_backfill, print_plan, rows_per_day
+from pipeline import Pipeline
+from run_metrics import RunMetrics
+from response_cache import ResponseCache, CacheMissError
+from union_extract import UNION_FIELDS, UNION_SCHEMA, flatten_union_chunk, campaign_from_ads, ads_from_union
+from api_retry import AUTH, DeadLetters, RetryPolicy, classify
+
 log_dir = os.path.join(BASE_DIR, "logs")
 os.makedirs(log_dir, exist_ok=True)
 
 # Crear nombre de archivo con timestamp
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+RUN_STARTED_AT = datetime.now()
+timestamp = RUN_STARTED_AT.strftime("%Y%m%d_%H%M%S")
 log_file = os.path.join(log_dir, f"meta_extractor_{timestamp}.log")
+# Métricas por etapa y por llamada a la API (JSON lines junto al log, ver run_metrics.py)
+metrics = RunMetrics(os.path.join(log_dir, f"meta_extractor_{timestamp}.metrics.jsonl"))
+
+# Perfilado por etapa (ver stage_profiler.py), opcional por variable de entorno:
+# META_PROFILE=sample (o 1): muestreo de pilas -> logs/<corrida>.collapsed (flamegraph)
+# META_PROFILE=cprofile: además cProfile por etapa (.prof y resumen .prof.txt)
+# META_PROFILE_MEMORY=0 desactiva el diff de tracemalloc por etapa (.memory.txt)
+PROFILE_MODE = os.getenv("META_PROFILE", "").lower()
+if PROFILE_MODE == '1':
+    PROFILE_MODE = 'sample'
+PROFILE_INTERVAL_MS = 10
+profiler = None
+if PROFILE_MODE in ('sample', 'cprofile'):
+    from stage_profiler import StageProfiler
+    profiler = StageProfiler(os.path.join(log_dir, f"meta_extractor_{timestamp}"), mode=PROFILE_MODE,
+                             memory=os.getenv("META_PROFILE_MEMORY", "1") != "0",
+                             interval=PROFILE_INTERVAL_MS / 1000, metrics=metrics)
 
 # Configurar el logger
 if POWER_BI_MODE:
@@ -81,278 +123,534 @@ if not POWER_BI_MODE:
     sys.stderr = LoggerWriter(logger, logging.ERROR)
 
 # ------------------ CONFIG ------------------
+# Argumentos de la corrida (en Power BI no hay argumentos: corren todas las etapas)
+parser = argparse.ArgumentParser(description="Extracción de Meta y reportes, por etapas (ver pipeline.py)")
+parser.add_argument('--dry-run', action='store_true', help="solo imprime el plan de extracción y sus requests estimados")
+parser.add_argument('--only', help="etapas a correr, separadas por coma (p. ej. weekly_report,excel_export)")
+parser.add_argument('--from', dest='from_stage', help="corre esta etapa y las que dependen de ella")
+parser.add_argument('--force', action='store_true', help="corre las etapas aunque sus entradas no hayan cambiado")
+parser.add_argument('--offline', action='store_true', help="sin API: las extracciones leen solo del cache de respuestas")
+parser.add_argument('--powerbi-snapshot', action='store_true', help="reescribe powerbi_ready.csv/.parquet completos")
+ARGS, _ = parser.parse_known_args([] if POWER_BI_MODE else None)
+
+# Dry-run: solo imprime el plan de extracción y sus requests estimados
+DRY_RUN = ARGS.dry_run or os.getenv("META_DRY_RUN") == "1"
+
+# Offline: toda la corrida (extracciones, reporte, Power BI, Excel) sale del cache
+# de respuestas; no hace falta el SDK ni credenciales
+OFFLINE = ARGS.offline or os.getenv("META_OFFLINE") == "1"
+
+# Snapshot completo powerbi_ready.csv/.parquet aunque el export sea incremental
+POWERBI_SNAPSHOT = ARGS.powerbi_snapshot or os.getenv("META_POWERBI_SNAPSHOT") == "1"
+
+# API sintética en lugar de Meta (ver synthetic_meta.py): JSON con sus parámetros,
+# p. ej. '{"campaigns": 50, "ads": 3, "latency_s": 0.02}'. Sin credenciales ni SDK
+SYNTHETIC_API = os.getenv("META_SYNTHETIC")
+
+# Las credenciales se validan al inicializar la API (solo las etapas de extracción)
 my_app_id       = os.getenv("META_APP_ID")
 my_app_secret   = os.getenv("META_APP_SECRET")
 my_access_token = os.getenv("META_ACCESS_TOKEN")
-if not all([my_app_id, my_app_secret, my_access_token]):
-    raise RuntimeError("Faltan variables de entorno de Meta (META_APP_ID / META_APP_SECRET / META_ACCESS_TOKEN)")
 account_map = {
     'act_266875535124705': 'tla',
     'act_172227634833453': 'illapa',
 }
 
+# Máximo de días por consulta de insights nivel campaña (None = sin tope; además
+# el rango se parte si Meta responde que es demasiado grande). Cada ventana se
+# lee completa antes de pasar al chunker (para reintentos y cache), así que el
+# tope acota la memoria por ventana en los backfills largos
+MAX_RANGE_DAYS = 31
+
+# Extracción concurrente: hilos y presupuesto compartido de llamadas a la API
+MAX_WORKERS = 4
+API_RATE_PER_SEC = 1.0   # llamadas por segundo en régimen
+API_BURST = 4            # ráfaga máxima
+
+# 'separate': consultas nivel campaña (campaign_1d) y nivel anuncio (segunda_tabla)
+# por separado. 'union': una sola consulta nivel anuncio con la unión de fields;
+# campaign_1d se agrega localmente (ver union_extract.py: reach queda como suma de
+# los anuncios, una cota superior) y la etapa extract_ads no llama a la API
+EXTRACTION_MODE = 'separate'
+
+# Nivel anuncio con reportes asíncronos (AdReportRun) para backfills grandes
+USE_ASYNC_REPORTS = False
+ASYNC_MAX_JOBS = 4        # jobs en curso a la vez
+ASYNC_POLL_SECONDS = 5.0
+
+# Backfill: los días a pedir salen de la cobertura guardada (días nuevos + huecos)
+BACKFILL_REFETCH_DAYS = 3        # días recientes que se vuelven a pedir (Meta revisa la atribución)
+BACKFILL_NEW_ACCOUNT_DAYS = 7    # días a pedir para una cuenta sin histórico
+BACKFILL_BRIDGE_DAYS = 2         # huecos de hasta N días con datos se piden en el mismo request
+BACKFILL_REQUEST_BUDGET = 200    # requests estimados por corrida y nivel (None = sin tope)
+
+# Filas por chunk al parsear insights a buffers columnares
+PARSE_CHUNK_ROWS = 50_000
+
+# Cache en disco de respuestas de get_insights (ver response_cache.py). Los rangos
+# cuyo último día ya salió de la ventana de atribución no vencen; los recientes
+# vencen a las CACHE_RECENT_TTL_HOURS horas
+CACHE_ENABLED = True
+CACHE_DIR = os.path.join(BASE_DIR, "datasets", "cache", "insights")
+CACHE_MAX_MB = 500
+CACHE_ATTRIBUTION_DAYS = 7
+CACHE_RECENT_TTL_HOURS = 6
+
+# Reintentos de API (ver api_retry.py): back-off exponencial con jitter para
+# rate limit (códigos 4/17/32/613/80000+) y errores transitorios (1/2, 5xx), con
+# un presupuesto de reintentos por corrida y un circuit breaker por cuenta. Las
+# ventanas que fallan igual quedan en DEAD_LETTER_PATH y se piden primero en la
+# próxima corrida
+RETRY_MAX_ATTEMPTS = 4
+RETRY_BASE_SECONDS = 2.0
+RETRY_RATE_LIMIT_SECONDS = 60.0
+RETRY_MAX_SECONDS = 300.0
+RETRY_BUDGET = 40                  # reintentos por corrida entre todas las consultas
+BREAKER_FAILURES = 3               # consultas fallidas seguidas que abren el circuito de una cuenta
+BREAKER_COOLDOWN_SECONDS = 900
+DEAD_LETTER_PATH = os.path.join(BASE_DIR, "datasets", "data", "_dead_letters.json")
+
+# Etapas en paralelo (las independientes, p. ej. nivel anuncio y reporte semanal)
+# y huellas de entrada de la última corrida exitosa de cada etapa
+PIPELINE_WORKERS = 2
+PIPELINE_STATE_PATH = os.path.join(BASE_DIR, "datasets", "data", "_pipeline_state.json")
+
+# Mapeo action_type -> columna (JSON opcional; sin archivo se usa el mapeo por defecto)
+ACTION_MAPPING_PATH = os.path.join(SCRIPTS_DIR, "action_mapping.json")
+
 # Path al CSV existente (ajusta si tu archivo tiene otro nombre/ruta)
 output_path = os.path.join(BASE_DIR, "datasets", "data", "campaign_1d")
 # Haz backup por seguridad
 backup_path = output_path + '_backup_before_append.csv'
 
-# Rango que quieres traer (inclusive)
-# Detectar automáticamente última fecha y extraer siguientes 7 días
-if os.path.exists(output_path):
+# Almacenamiento: 'csv' (histórico), 'parquet' o 'feather'. Con parquet/feather los
+# datos viven particionados por cuenta y mes; el CSV queda como export para Power BI.
+STORAGE_BACKEND = 'parquet'
+EXPORT_CSV = True
+CAMPAIGN_STORE_DIR = os.path.join(BASE_DIR, "datasets", "data", "campaign_1d_store")
+ADS_STORE_DIR = os.path.join(BASE_DIR, "datasets", "data", "ads_video_1d_store")
+# Cubos semanales / mensuales por cuenta y campaña (ver rollups.py)
+ROLLUP_DIR = os.path.join(BASE_DIR, "datasets", "data", "rollups")
+
+CAMPAIGN_KEYS = ['account_id', 'date', 'campaign_id']
+
+# Manifiesto del CSV (con parquet/feather el store mantiene el suyo en _manifest.json)
+campaign_manifest = Manifest(output_path + '.manifest.json', 'account_id', 'date', CAMPAIGN_KEYS)
+
+campaign_store = None
+if STORAGE_BACKEND != 'csv':
+    campaign_store = DatasetStore(CAMPAIGN_STORE_DIR, 'account_id', 'date',
+                                  keys=CAMPAIGN_KEYS, text_cols=['campaign_id', 'campaign_name'], backend=STORAGE_BACKEND)
+
+# Segunda tabla (nivel anuncio): CSV para Power BI, manifiesto y store
+OUTPUT_CSV_ADS = os.path.join(BASE_DIR, "datasets", "data", "campaign_video_3s_100pct_1d_ads.csv")
+ADS_KEYS = ["account", "ad_id", "campaign_id", "date_start"]
+ads_manifest = Manifest(OUTPUT_CSV_ADS + ".manifest.json", "account", "date_start", ADS_KEYS)
+ads_store = None
+if STORAGE_BACKEND != 'csv':
+    ads_store = DatasetStore(ADS_STORE_DIR, "account", "date_start", keys=ADS_KEYS,
+                             text_cols=["ad_id", "campaign_id"], backend=STORAGE_BACKEND)
+
+
+def migrar_a_store(store, csv_path):
+    """
+    Migración única del CSV histórico al store, desde la etapa de extracción
+    (no al importar el módulo ni en dry-run, que no modifica archivos).
+    """
+    if store is None or DRY_RUN or store.exists() or not os.path.exists(csv_path):
+        return
+    store.import_csv(csv_path)
+
+
+def store_campaign_1d():
+    """campaign_store si ya tiene datos; None con backend 'csv' o antes de migrar (se lee el CSV)."""
+    return campaign_store if campaign_store is not None and campaign_store.exists() else None
+
+
+def campaign_1d_existe():
+    return store_campaign_1d() is not None or os.path.exists(output_path)
+
+
+def leer_campaign_1d(columns=None, start=None, end=None) -> pd.DataFrame:
+    """
+    Lee campaign_1d cargando solo las columnas y fechas pedidas.
+    Con STORAGE_BACKEND='csv' (o sin migrar) lee el CSV completo y filtra en memoria.
+    """
+    store = store_campaign_1d()
+    if store is not None:
+        return store.read(columns=columns, start=start, end=end)
+    usecols = None if columns is None else list(dict.fromkeys(list(columns) + ['date']))
+    df = pd.read_csv(output_path, encoding='utf-8-sig', usecols=usecols)
+    if start is not None or end is not None:
+        dates = pd.to_datetime(df['date'])
+        mask = pd.Series(True, index=df.index)
+        if start is not None:
+            mask &= dates >= pd.Timestamp(start)
+        if end is not None:
+            mask &= dates <= pd.Timestamp(end)
+        df = df[mask].reset_index(drop=True)
+    return df if columns is None else df[list(columns)]
+
+
+def upsert_campaign_1d(df_new: pd.DataFrame) -> dict:
+    """
+    Agrega/actualiza filas de campaign_1d tocando solo las particiones (o la cola
+    del CSV) de las fechas nuevas. Con EXPORT_CSV también actualiza el CSV de Power BI.
+    """
+    if campaign_store is None:
+        return upsert_csv(output_path, df_new, CAMPAIGN_KEYS, manifest=campaign_manifest)
+    stats = campaign_store.upsert(df_new)
+    if EXPORT_CSV:
+        if os.path.exists(output_path):
+            upsert_csv(output_path, df_new, CAMPAIGN_KEYS)
+        else:
+            campaign_store.export_csv(output_path, sort_by=CAMPAIGN_KEYS)
+    return stats
+
+
+def cobertura_campaign_1d():
+    """
+    Cobertura por cuenta (última fecha, huecos) sin parsear el histórico: sale
+    del manifiesto; si falta o quedó desactualizado, del último mes del store
+    o de la cola del CSV.
+    """
+    store = store_campaign_1d()
+    if store is not None:
+        return store.coverage()
+    return csv_coverage(output_path, campaign_manifest)
+
+
+def manifest_campaign_1d():
+    store = store_campaign_1d()
+    return store.manifest if store is not None else campaign_manifest
+
+
+def con_fechas(rows, fechas):
+    """Pasa las filas tal cual y anota sus date_start (para detectar días vacíos)."""
+    for r in rows:
+        fechas.add(r.get('date_start'))
+        yield r
+
+
+def fechas_de(chunks, col):
+    """Fechas de las filas ya aplanadas de una ventana (para detectar días vacíos)."""
+    return set().union(*(c[col].dropna() for c in chunks))
+
+
+def tamano_campaign_1d():
+    store = store_campaign_1d()
+    if store is not None:
+        return store.size_bytes()
+    return os.path.getsize(output_path) if os.path.exists(output_path) else 0
+
+
+# campaign_1d se lee y normaliza una sola vez; cada etapa recibe vistas del contexto
+data_ctx = RunDataContext(leer_campaign_1d, keys=CAMPAIGN_KEYS, date_col='date',
+                          text_cols=['account_id', 'campaign_id', 'campaign_name'],
+                          size_bytes=tamano_campaign_1d)
+
+rollups = RollupStore(ROLLUP_DIR, backend=STORAGE_BACKEND)
+ROLLUP_COLS = ['account_id', 'campaign_id', 'campaign_name', 'date'] + ADDITIVE_COLS
+
+
+def actualizar_rollups(df_new=None):
+    """
+    Mantiene los cubos: si no existen se arman desde el histórico completo; si
+    existen solo se recalculan las semanas y meses que tocan las fechas de df_new.
+    """
+    if not rollups.exists():
+        rollups.rebuild(data_ctx.view('rollups', columns=ROLLUP_COLS))
+        print(f"Rollups creados en: {ROLLUP_DIR}")
+        return
+    if df_new is None or len(df_new) == 0:
+        return
+    touched = rollups.update(
+        lambda start, end: data_ctx.view('rollups', columns=ROLLUP_COLS, start=start, end=end),
+        df_new['date'],
+    )
+    print(f"Rollups actualizados: {touched['week']} semanas, {touched['month']} meses")
+
+def planear_campaign_1d():
+    """
+    Plan de extracción: días nuevos hasta ayer, huecos por cuenta y re-extracción
+    de los días recientes, hasta el presupuesto de requests.
+    Devuelve (ventanas, diferidas, estimado).
+    """
+    if not campaign_1d_existe():
+        raise RuntimeError(f"No existe el archivo CSV ({output_path}). Deteniendo extracción.")
     try:
-        df_existing = pd.read_csv(output_path, encoding='utf-8-sig', parse_dates=['date'])
-        df_existing['date'] = pd.to_datetime(df_existing['date']).dt.date
-        last_date = df_existing['date'].max()
-        START_DATE = last_date + timedelta(days=1)
-        END_DATE = last_date + timedelta(days=7)
-        print(f"Última fecha encontrada: {last_date}")
-        print(f"Extrayendo rango: {START_DATE} → {END_DATE} (7 días)")
+        campaign_coverage = cobertura_campaign_1d()
+        campaign_cells = missing_cells(campaign_coverage, account_map, date.today(),
+                                       refetch_days=BACKFILL_REFETCH_DAYS,
+                                       new_account_days=BACKFILL_NEW_ACCOUNT_DAYS)
+        campaign_windows, campaign_deferred, campaign_estimate = plan_backfill(
+            campaign_cells, account_map, max_days=MAX_RANGE_DAYS, bridge_days=BACKFILL_BRIDGE_DAYS,
+            budget=BACKFILL_REQUEST_BUDGET, rows_per_day=rows_per_day(campaign_coverage))
     except Exception as e:
         print(f"Error leyendo CSV existente: {e}")
-        print("ERROR CRÍTICO: No se puede determinar el rango de fechas. Deteniendo ejecución.")
-        sys.exit(1)
-else:
-    print("ERROR: No existe el archivo CSV. Deteniendo ejecución.")
-    sys.exit(1)
-# --------------------------------------------
-
-# Inicializa API
-FacebookAdsApi.init(my_app_id, my_app_secret, my_access_token)
-
-# Comprobaciones
-if not os.path.exists(output_path):
-    print(f"ERROR: no encuentro el archivo existente en: {output_path}")
-    sys.exit(1)
-
-# Backup rápido
-try:
-    pd.read_csv(output_path, encoding='utf-8-sig').to_csv(backup_path, index=False, encoding='utf-8-sig')
-    print(f"Backup creado en: {backup_path}")
-except Exception as e:
-    print("Warning: no pude crear backup automático (pero continuaré).", e)
-
-# Generar días a extraer
-if START_DATE > END_DATE:
-    raise ValueError("START_DATE no puede ser mayor que END_DATE.")
-
-day_ranges = []
-d = START_DATE
-while d <= END_DATE:
-    day_ranges.append((d.isoformat(), d.isoformat()))
-    d += timedelta(days=1)
-
-records = []
-requests_counter = 0
-
-for account_id, account_label in account_map.items():
-    ad_account = AdAccount(account_id)
-    print(f"-> Extrayendo cuenta {account_label} ({account_id})")
-
-    for since, until in day_ranges:
-        try:
-            insights = ad_account.get_insights(
-                fields=[
-                    'date_start',
-                    'campaign_id', 'campaign_name',
-                    'spend', 'impressions', 'reach',
-                    'video_p25_watched_actions',
-                    'clicks', 'ctr', 'unique_link_clicks_ctr',
-                    'actions',
-                ],
-                params={
-                    'time_range': {'since': since, 'until': until},
-                    'level': 'campaign',
-                    'time_increment': 1,
-                },
-            )
-            requests_counter += 1
-        except Exception as e:
-            print(f"Warning: fallo API para {since} - {until} en {account_label}: {e}")
-            traceback.print_exc()
-            time.sleep(3)
+        raise RuntimeError("No se puede determinar el rango de fechas. Deteniendo extracción.") from e
+    last_dates = [info['max_date'] for info in campaign_coverage.values() if info.get('max_date')]
+    print(f"Última fecha encontrada: {max(last_dates) if last_dates else '-'}")
+    # Ventanas que fallaron en corridas anteriores van primero
+    campaign_windows = dead_letters.merge_plan(CAMPAIGN_SOURCE, campaign_windows, account_map, MAX_RANGE_DAYS)
+    print_plan(campaign_windows, campaign_deferred, campaign_estimate, "Plan nivel campaña")
+    return campaign_windows, campaign_deferred, campaign_estimate
+
+
+def planear_ads():
+    """
+    Plan del nivel anuncio, con su propia cobertura (puede diferir de la de
+    campañas). Devuelve (ventanas, diferidas, estimado).
+    """
+    # Los jobs asíncronos no pasan por el cache: offline se usa la consulta por día
+    use_async = USE_ASYNC_REPORTS and not OFFLINE
+    if ads_store is not None and ads_store.exists():
+        ads_coverage = ads_store.coverage()
+    else:
+        ads_coverage = csv_coverage(OUTPUT_CSV_ADS, ads_manifest) if os.path.exists(OUTPUT_CSV_ADS) else {}
+    ads_cells = missing_cells(ads_coverage, account_map, date.today(),
+                              refetch_days=BACKFILL_REFETCH_DAYS,
+                              new_account_days=BACKFILL_NEW_ACCOUNT_DAYS)
+    # Sin reportes asíncronos se mantiene una consulta por cuenta y día
+    ads_windows, ads_deferred, ads_estimate = plan_backfill(
+        ads_cells, account_map,
+        max_days=None if use_async else 1,
+        bridge_days=BACKFILL_BRIDGE_DAYS if use_async else 0,
+        budget=BACKFILL_REQUEST_BUDGET, rows_per_day=rows_per_day(ads_coverage))
+    ads_windows = dead_letters.merge_plan('ad', ads_windows, account_map, None if use_async else 1)
+    print_plan(ads_windows, ads_deferred, ads_estimate, "Plan nivel anuncio")
+    return ads_windows, ads_deferred, ads_estimate
+
+
+_api_lock = threading.Lock()
+_api_ready = False
+
+
+def iniciar_api():
+    """Inicializa FacebookAdsApi una sola vez (las etapas de extracción pueden correr en paralelo)."""
+    global _api_ready
+    with _api_lock:
+        if _api_ready or OFFLINE or synthetic_api is not None:
+            return
+        if not all([my_app_id, my_app_secret, my_access_token]):
+            raise RuntimeError("Faltan variables de entorno de Meta (META_APP_ID / META_APP_SECRET / META_ACCESS_TOKEN)")
+        from facebook_business.api import FacebookAdsApi
+        FacebookAdsApi.init(my_app_id, my_app_secret, my_access_token)
+        _api_ready = True
+
+
+# Limitador compartido por todas las consultas (campaña y anuncio)
+api_limiter = TokenBucket(rate=API_RATE_PER_SEC, capacity=API_BURST)
+# Clientes de la API: Meta o la API sintética (benchmarks)
+synthetic_api = None
+if SYNTHETIC_API:
+    from synthetic_meta import SyntheticMeta
+    synthetic_api = SyntheticMeta(**json.loads(SYNTHETIC_API))
+
+# Reintentos, presupuesto y circuit breaker compartidos por todas las consultas
+api_retry = RetryPolicy(max_attempts=RETRY_MAX_ATTEMPTS, base_s=RETRY_BASE_SECONDS,
+                        rate_limit_base_s=RETRY_RATE_LIMIT_SECONDS, max_delay_s=RETRY_MAX_SECONDS,
+                        budget=RETRY_BUDGET, breaker_failures=BREAKER_FAILURES,
+                        breaker_cooldown_s=BREAKER_COOLDOWN_SECONDS, limiter=api_limiter, metrics=metrics)
+dead_letters = DeadLetters(DEAD_LETTER_PATH)
+CAMPAIGN_SOURCE = 'union' if EXTRACTION_MODE == 'union' else 'campaign'
+
+
+def ventana_fallida(source, window, error):
+    """
+    Registra una ventana que falló tras los reintentos. Devuelve False si no
+    tiene sentido seguir (token inválido).
+    """
+    _, label, since, until = window
+    if isinstance(error, CacheMissError):
+        print(f"⚠️ {error}")  # offline: no es una falla de la API
+        return True
+    if classify(error) == AUTH:
+        print("ERROR: token inválido o expirado.")
+        return False
+    print(f"Warning: fallo API para {since} - {until} en {label}: {error}")
+    if not OFFLINE:
+        dead_letters.add(source, window, error)
+    return True
+
+response_cache = None
+if CACHE_ENABLED or OFFLINE:
+    response_cache = ResponseCache(CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024,
+                                   attribution_days=CACHE_ATTRIBUTION_DAYS,
+                                   recent_ttl=CACHE_RECENT_TTL_HOURS * 3600, offline=OFFLINE)
+
+# Filas nuevas de la corrida (las usa la etapa rollups)
+campaign_nuevo = None
+# Modo union: filas de anuncio y días vacíos que deja extract_campaign para extract_ads
+union_ads = None
+
+
+def extraer_campaign_1d():
+    """
+    Primera parte: extrae los días pendientes a nivel campaña y hace upsert en
+    campaign_1d. Deja las filas nuevas en campaign_nuevo y anota los (cuenta, día)
+    cambiados como pendientes del export de primera_tabla.
+    """
+    global campaign_nuevo, union_ads
+
+    migrar_a_store(campaign_store, output_path)
+    campaign_windows, _, _ = planear_campaign_1d()
+    if not campaign_windows:
+        print("No hay días pendientes para extraer. Se aborta sin modificar CSV.")
+        return
+
+    # Extremos del plan (para logs y como referencia de la corrida)
+    start_date = min(w[2] for w in campaign_windows)
+    end_date = max(w[3] for w in campaign_windows)
+
+    iniciar_api()
+
+    # Backup rápido
+    backup = backup_path
+    try:
+        if campaign_store is not None:
+            backup = campaign_store.backup(CAMPAIGN_STORE_DIR + '_backup_before_append')
+        else:
+            shutil.copyfile(output_path, backup)
+        print(f"Backup creado en: {backup}")
+    except Exception as e:
+        print("Warning: no pude crear backup automático (pero continuaré).", e)
+
+    # Filas nuevas en chunks aplanados por columnas (sin una lista de dicts por fila)
+    campaign_actions = load_action_mapping(ACTION_MAPPING_PATH)
+    union = EXTRACTION_MODE == 'union'
+    aplanar = lambda labels, rows: (flatten_union_chunk if union else flatten_campaign_chunk)(labels, rows, campaign_actions)
+    schema = UNION_SCHEMA if union else CAMPAIGN_SCHEMA
+    records = RowChunker(aplanar, schema, chunk_size=PARSE_CHUNK_ROWS)
+    # Cada hilo aplana las páginas de su cursor a medida que llegan (sin la lista de dicts de la ventana)
+    leer_ventana = lambda account_id, rows: chunk_rows(rows, account_map[account_id], aplanar, schema, PARSE_CHUNK_ROWS)
+
+    # Un solo request por rango de días contiguos (time_increment=1 devuelve filas diarias)
+    campaign_planner = InsightsPlanner(
+        synthetic_api or MetaInsightsClient(),
+        fields=UNION_FIELDS if union else [
+            'date_start',
+            'campaign_id', 'campaign_name',
+            'spend', 'impressions', 'reach',
+            'video_p25_watched_actions',
+            'clicks', 'ctr', 'unique_link_clicks_ctr',
+            'actions',
+        ],
+        params={
+            'level': 'ad' if union else 'campaign',
+            'time_increment': 1,
+        },
+        max_days=MAX_RANGE_DAYS,
+        limiter=api_limiter,
+        metrics=metrics,
+        source=CAMPAIGN_SOURCE,
+        cache=response_cache,
+        retry=api_retry,
+    )
+
+    print(f"-> Extrayendo cuentas {', '.join(account_map.values())} con hasta {MAX_WORKERS} consultas en paralelo")
+
+    dias_vacios = {}  # label -> días consultados sin filas
+    fetch = lambda account_id, since, until: campaign_planner.fetch_range(account_id, since, until, leer_ventana)
+    for window, chunks, error in run_windows(fetch, campaign_windows, max_workers=MAX_WORKERS):
+        account_id, account_label, since, until = window
+        if error is not None:
+            # La ventana queda en dead letters (y como hueco): la próxima corrida la pide primero
+            if not ventana_fallida(CAMPAIGN_SOURCE, window, error):
+                raise error
             continue
+        dead_letters.resolve(CAMPAIGN_SOURCE, window)
+
+        # Valores no numéricos quedan en 0 al aplanar (antes se descartaba el registro)
+        fechas = fechas_de(chunks, 'date')
+        records.add_chunks(chunks)
+        vacios = day_span(since, until) - {date.fromisoformat(f) for f in fechas if f}
+        dias_vacios.setdefault(account_label, set()).update(vacios)
+
+    for account_label, dias in dias_vacios.items():
+        manifest_campaign_1d().mark_empty(account_label, dias)
+
+    requests_counter = campaign_planner.requests_made
+    print(f"Consultas realizadas: {requests_counter}. Registros nuevos: {len(records)}")
+
+    if len(records) == 0:
+        print("No hay registros nuevos para las fechas solicitadas. Se aborta sin modificar CSV.")
+        return
+
+    # Crear df_new y normalizar fecha
+    df_new = records.to_frame()
+    if union:
+        # Una fila por anuncio: segunda_tabla sale tal cual y campaign_1d se agrega
+        union_ads = {'df': ads_from_union(df_new), 'vacios': dias_vacios}
+        df_new = campaign_from_ads(df_new)
+        print(f"Modo union: {len(union_ads['df'])} filas de anuncio -> {len(df_new)} filas de campaña. "
+              f"No aditivas: {', '.join(f'{c} = {d}' for c, d in df_new.attrs['non_additive'].items())}")
+    df_new['date'] = pd.to_datetime(df_new['date']).dt.date
+
+    # 🔹 Eliminar filas duplicadas en el df nuevo ANTES de unirlo
+    df_new = df_new.drop_duplicates(subset=CAMPAIGN_KEYS, keep='last')
+
+    # Upsert incremental: solo se tocan las particiones de las fechas nuevas
+    t_merge = time.perf_counter()
+    upsert_stats = upsert_campaign_1d(df_new)
+    data_ctx.merge(df_new)
+    metrics.record('step', stage='extract_campaign', step='merge', rows=len(df_new),
+                   seconds=round(time.perf_counter() - t_merge, 3))
+    campaign_nuevo = df_new
+    # (cuenta, día) que cambiaron, con el nombre de cuenta de primera_tabla: quedan en
+    # disco hasta que powerbi_transform los exporte (aunque esa etapa falle o no corra)
+    export_powerbi("primera_tabla").add_pending(
+        changed_partitions(df_new, 'account_id', 'date', rename=POWERBI_ACCOUNT_NAMES))
+
+    print("✅ CSV actualizado correctamente.")
+    print(f"Rango consultado: {start_date} → {end_date} ({len(campaign_windows)} ventanas)")
+    print(f"Filas nuevas: {upsert_stats['inserted']}. Filas actualizadas: {upsert_stats['updated']}")
+    return df_new
+
+
+def etapa_rollups():
+    """
+    Cubos semanales y mensuales: se actualizan las semanas y meses de las filas
+    nuevas; si campaign_1d cambió sin pasar por la extracción, se reconstruyen.
+    """
+    # En Power BI todas las etapas corren siempre: sin filas nuevas no hay nada que recalcular
+    if campaign_nuevo is None and rollups.exists() and not POWER_BI_MODE:
+        rollups.rebuild(data_ctx.view('rollups', columns=ROLLUP_COLS))
+        print(f"Rollups reconstruidos en: {ROLLUP_DIR}")
+        return
+    actualizar_rollups(campaign_nuevo)
 
-        for r in insights:
-            try:
-                spend = float(r.get('spend', 0))
-                impressions = int(r.get('impressions', 0))
-                reach = int(r.get('reach', 0))
-                clicks_all = int(r.get('clicks', 0))
-                ctr = float(r.get('ctr', 0)) if r.get('ctr') is not None else 0.0
-                uniq_ctr = float(r.get('unique_link_clicks_ctr', 0)) if r.get('unique_link_clicks_ctr') is not None else 0.0
-
-                # video 25
-                video25 = 0
-                for v in r.get('video_p25_watched_actions', []) or []:
-                    if isinstance(v, dict) and v.get('action_type') == 'video_view':
-                        try:
-                            video25 += int(v.get('value', 0))
-                        except:
-                            pass
-
-                # actions
-                link_clicks = 0
-                messaging_started = 0
-                two_way_conv = 0
-                for a in r.get('actions', []) or []:
-                    at = a.get('action_type')
-                    try:
-                        val = int(a.get('value', 0))
-                    except:
-                        val = 0
-                    if at == 'link_click':
-                        link_clicks = val
-                    elif at in ('onsite_conversion.messaging_conversation_started_7d',
-                                'onsite_conversion.messaging_conversation_started',
-                                'onsite_conversion.messaging_first_reply'):
-                        messaging_started = val if messaging_started == 0 else messaging_started
-                    elif at == 'onsite_conversion.messaging_user_depth_2_message_send':
-                        two_way_conv = val
-
-                records.append({
-                    'account_id': account_label,
-                    'date': r.get('date_start'),
-                    'campaign_id': r.get('campaign_id'),
-                    'campaign_name': r.get('campaign_name'),
-                    'spend': spend,
-                    'impressions': impressions,
-                    'reach': reach,
-                    'video_25pct': video25,
-                    'clicks_all': clicks_all,
-                    'link_clicks': link_clicks,
-                    'ctr': ctr,
-                    'unique_link_clicks_ctr': uniq_ctr,
-                    'messaging_started': messaging_started,
-                    'two_way_conversations': two_way_conv,
-                })
-            except Exception as e:
-                print("Warning: fallo procesando un registro:", e)
-                continue
-
-        # pausita para no llegar a límites
-        time.sleep(5)
-
-print(f"Consultas realizadas: {requests_counter}. Registros nuevos: {len(records)}")
-
-if len(records) == 0:
-    print("No hay registros nuevos para las fechas solicitadas. Se aborta sin modificar CSV.")
-    sys.exit(0)
-
-# Crear df_new y normalizar fecha
-df_new = pd.DataFrame(records)
-df_new['date'] = pd.to_datetime(df_new['date']).dt.date
-
-# 🔹 Eliminar filas duplicadas en el df nuevo ANTES de unirlo
-df_new = df_new.drop_duplicates(subset=['account_id','date','campaign_id'], keep='last')
-
-# Leer CSV existente y normalizar
-df_old = pd.read_csv(output_path, encoding='utf-8-sig', parse_dates=['date'])
-df_old['date'] = pd.to_datetime(df_old['date']).dt.date
-
-# Concatenar, quitar duplicados y ordenar
-df_final = pd.concat([df_old, df_new], ignore_index=True)
-df_final = df_final.drop_duplicates(subset=['account_id', 'date', 'campaign_id'], keep='last')
-df_final = df_final.sort_values(['account_id', 'date', 'campaign_id']).reset_index(drop=True)
-
-# Guardar (sobrescribe)
-df_final.to_csv(output_path, index=False, encoding='utf-8-sig', date_format='%Y-%m-%d')
-
-print("✅ CSV actualizado correctamente.")
-print(f"Rango agregado: {START_DATE} → {END_DATE}")
-print(f"Filas añadidas (estimadas): {len(df_new)}. Filas totales ahora: {len(df_final)}")
 #----------------------------------------------------------------------------------------------
 #                          Segunda Parte - Reporte Semanal
 #----------------------------------------------------------------------------------------------
 
-# Importar librerías adicionales para el reporte semanal
-import matplotlib.pyplot as plt
-import textwrap
+# matplotlib se importa dentro de table_render al renderizar (import diferido)
+from table_render import render_tables
+from report_packs import generar_packs
+
+# Packs por cuenta en insight/<period>/<cuenta>/ con las top-N campañas por gasto
+# de la semana (0 = solo cuentas)
+REPORT_TOP_CAMPAIGNS = 5
+REPORT_DIR = os.path.join(BASE_DIR, "insight")
 
-def generar_reporte_semanal():
+def generar_reporte_semanal(ctx):
     """
     Genera reporte semanal detectando automáticamente la última semana
+    ctx: RunDataContext de la corrida (los totales salen de los rollups)
     """
     print("\n=== Iniciando generación de reporte semanal ===")
     
-    # Leer el CSV actualizado
+    # Cubo semanal por cuenta (rollups), sin recorrer las filas diarias
     try:
-        df_campaign_1d = pd.read_csv(output_path, encoding="utf-8")
-        print(f"CSV leído correctamente: {len(df_campaign_1d)} filas")
+        actualizar_rollups()
+        cubo_semanal = rollups.read('week', 'account', ratios=False)
+        print(f"Rollup semanal: {len(cubo_semanal)} filas")
     except Exception as e:
-        print(f"Error leyendo CSV para reporte semanal: {e}")
-        return
+        print(f"Error leyendo rollups para reporte semanal: {e}")
+        raise
     
-    # Preparar datos semanales
-    def preparar_weekly(df_campaign_1d: pd.DataFrame):
-        df = df_campaign_1d.copy()
-        df['date'] = pd.to_datetime(df['date'])
-        df['week_period'] = df['date'].dt.to_period('W-MON')
-        df['week_start'] = df['week_period'].apply(lambda p: p.start_time)
-
-        df['semester'] = df['date'].dt.to_period('M')
-        df['week_of_month'] = (
-            df.groupby('semester')['week_period']
-              .transform(lambda x: pd.factorize(x)[0] + 1)
-        )
-
-        mes_map = {1:'enero',2:'febrero',3:'marzo',4:'abril',5:'mayo',6:'junio',
-                   7:'julio',8:'agosto',9:'septiembre',10:'octubre',
-                   11:'noviembre',12:'diciembre'}
-
-        df['period'] = df.apply(
-            lambda r: f"{r['date'].year}_{mes_map[r['date'].month]}_semana{r['week_of_month']}",
-            axis=1
-        )
-
-        df_weekly = (
-            df.groupby('week_start', as_index=True)
-              .agg({
-                  'spend': 'sum',
-                  'messaging_started': 'sum',
-                  'impressions': 'sum',
-                  'clicks_all': 'sum',
-                  'link_clicks':'sum'
-              })
-              .sort_index()
-        )
-        
-        # CTR ponderado semanal
-        df_weekly['ctr'] = np.where(
-            df_weekly['impressions'] > 0,
-            df_weekly['clicks_all'] / df_weekly['impressions'],
-            np.nan
-        )
-        
-        # Unique link clicks CTR ponderado semanal
-        df_weekly['unique_link_clicks_ctr'] = np.where(
-            df_weekly['impressions'] > 0,
-            df_weekly['link_clicks'] / df_weekly['impressions'],
-            np.nan
-        )
-        
-        df_weekly['cpl'] = np.where(
-            df_weekly['messaging_started'] > 0,
-            df_weekly['spend'] / df_weekly['messaging_started'],
-            np.nan
-        )
-
-        map_period = (
-            df[['week_start','period']]
-              .drop_duplicates()
-              .set_index('period')['week_start']
-        )
-
-        inv_map = (
-            df[['week_start','period']]
-              .drop_duplicates(subset='week_start')
-              .set_index('week_start')['period']
-        )
-        
-        df_weekly['period'] = df_weekly.index.map(inv_map)
-        return df, df_weekly, map_period
-
     # Detectar última semana disponible
-    df_base, df_weekly, map_period = preparar_weekly(df_campaign_1d)
+    df_weekly, map_period = preparar_weekly_rollup(cubo_semanal)
     
     if len(df_weekly) == 0:
         print("ERROR: No hay datos semanales disponibles")
@@ -379,14 +677,7 @@ def generar_reporte_semanal():
     else:
         semana_numero_siguiente = 1
     
-    # Mapeo de meses
-    mes_map = {
-        1: 'enero', 2: 'febrero', 3: 'marzo', 4: 'abril',
-        5: 'mayo', 6: 'junio', 7: 'julio', 8: 'agosto',
-        9: 'septiembre', 10: 'octubre', 11: 'noviembre', 12: 'diciembre'
-    }
-    
-    mes_nombre = mes_map[mes_siguiente]
+    mes_nombre = MES_MAP[mes_siguiente]
     periodo_siguiente = f'{año_siguiente}_{mes_nombre}_semana{semana_numero_siguiente}'
     
     print(f"Siguiente semana a procesar: {periodo_siguiente}")
@@ -404,223 +695,43 @@ def generar_reporte_semanal():
         'ctr (todos / links)': 'CTR (todos / links)',
     }
     
-    output_dir = os.path.join(BASE_DIR, "insight")
+    output_dir = REPORT_DIR
     out_pct = os.path.join(output_dir, 'tabla_variaciones.png')
     out_val = os.path.join(output_dir, 'tabla_valores.png')
     
-    # Función para generar tabla de porcentajes
-    def generar_tabla_por_periodo_pct(dfw: pd.DataFrame, map_period: pd.Series, periodo_label: str):
-        if periodo_label not in map_period.index:
-            raise KeyError(f"Periodo '{periodo_label}' no encontrado.")
-
-        semana_inicio = pd.to_datetime(map_period.loc[periodo_label])
-        df = dfw.copy().sort_index()
-        df.index = pd.to_datetime(df.index)
-        idx = df.index.get_loc(semana_inicio)
-        fila_act = df.iloc[idx]
-
-        def fila(idx_offset):
-            pos = idx - idx_offset
-            if 0 <= pos < len(df):
-                return df.iloc[pos]
-            return pd.Series({c: np.nan for c in df.columns})
-
-        prev_week = fila(1)
-        same_month = fila(4)
-        same_year = fila(52)
-
-        metricas = ['spend','messaging_started','cpl','ctr','unique_link_clicks_ctr']
-        fa = fila_act[metricas].astype(float)
-        pw = prev_week[metricas].astype(float)
-        pm = same_month[metricas].astype(float)
-        py = same_year[metricas].astype(float)
-
-        def change_pct(a, b):
-            if pd.isna(a) or pd.isna(b) or float(b) == 0.0:
-                return np.nan
-            return np.round((float(a) - float(b)) / float(b) * 100, 2)
-
-        resumen = pd.DataFrame({
-            "Métrica": metricas,
-            "Semana Actual": [float(fa[m]) for m in metricas],
-            "Cambio vs Semana Anterior (%)": [change_pct(fa[m], pw[m]) for m in metricas],
-            "Cambio vs Misma Semana Mes Anterior (%)": [change_pct(fa[m], pm[m]) for m in metricas],
-            "Cambio vs Misma Semana Año Anterior (%)": [change_pct(fa[m], py[m]) for m in metricas],
-        })
-
-        # Ratio CTR (todos / links)
-        def safe_div(a, b):
-            if pd.isna(a) or pd.isna(b) or float(b) == 0.0:
-                return np.nan
-            return float(a) / float(b)
-
-        ratio_act = safe_div(fa['ctr'], fa['unique_link_clicks_ctr'])
-        ratio_prev = safe_div(pw['ctr'], pw['unique_link_clicks_ctr'])
-        ratio_month = safe_div(pm['ctr'], pm['unique_link_clicks_ctr'])
-        ratio_year = safe_div(py['ctr'], py['unique_link_clicks_ctr'])
-
-        ratio_row = {
-            'Métrica': 'CTR (todos / links)',
-            'Semana Actual': np.round(ratio_act, 2) if not pd.isna(ratio_act) else np.nan,
-            'Cambio vs Semana Anterior (%)': change_pct(ratio_act, ratio_prev),
-            'Cambio vs Misma Semana Mes Anterior (%)': change_pct(ratio_act, ratio_month),
-            'Cambio vs Misma Semana Año Anterior (%)': change_pct(ratio_act, ratio_year),
-        }
-
-        resumen = pd.concat([resumen, pd.DataFrame([ratio_row])], ignore_index=True)
-        return resumen
-
-    # Función para generar tabla de valores
-    def generar_tabla_por_periodo_valores(dfw: pd.DataFrame, map_period: pd.Series, periodo_label: str):
-        if periodo_label not in map_period.index:
-            raise KeyError(f"Periodo '{periodo_label}' no encontrado.")
-
-        semana_inicio = pd.to_datetime(map_period.loc[periodo_label])
-        df = dfw.copy().sort_index()
-        df.index = pd.to_datetime(df.index)
-        idx = df.index.get_loc(semana_inicio)
-        fila_act = df.iloc[idx]
-
-        def fila(idx_offset):
-            pos = idx - idx_offset
-            if 0 <= pos < len(df):
-                return df.iloc[pos]
-            return pd.Series({c: np.nan for c in df.columns})
-
-        prev_week = fila(1)
-        same_month = fila(4)
-        same_year = fila(52)
-
-        metricas = ['spend','messaging_started','cpl','ctr','unique_link_clicks_ctr']
-        fa = fila_act[metricas].astype(float)
-        pw = prev_week[metricas].astype(float)
-        pm = same_month[metricas].astype(float)
-        py = same_year[metricas].astype(float)
-
-        resumen = pd.DataFrame({
-            'Métrica': metricas,
-            'Semana Actual': fa.values,
-            'Semana Anterior': pw.values,
-            'Misma Semana Mes Anterior': pm.values,
-            'Misma Semana Año Anterior': py.values,
-        })
-
-        # Ratio CTR (todos / links)
-        def safe_div(a, b):
-            if pd.isna(a) or pd.isna(b) or float(b) == 0.0:
-                return np.nan
-            return float(a) / float(b)
-
-        ratio_act = safe_div(fa['ctr'], fa['unique_link_clicks_ctr'])
-        ratio_prev = safe_div(pw['ctr'], pw['unique_link_clicks_ctr'])
-        ratio_month = safe_div(pm['ctr'], pm['unique_link_clicks_ctr'])
-        ratio_year = safe_div(py['ctr'], py['unique_link_clicks_ctr'])
-
-        ratio_row = {
-            'Métrica': 'CTR (todos / links)',
-            'Semana Actual': np.round(ratio_act, 4) if not pd.isna(ratio_act) else np.nan,
-            'Semana Anterior': np.round(ratio_prev, 4) if not pd.isna(ratio_prev) else np.nan,
-            'Misma Semana Mes Anterior': np.round(ratio_month, 4) if not pd.isna(ratio_month) else np.nan,
-            'Misma Semana Año Anterior': np.round(ratio_year, 4) if not pd.isna(ratio_year) else np.nan,
-        }
-
-        resumen = pd.concat([resumen, pd.DataFrame([ratio_row])], ignore_index=True)
-        return resumen
-
-    # Función para exportar tablas como PNG
-    def export_table_png(df_in: pd.DataFrame, output_path: str, metric_map: dict):
-        df = df_in.copy().reset_index(drop=True)
-        
-        def map_display_name(v):
-            kk = str(v).strip().lower()
-            return metric_map.get(kk, v)
+    # WoW / MoM / YoY de todas las semanas en una pasada (ver comparisons.py)
+    comparaciones = weekly_comparisons(df_weekly)
 
-        df_display = df.copy()
-        df_display['Métrica'] = df_display['Métrica'].apply(map_display_name)
-        
-        nrows, ncols = df_display.shape
-        text_table = [df_display.columns.tolist()]
-        
-        percent_metrics = {"ctr", "unique_link_clicks_ctr"}
-        
-        for i, row in df_display.iterrows():
-            row_txt = []
-            mkey = str(df.loc[i, "Métrica"]).strip().lower()
-            
-            for col in df_display.columns:
-                val = row[col]
-                
-                if col == "Métrica":
-                    row_txt.append(str(val))
-                    continue
-                
-                if pd.isna(val):
-                    row_txt.append('')
-                    continue
-                
-                if "(%)" in str(col):
-                    try:
-                        vf = float(val)
-                        row_txt.append(f"{vf:,.2f}%")
-                        continue
-                    except Exception:
-                        pass
-                
-                if mkey in percent_metrics:
-                    try:
-                        vf = float(val)
-                        row_txt.append(f"{vf * 100:,.2f}%")
-                        continue
-                    except Exception:
-                        pass
-                
-                if isinstance(val, (float, np.floating)):
-                    row_txt.append(f"{val:,.2f}")
-                elif isinstance(val, (int, np.integer)):
-                    row_txt.append(f"{val:,d}")
-                else:
-                    try:
-                        vf = float(str(val).replace('%', '').replace(',', '').strip())
-                        row_txt.append(f"{vf:,.2f}")
-                    except Exception:
-                        row_txt.append(str(val))
-            
-            text_table.append(row_txt)
-        
-        fig_width = max(8, ncols * 1.5)
-        fig_height = max(2 + nrows*0.5, 1.8 + nrows*0.45)
-        
-        plt.close('all')
-        fig, ax = plt.subplots(figsize=(fig_width, fig_height))
-        ax.axis('off')
-        
-        table = ax.table(cellText=text_table, cellLoc='center', loc='center')
-        table.auto_set_font_size(False)
-        table.set_fontsize(10)
-        table.scale(1, 1.2)
-        
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        plt.tight_layout()
-        fig.savefig(output_path, dpi=200, bbox_inches='tight')
-        plt.close(fig)
-        return output_path
+    # Siguiente semana todavía sin datos: caso normal, no hay reporte que generar
+    if periodo_siguiente not in map_period.index:
+        print(f"Error generando reporte semanal: Periodo '{periodo_siguiente}' no encontrado.")
+        return
 
-    # Generar tablas para la siguiente semana
+    # Generar tablas para la siguiente semana (otros errores hacen fallar la etapa)
     try:
-        tabla_pct = generar_tabla_por_periodo_pct(df_weekly, map_period, periodo_siguiente)
-        tabla_val = generar_tabla_por_periodo_valores(df_weekly, map_period, periodo_siguiente)
+        semana_inicio = map_period.loc[periodo_siguiente]
+        tabla_pct = tabla_variaciones(comparaciones, semana_inicio)
+        tabla_val = tabla_valores(comparaciones, semana_inicio)
         
-        # Exportar PNGs
-        export_table_png(tabla_pct, out_pct, metric_map)
-        export_table_png(tabla_val, out_val, metric_map)
+        # Exportar PNGs (figura Agg reutilizada, ver table_render.py)
+        render_tables([(tabla_pct, out_pct), (tabla_val, out_val)], metric_map)
         
         print(f"✅ Reporte semanal generado para: {periodo_siguiente}")
         print(f"📊 PNG de variaciones guardado en: {out_pct}")
         print(f"📊 PNG de valores guardado en: {out_val}")
+
+        # Mismas tablas por cuenta y por campaña; se saltan los cortes sin cambios
+        packs = generar_packs(
+            cubo_semanal, rollups.read('week', 'campaign', ratios=False),
+            semana_inicio, periodo_siguiente, output_dir, metric_map,
+            top_n=REPORT_TOP_CAMPAIGNS, workers=1 if POWER_BI_MODE else None,
+        )
+        print(f"📁 Packs en {os.path.join(output_dir, periodo_siguiente)}: "
+              f"{packs['rendered']} generados, {packs['skipped']} sin cambios")
         
     except Exception as e:
         print(f"Error generando reporte semanal: {e}")
-        return
+        raise
     
     # Aquí iría el resto del código de a02.py para generar el reporte
     print(f"\n=== Resumen ===")
@@ -628,29 +739,47 @@ def generar_reporte_semanal():
     print(f"Siguiente período: {periodo_siguiente}")
     print(f"Última fecha en datos: {ultima_semana.date()}")
 
-# Ejecutar la función de reporte semanal
-if __name__ == "__main__":
-    generar_reporte_semanal()
-
 #---------------------------------------------------------------------------------------------
 #                          Tercera Parte - Transformar a Power BI
 #---------------------------------------------------------------------------------------------
 # Variable global para Power BI Desktop - debe estar fuera de cualquier función
 primera_tabla = None
 
-def transformar_para_powerbi():
+# Además del CSV, escribir powerbi_ready.parquet (categóricos con dictionary encoding)
+POWERBI_PARQUET = True
+
+# Carpetas por cuenta y mes para la actualización incremental de Power BI (ver
+# powerbi_delta.py). 'incremental': solo los meses con (cuenta, día) cambiados y
+# todavía no exportados; 'full': todo. La primera carga siempre es full.
+# powerbi_ready.csv/.parquet solo se reescriben en un export full, si no existen
+# o con --powerbi-snapshot.
+POWERBI_EXPORT_MODE = 'incremental'
+POWERBI_EXPORT_DIR = os.path.join(BASE_DIR, "datasets", "data", "powerbi")
+POWERBI_EXPORT_FORMAT = 'parquet' if POWERBI_PARQUET else 'csv'
+
+# Nombre de cuenta en primera_tabla (etiqueta de account_map -> nombre en Power BI)
+POWERBI_ACCOUNT_NAMES = {'illapa': 'illa'}
+
+
+def export_powerbi(tabla):
+    """Carpeta particionada de una tabla de Power BI ('primera_tabla' o 'segunda_tabla')."""
+    return PartitionedExport(os.path.join(POWERBI_EXPORT_DIR, tabla), 'account', 'date_start',
+                             fmt=POWERBI_EXPORT_FORMAT)
+
+def transformar_para_powerbi(ctx):
     """
     Transforma los datos crudos al formato requerido para Power BI
     Deja el dataframe final 'primera_tabla' disponible para Power BI Desktop
+    ctx: RunDataContext de la corrida
     """
     print("\n=== Iniciando transformación para Power BI ===")
     
     global primera_tabla  # Hacer disponible para Power BI
     
     try:
-        # Leer el df original proveniente del reporte semanal 
-        df = pd.read_csv(output_path, encoding='utf-8')
-        print(f"CSV original leído: {len(df)} filas")
+        # df original (vista del contexto de la corrida)
+        df = ctx.view('powerbi')
+        print(f"Datos originales: {len(df)} filas")
         
         # 1) Adaptar la columna 'date'
         # date -> date_start (date) y duplicamos a date_stop
@@ -659,7 +788,6 @@ def transformar_para_powerbi():
         else:
             df['date_start'] = pd.to_datetime(df['date_start'], errors='coerce')
 
-        df['date_start'] = df['date_start'].dt.date
         df['date_stop'] = df['date_start']  # duplicado, como pediste
 
         # 2) Renombrar messaging_started -> first_replies (solo rename lógico)
@@ -700,16 +828,41 @@ def transformar_para_powerbi():
         primera_tabla = df[required_cols].copy()
         
         # Arreglar nombres de cuentas
-        primera_tabla['account'] = primera_tabla['account'].replace('illapa','illa')
+        primera_tabla['account'] = primera_tabla['account'].replace(POWERBI_ACCOUNT_NAMES)
+
+        # Tipos compactos: categóricos, fechas datetime64 y enteros chicos (ver powerbi_frame.py)
+        sin_compactar = primera_tabla
+        primera_tabla = compact_powerbi_frame(sin_compactar)
+        memory_report(sin_compactar, primera_tabla)
+        del sin_compactar
         
         print(f"✅ Transformación completada: {len(primera_tabla)} filas")
         print(f"📊 Columnas finales: {list(primera_tabla.columns)}")
         
-        # Guardar CSV para Power BI (opcional, como backup)
+        # Carpeta particionada para la actualización incremental (días pendientes de extract_campaign)
+        export = export_powerbi("primera_tabla")
+        res = export.export(primera_tabla, mode=POWERBI_EXPORT_MODE, watermark=RUN_STARTED_AT)
+        print(f"💾 Export Power BI ({res['mode']}): {res['files']} archivos, {res['rows']} filas en {export.root}")
+
+        # Snapshot completo: solo en la carga full (o si falta) o a pedido; en
+        # incremental los datos al día están en la carpeta particionada
         powerbi_path = os.path.join(BASE_DIR, "datasets", "data", "powerbi_ready.csv")
-        os.makedirs(os.path.dirname(powerbi_path), exist_ok=True)
-        primera_tabla.to_csv(powerbi_path, index=False, encoding='utf-8-sig', date_format='%Y-%m-%d')
-        print(f"💾 CSV para Power BI guardado en: {powerbi_path}")
+        snapshot = POWERBI_SNAPSHOT or res['mode'] == 'full' or not os.path.exists(powerbi_path)
+        if snapshot:
+            os.makedirs(os.path.dirname(powerbi_path), exist_ok=True)
+            primera_tabla.to_csv(powerbi_path, index=False, encoding='utf-8-sig', date_format='%Y-%m-%d')
+            print(f"💾 CSV para Power BI guardado en: {powerbi_path}")
+        else:
+            print(f"⏭️ {powerbi_path} sin reescribir (export incremental; --powerbi-snapshot para rehacerlo)")
+
+        if POWERBI_PARQUET and snapshot:
+            parquet_path = os.path.splitext(powerbi_path)[0] + ".parquet"
+            try:
+                primera_tabla.to_parquet(parquet_path + ".tmp", index=False)
+                os.replace(parquet_path + ".tmp", parquet_path)
+                print(f"💾 Parquet para Power BI guardado en: {parquet_path}")
+            except ImportError as e:
+                print(f"Warning: no se pudo escribir Parquet (falta pyarrow): {e}")
         
         # Mostrar información del dataframe para Power BI
         print(f"\n=== Información para Power BI ===")
@@ -724,11 +877,7 @@ def transformar_para_powerbi():
         
     except Exception as e:
         print(f"Error en transformación para Power BI: {e}")
-        return None
-
-# Ejecutar la transformación
-if __name__ == "__main__":
-    transformar_para_powerbi()
+        raise
 #--------------------------------------------------------------------------------------------- 
 #                          Cuarta Parte - Generar Segunda Tabla (Ads Video Metrics)
 #---------------------------------------------------------------------------------------------
@@ -749,12 +898,7 @@ def generar_segunda_tabla():
     
     try:
         # Importar librería necesaria
-        from facebook_business.exceptions import FacebookRequestError
-        
-        # Configuración (usar mismas fechas y credenciales que la primera parte)
-        MAX_RETRIES = 3
-        BACKOFF = 2
-        PAUSE = 1.0
+        iniciar_api()
         
         FIELDS = [
             "ad_id",
@@ -781,192 +925,183 @@ def generar_segunda_tabla():
             "curve_3s_pct_api",
         ]
         
-        KEY_COLS = ["account", "ad_id", "campaign_id", "date_start"]
-        
-        # Output para segunda tabla
-        OUTPUT_CSV_ADS = os.path.join(BASE_DIR, "datasets", "data", "campaign_video_3s_100pct_1d_ads.csv")
-        
-        # Usar mismas fechas que la primera parte
-        print(f"Usando rango de fechas: {START_DATE} → {END_DATE}")
-        
         # ---------------- HELPERS ----------------
-        def daterange(start, end):
-            d = start
-            while d <= end:
-                yield d
-                d += timedelta(days=1)
+        # Mismo limitador compartido que la extracción por campaña
+        ad_planner = InsightsPlanner(
+            synthetic_api or MetaInsightsClient(),
+            fields=FIELDS,
+            params={"level": "ad", "time_increment": 1},
+            limiter=api_limiter,
+            metrics=metrics,
+            source='ad',
+            cache=response_cache,
+            retry=api_retry,
+        )
         
-        def fetch_day(ad_account, since, until):
-            tries = 0
-            while tries < MAX_RETRIES:
-                tries += 1
-                try:
-                    ins = ad_account.get_insights(
-                        fields=FIELDS,
-                        params={
-                            "time_range": {"since": since, "until": until},
-                            "level": "ad",
-                            "time_increment": 1,
-                        },
-                    )
-                    return list(ins)
-                except FacebookRequestError as e:
-                    if "Error validating access token" in str(e):
-                        print("ERROR: token inválido o expirado.")
-                        raise
-                    print(f"⚠️ Error API día {since}, intento {tries}/{MAX_RETRIES}: {e}")
-                    time.sleep(BACKOFF * tries)
-            print(f"❌ No se pudo obtener datos para {since}")
-            return []
+        migrar_a_store(ads_store, OUTPUT_CSV_ADS)
         
-        def extract_stats(record):
-            # 1) Total de reproducciones iniciadas (plays)
-            video_plays_total = 0
-            for v in record.get("video_play_actions", []) or []:
-                if isinstance(v, dict) and v.get("action_type") == "video_view":
-                    try:
-                        video_plays_total += int(v.get("value", 0))
-                    except:
-                        pass
-            
-            # 2) Curva de retención: lista de % por segundo
-            curve_values = []
-            for entry in record.get("video_play_curve_actions", []) or []:
-                if not isinstance(entry, dict):
-                    continue
-                if entry.get("action_type") != "video_view":
-                    continue
-                vals = entry.get("value", [])
-                if isinstance(vals, list):
-                    curve_values = vals
-                break
-            
-            # % que llega al segundo 3
-            if len(curve_values) > 3:
-                try:
-                    pct_3s = float(curve_values[3] or 0)
-                except (TypeError, ValueError):
-                    pct_3s = 0.0
-            else:
-                pct_3s = 0.0
-            
-            if video_plays_total > 0 and pct_3s > 0:
-                video_3s_views = round(video_plays_total * (pct_3s / 100.0))
+        def read_existing_csv(path: str) -> pd.DataFrame:
+            if ads_store is not None:
+                df_old = ads_store.read() if ads_store.exists() else None
             else:
-                video_3s_views = 0
-            
-            # 3) Vistas al 100%
-            video_100pct_views = 0
-            for v in record.get("video_p100_watched_actions", []) or []:
-                if isinstance(v, dict) and v.get("action_type") == "video_view":
-                    try:
-                        video_100pct_views += int(v.get("value", 0))
-                    except:
-                        pass
-            
-            return video_3s_views, video_100pct_views, video_plays_total, pct_3s
+                df_old = pd.read_csv(path, encoding="utf-8-sig") if os.path.exists(path) else None
         
-        def read_existing_csv(path: str) -> pd.DataFrame:
-            if not os.path.exists(path):
+            if df_old is None:
                 print(f"ℹ️ No existe CSV previo: {path}. Se creará uno nuevo.")
                 return pd.DataFrame(columns=EXPECTED_COLUMNS)
-            
-            df_old = pd.read_csv(path, encoding="utf-8-sig")
+        
             # Normalizar columnas faltantes
             for c in EXPECTED_COLUMNS:
                 if c not in df_old.columns:
                     df_old[c] = pd.NA
-            
+        
             # Normalizar date_start
             if "date_start" in df_old.columns:
                 df_old["date_start"] = pd.to_datetime(df_old["date_start"], errors="coerce").dt.date
-            
+        
             # Asegurar tipos clave como string (evita mismatch en merges)
             for c in ["account", "ad_id", "campaign_id"]:
                 if c in df_old.columns:
                     df_old[c] = df_old[c].astype("string")
-            
+        
             return df_old[EXPECTED_COLUMNS]
         
-        def upsert_by_keys(df_old: pd.DataFrame, df_new: pd.DataFrame) -> pd.DataFrame:
-            # Asegurar columnas esperadas
-            for c in EXPECTED_COLUMNS:
-                if c not in df_new.columns:
-                    df_new[c] = pd.NA
-            df_new = df_new[EXPECTED_COLUMNS]
-            
-            # Normalizar tipos clave
-            for c in ["account", "ad_id", "campaign_id"]:
-                df_new[c] = df_new[c].astype("string")
-                df_old[c] = df_old[c].astype("string")
-            
-            df_new["date_start"] = pd.to_datetime(df_new["date_start"], errors="coerce").dt.date
-            df_old["date_start"] = pd.to_datetime(df_old["date_start"], errors="coerce").dt.date
+        def extraer_ads_api():
+            """Plan y consultas propias del nivel anuncio. Devuelve (df_new o None, días vacíos)."""
+            # Los jobs asíncronos no pasan por el cache: offline se usa la consulta por día
+            use_async = USE_ASYNC_REPORTS and not OFFLINE
+            ads_windows, _, _ = planear_ads()
+            ads_vacios = {}
+        
+            def anotar_vacios(label, since, until, fechas):
+                vacios = day_span(since, until) - {date.fromisoformat(f) for f in fechas if f}
+                ads_vacios.setdefault(label, set()).update(vacios)
+        
+            def registrar(label, since, until, rows):
+                """Parsea las filas de una ventana y anota los días que vinieron vacíos."""
+                fechas = set()
+                ad_level_records.extend(con_fechas(rows, fechas), label)
+                anotar_vacios(label, since, until, fechas)
+        
+            # ---------------- MAIN EXTRACTION ----------------
+            ad_level_records = RowChunker(flatten_ad_chunk, AD_SCHEMA, chunk_size=PARSE_CHUNK_ROWS)
+        
+            if use_async:
+                # Un job asíncrono por rango contiguo; las páginas se consumen al terminar cada job
+                async_runner = AsyncReportRunner(
+                    synthetic_api or MetaAsyncReportClient(),
+                    fields=FIELDS,
+                    params={"level": "ad", "time_increment": 1},
+                    limiter=api_limiter,
+                    max_in_flight=ASYNC_MAX_JOBS,
+                    poll_interval=ASYNC_POLL_SECONDS,
+                    max_attempts=RETRY_MAX_ATTEMPTS,
+                    sleep=metrics.sleeper('ad_async', 'poll'),
+                    metrics=metrics,
+                    source='ad_async',
+                    retry=api_retry,
+                    # Jobs que agotan los intentos: la ventana se pide síncrona antes de ir a dead letters
+                    fallback=ad_planner.fetch_range,
+                )
+                print(f"Enviando {len(ads_windows)} reportes asíncronos (hasta {ASYNC_MAX_JOBS} en curso)")
             
-            # Concatenar + deduplicar quedándonos con el ÚLTIMO (df_new pisa df_old)
-            combined = pd.concat([df_old, df_new], ignore_index=True)
-            combined = combined.drop_duplicates(subset=KEY_COLS, keep="last")
+                for window, rows, error in async_runner.run(ads_windows):
+                    account_id, label, since, until = window
+                    if error is not None:
+                        if not ventana_fallida('ad', window, error):
+                            raise error
+                        continue
+                    antes = len(ad_level_records)
+                    # rows es el cursor del job: las páginas se parsean a medida que llegan.
+                    # Si una página falla se descarta lo leído de la ventana y el job se
+                    # reintenta (o va al fallback / dead letters) como un job fallido
+                    try:
+                        registrar(label, since, until, rows)
+                    except Exception as e:
+                        ad_level_records.truncate(antes)
+                        async_runner.read_failed(window, e)
+                        continue
+                    dead_letters.resolve('ad', window)
+                    print(f"  -> {label} {since} - {until}: {len(ad_level_records) - antes} filas")
+                if async_runner.fallbacks:
+                    print(f"Ventanas pedidas de forma síncrona tras fallar el job: {async_runner.fallbacks}")
+            else:
+                print(f"Consultando {len(ads_windows)} ventanas cuenta/día con hasta {MAX_WORKERS} en paralelo")
             
-            # Orden opcional (útil para Power BI)
-            combined = combined.sort_values(by=["account", "date_start", "campaign_id", "ad_id"], kind="stable")
+                # Cada hilo aplana las páginas de su cursor a medida que llegan
+                leer_ventana = lambda account_id, rows: chunk_rows(
+                    rows, account_map[account_id], flatten_ad_chunk, AD_SCHEMA, PARSE_CHUNK_ROWS)
+                fetch = lambda account_id, since, until: ad_planner.fetch_range(account_id, since, until, leer_ventana)
+                for window, chunks, error in run_windows(fetch, ads_windows, max_workers=MAX_WORKERS):
+                    account_id, label, since, until = window
+                    if error is not None:
+                        # Falló tras los reintentos: queda en dead letters para la próxima corrida
+                        if not ventana_fallida('ad', window, error):
+                            raise error
+                        continue
+                    dead_letters.resolve('ad', window)
+                    print(f"  -> {label} día {since}: {sum(len(c) for c in chunks)} filas")
+                    ad_level_records.add_chunks(chunks)
+                    anotar_vacios(label, since, until, fechas_de(chunks, 'date_start'))
             
-            return combined.reset_index(drop=True)
+            return (ad_level_records.to_frame() if ad_level_records else None), ads_vacios
         
-        # ---------------- MAIN EXTRACTION ----------------
-        ad_level_records = []
+        if EXTRACTION_MODE == 'union':
+            # Las filas de anuncio vinieron con la extracción de campañas (sin API acá)
+            recibido = union_ads or {'df': None, 'vacios': {}}
+            df_new, ads_vacios = recibido['df'], recibido['vacios']
+            print(f"Modo union: {0 if df_new is None else len(df_new)} filas de anuncio de extract_campaign")
+        else:
+            df_new, ads_vacios = extraer_ads_api()
         
-        for account_id, label in account_map.items():
-            acc = AdAccount(account_id)
-            print(f"\n=== Cuenta {label} ({account_id}) ===")
-            
-            for d in daterange(START_DATE, END_DATE):
-                since = d.isoformat()
-                print(f"  -> Día {since} …")
-                
-                rows = fetch_day(acc, since, since)
-                for r in rows:
-                    impressions = int(r.get("impressions", 0) or 0)
-                    video_3s, video_100pct, video_plays, pct_3s = extract_stats(r)
-                    
-                    retention_3s_pct = (video_3s / impressions) if impressions > 0 else 0
-                    retention_complete_pct = (video_100pct / video_3s) if video_3s > 0 else 0
-                    
-                    ad_level_records.append({
-                        "account": label,
-                        "ad_id": r.get("ad_id"),
-                        "campaign_id": r.get("campaign_id"),
-                        "date_start": r.get("date_start"),
-                        "impressions": impressions,
-                        "video_plays": video_plays,
-                        "video_3s_views": video_3s,
-                        "video_100pct_views": video_100pct,
-                        "retention_3s_pct": retention_3s_pct,
-                        "retention_complete_pct": retention_complete_pct,
-                        "thruplay": video_100pct,
-                        "curve_3s_pct_api": pct_3s,
-                    })
-                
-                time.sleep(PAUSE)
+        for label, dias in ads_vacios.items():
+            (ads_store.manifest if ads_store is not None else ads_manifest).mark_empty(label, dias)
         
-        if not ad_level_records:
+        if df_new is None or len(df_new) == 0:
             print("⚠️ No se recuperaron datos nuevos. No se modifica el CSV.")
             segunda_tabla = pd.DataFrame(columns=EXPECTED_COLUMNS)
             return segunda_tabla
         
-        df_new = pd.DataFrame(ad_level_records)
         df_new["date_start"] = pd.to_datetime(df_new["date_start"], errors="coerce").dt.date
         
-        # Leer CSV existente + upsert
-        df_old = read_existing_csv(OUTPUT_CSV_ADS)
-        df_final = upsert_by_keys(df_old, df_new)
+        # Asegurar columnas esperadas y tipos clave antes del upsert
+        for c in EXPECTED_COLUMNS:
+            if c not in df_new.columns:
+                df_new[c] = pd.NA
+        df_new = df_new[EXPECTED_COLUMNS]
+        for c in ["account", "ad_id", "campaign_id"]:
+            df_new[c] = df_new[c].astype("string")
         
-        # Guardar SOBRESCRIBIENDO el mismo archivo
-        df_final.to_csv(OUTPUT_CSV_ADS, index=False, encoding="utf-8-sig")
-        print(f"\n✅ CSV de segunda tabla actualizado: {OUTPUT_CSV_ADS}")
+        # Upsert incremental: solo se tocan las particiones (o la cola del CSV) de los días nuevos
+        ads_sort = ["account", "date_start", "campaign_id", "ad_id"]
+        if ads_store is None:
+            stats = upsert_csv(OUTPUT_CSV_ADS, df_new, ADS_KEYS, sort_by=ads_sort, manifest=ads_manifest)
+            print(f"\n✅ CSV de segunda tabla actualizado: {OUTPUT_CSV_ADS}")
+        else:
+            stats = ads_store.upsert(df_new)
+            print(f"\n✅ Store de segunda tabla actualizado: {ADS_STORE_DIR}")
+            if EXPORT_CSV:
+                if os.path.exists(OUTPUT_CSV_ADS):
+                    upsert_csv(OUTPUT_CSV_ADS, df_new, ADS_KEYS, sort_by=ads_sort)
+                else:
+                    ads_store.export_csv(OUTPUT_CSV_ADS, sort_by=ads_sort)
+                print(f"✅ CSV de segunda tabla actualizado: {OUTPUT_CSV_ADS}")
+        print(f"Filas nuevas: {stats['inserted']}. Filas actualizadas: {stats['updated']}")
+        # Pendientes de exportar hasta que el export de abajo termine bien
+        export = export_powerbi("segunda_tabla")
+        export.add_pending(changed_partitions(df_new, 'account', 'date_start'))
+        
+        df_final = read_existing_csv(OUTPUT_CSV_ADS)
+        df_final = df_final.sort_values(by=ads_sort, kind="stable")
+        df_final = df_final.reset_index(drop=True)
         print("Filas final:", len(df_final))
         
         # Asignar a variable global para Power BI
         segunda_tabla = df_final
+
+        # Solo los meses con (cuenta, día) cambiados o pendientes (full en la primera carga)
+        res = export.export(segunda_tabla, mode=POWERBI_EXPORT_MODE, watermark=RUN_STARTED_AT)
+        print(f"💾 Export Power BI ({res['mode']}): {res['files']} archivos, {res['rows']} filas en {export.root}")
         
         print(f"\n=== Información para Power BI ===")
         print(f"Nombre del dataframe: segunda_tabla")
@@ -979,13 +1114,8 @@ def generar_segunda_tabla():
         
     except Exception as e:
         print(f"Error en extracción de segunda tabla: {e}")
-        traceback.print_exc()
         segunda_tabla = None
-        return None
-
-# Ejecutar la generación de segunda tabla
-if __name__ == "__main__":
-    generar_segunda_tabla()
+        raise
 
 #----------------------------------------------------------------------------------
 #                        Quinta parte - Generar el excel
@@ -1004,140 +1134,216 @@ GROUP_BY_ACCOUNT = True   # True => genera resumen y (opcional) gráfico por acc
 GROUP_BY_CAMPAIGN = False # True => resume por campaign_name + mes
 # -------------------------------------------
 
-# Comprobaciones básicas
-if not os.path.exists(CSV_PATH):
-    raise FileNotFoundError(f"No encuentro el CSV en: {CSV_PATH}")
+def generar_excel_gasto(ctx):
+    """
+    Genera el Excel de gasto mensual a partir del contexto de datos de la corrida
+    """
+    # Comprobaciones básicas
+    if not campaign_1d_existe():
+        raise FileNotFoundError(f"No encuentro el CSV en: {CSV_PATH}")
 
-# Leer CSV y normalizar fecha
-df = pd.read_csv(CSV_PATH, encoding='utf-8-sig', parse_dates=['date'], dayfirst=False)
-df['date'] = pd.to_datetime(df['date']).dt.date  # queda tipo datetime.date
+    # Filtrar desde el corte (vista del contexto, sin releer disco)
+    cutoff = date(2026, 1, 1)
+    df2025 = ctx.view('excel', start=cutoff)
+    df2025['date'] = df2025['date'].dt.date  # queda tipo datetime.date
 
-# Filtrar desde 2025-01-01
-cutoff = date(2026, 1, 1)
-df2025 = df[df['date'] >= cutoff].copy()
+    if df2025.empty:
+        print("No hay registros desde 2025 en adelante. Revisa el CSV o el rango de fechas.")
+        return
 
-if df2025.empty:
-    print("No hay registros desde 2025 en adelante. Revisa el CSV o el rango de fechas.")
-    sys.exit(0)
+    # Crear columna month_start (primer día del mes como datetime) — útil para Excel
+    df2025['month_start'] = pd.to_datetime(df2025['date']).dt.to_period('M').dt.to_timestamp()
+
+    # Función para agregar por mes (y claves opcionales)
+    def aggregate_monthly(df_in, by_keys=None):
+        """
+        df_in: DataFrame con columna 'month_start'
+        by_keys: list of extra keys to group by (e.g. ['account_id']) or None
+        """
+        group_keys = ['month_start']
+        if by_keys:
+            group_keys = by_keys + group_keys
+        agg_dict = {}
+        # Intentar agregar spend, impressions y clicks si existen
+        if SPEND_COL in df_in.columns:
+            agg_dict[SPEND_COL] = 'sum'
+        if 'impressions' in df_in.columns:
+            agg_dict['impressions'] = 'sum'
+        # detectar clicks
+        for c in ['clicks_all', 'clicks', 'link_clicks']:
+            if c in df_in.columns:
+                agg_dict[c] = 'sum'
+                break
+        df_agg = df_in.groupby(group_keys).agg(agg_dict).reset_index()
+        # ordenar
+        df_agg = df_agg.sort_values(group_keys).reset_index(drop=True)
+        return df_agg
+
+    # Los resúmenes salen de los cubos mensuales (sumas de sumas = mismo resultado);
+    # si el corte no cae en inicio de mes se agregan las filas diarias
+    if cutoff.day == 1 and rollups.exists():
+        mensual_cuenta = rollups.read('month', 'account', start=cutoff, ratios=False)
+        mensual_campana = rollups.read('month', 'campaign', start=cutoff, ratios=False)
+    else:
+        mensual_cuenta = mensual_campana = df2025
 
-# Crear columna month_start (primer día del mes como datetime) — útil para Excel
-df2025['month_start'] = pd.to_datetime(df2025['date']).dt.to_period('M').dt.to_timestamp()
+    # 1) Resumen general por mes
+    df_monthly = aggregate_monthly(mensual_cuenta, by_keys=None)
 
-# Función para agregar por mes (y claves opcionales)
-def aggregate_monthly(df_in, by_keys=None):
-    """
-    df_in: DataFrame con columna 'month_start'
-    by_keys: list of extra keys to group by (e.g. ['account_id']) or None
-    """
-    group_keys = ['month_start']
-    if by_keys:
-        group_keys = by_keys + group_keys
-    agg_dict = {}
-    # Intentar agregar spend, impressions y clicks si existen
-    if SPEND_COL in df_in.columns:
-        agg_dict[SPEND_COL] = 'sum'
-    if 'impressions' in df_in.columns:
-        agg_dict['impressions'] = 'sum'
-    # detectar clicks
-    for c in ['clicks_all', 'clicks', 'link_clicks']:
-        if c in df_in.columns:
-            agg_dict[c] = 'sum'
-            break
-    df_agg = df_in.groupby(group_keys).agg(agg_dict).reset_index()
-    # ordenar
-    df_agg = df_agg.sort_values(group_keys).reset_index(drop=True)
-    return df_agg
-
-# 1) Resumen general por mes
-df_monthly = aggregate_monthly(df2025, by_keys=None)
-
-# 2) Resumen por account_id (opcional)
-if GROUP_BY_ACCOUNT and 'account_id' in df2025.columns:
-    df_monthly_by_account = aggregate_monthly(df2025, by_keys=['account_id'])
-else:
-    df_monthly_by_account = None
+    # 2) Resumen por account_id (opcional)
+    if GROUP_BY_ACCOUNT and 'account_id' in df2025.columns:
+        df_monthly_by_account = aggregate_monthly(mensual_cuenta, by_keys=['account_id'])
+    else:
+        df_monthly_by_account = None
 
-# 3) Resumen por campaign_name (opcional)
-if GROUP_BY_CAMPAIGN and 'campaign_name' in df2025.columns:
-    df_monthly_by_campaign = aggregate_monthly(df2025, by_keys=['campaign_name'])
-else:
-    df_monthly_by_campaign = None
-
-# 4) Escribir a Excel con gráfico usando xlsxwriter
-with pd.ExcelWriter(OUT_XLSX, engine='xlsxwriter', datetime_format='yyyy-mm-dd') as writer:
-    # Hoja raw filtrada
-    df2025.to_excel(writer, sheet_name='Filtered_2025plus', index=False)
-    workbook  = writer.book
-
-    # Hoja resumen mensual
-    # Asegurarnos de que month_start sea datetime al escribir (xlsxwriter manejará bien)
-    df_monthly.to_excel(writer, sheet_name='Monthly_Spend', index=False)
-    ws = writer.sheets['Monthly_Spend']
-
-    # Agregar formato de tabla
-    nrows, ncols = df_monthly.shape
-    header = [{'header': col} for col in df_monthly.columns]
-    ws.add_table(0, 0, nrows, ncols - 1, {'columns': header, 'style': 'Table Style Medium 9'})
-
-    # Crear gráfico: columnas (gasto por mes)
-    chart = workbook.add_chart({'type': 'column'})
-    # indices para xlsxwriter: (sheetname, first_row, first_col, last_row, last_col)
-    # recordar que pandas escribió encabezados en la fila 0; datos comienzan en fila 1
-    first_row = 1
-    last_row = nrows
-    # encontrar columna index de spend y month_start
-    col_map = {c: i for i, c in enumerate(df_monthly.columns)}
-    if SPEND_COL in col_map:
-        chart.add_series({
-            'name':       'Gasto (Spend)',
-            'categories': ['Monthly_Spend', first_row, col_map['month_start'], last_row, col_map['month_start']],
-            'values':     ['Monthly_Spend', first_row, col_map[SPEND_COL], last_row, col_map[SPEND_COL]],
-            'gap': 2,
-        })
-    # formato del gráfico
-    chart.set_title({'name': 'Gasto mensual (desde 2025)'})
-    chart.set_x_axis({'name': 'Mes', 'date_axis': True, 'num_format': 'mmm yyyy'})
-    chart.set_y_axis({'name': 'Gasto', 'major_gridlines': {'visible': False}})
-    chart.set_legend({'position': 'bottom'})
-
-    # Insertar gráfico en hoja resumen
-    ws.insert_chart('H2', chart, {'x_scale': 1.4, 'y_scale': 1.4})
-
-    # Escribir resumen por account_id si existe
-    if df_monthly_by_account is not None:
-        df_monthly_by_account.to_excel(writer, sheet_name='Monthly_by_Account', index=False)
-        ws2 = writer.sheets['Monthly_by_Account']
-        nr2, nc2 = df_monthly_by_account.shape
-        header2 = [{'header': col} for col in df_monthly_by_account.columns]
-        ws2.add_table(0, 0, nr2, nc2 - 1, {'columns': header2, 'style': 'Table Style Medium 9'})
-        # (Opcional) crear un gráfico por cada account_id — si quieres descomentar el bloque siguiente.
-        # Nota: si hay muchas cuentas, puede quedar pesado.
-        # unique_accounts = df_monthly_by_account['account_id'].unique()
-        # row_offset = 1
-        # for acct in unique_accounts:
-        #     df_ac = df_monthly_by_account[df_monthly_by_account['account_id'] == acct]
-        #     if df_ac.empty: continue
-        #     r_first = df_monthly_by_account.index[df_monthly_by_account['account_id'] == acct][0] + 1
-        #     r_last = r_first + len(df_ac) - 1
-        #     ch = workbook.add_chart({'type': 'column'})
-        #     ch.add_series({
-        #         'name': f'Gasto - {acct}',
-        #         'categories': ['Monthly_by_Account', r_first, col_map['month_start'], r_last, col_map['month_start']],
-        #         'values': ['Monthly_by_Account', r_first, col_map[SPEND_COL], r_last, col_map[SPEND_COL]],
-        #     })
-        #     ws2.insert_chart(1 + row_offset, nc2 + 2, ch)
-        #     row_offset += 15
-
-    # Escribir resumen por campaña si existe
-    if df_monthly_by_campaign is not None:
-        df_monthly_by_campaign.to_excel(writer, sheet_name='Monthly_by_Campaign', index=False)
-        ws3 = writer.sheets['Monthly_by_Campaign']
-        nr3, nc3 = df_monthly_by_campaign.shape
-        header3 = [{'header': col} for col in df_monthly_by_campaign.columns]
-        ws3.add_table(0, 0, nr3, nc3 - 1, {'columns': header3, 'style': 'Table Style Medium 9'})
-
-print(f"✅ Archivo creado: {OUT_XLSX}")
-print("Hojas incluidas: Filtered_2025plus, Monthly_Spend" +
-      (", Monthly_by_Account" if df_monthly_by_account is not None else "") +
-      (", Monthly_by_Campaign" if df_monthly_by_campaign is not None else ""))
+    # 3) Resumen por campaign_name (opcional)
+    if GROUP_BY_CAMPAIGN and 'campaign_name' in df2025.columns:
+        df_monthly_by_campaign = aggregate_monthly(mensual_campana, by_keys=['campaign_name'])
+    else:
+        df_monthly_by_campaign = None
+
+    # 4) Escribir a Excel con gráfico usando xlsxwriter
+    with pd.ExcelWriter(OUT_XLSX, engine='xlsxwriter', datetime_format='yyyy-mm-dd') as writer:
+        # Hoja raw filtrada
+        df2025.to_excel(writer, sheet_name='Filtered_2025plus', index=False)
+        workbook  = writer.book
+
+        # Hoja resumen mensual
+        # Asegurarnos de que month_start sea datetime al escribir (xlsxwriter manejará bien)
+        df_monthly.to_excel(writer, sheet_name='Monthly_Spend', index=False)
+        ws = writer.sheets['Monthly_Spend']
+
+        # Agregar formato de tabla
+        nrows, ncols = df_monthly.shape
+        header = [{'header': col} for col in df_monthly.columns]
+        ws.add_table(0, 0, nrows, ncols - 1, {'columns': header, 'style': 'Table Style Medium 9'})
+
+        # Crear gráfico: columnas (gasto por mes)
+        chart = workbook.add_chart({'type': 'column'})
+        # indices para xlsxwriter: (sheetname, first_row, first_col, last_row, last_col)
+        # recordar que pandas escribió encabezados en la fila 0; datos comienzan en fila 1
+        first_row = 1
+        last_row = nrows
+        # encontrar columna index de spend y month_start
+        col_map = {c: i for i, c in enumerate(df_monthly.columns)}
+        if SPEND_COL in col_map:
+            chart.add_series({
+                'name':       'Gasto (Spend)',
+                'categories': ['Monthly_Spend', first_row, col_map['month_start'], last_row, col_map['month_start']],
+                'values':     ['Monthly_Spend', first_row, col_map[SPEND_COL], last_row, col_map[SPEND_COL]],
+                'gap': 2,
+            })
+        # formato del gráfico
+        chart.set_title({'name': 'Gasto mensual (desde 2025)'})
+        chart.set_x_axis({'name': 'Mes', 'date_axis': True, 'num_format': 'mmm yyyy'})
+        chart.set_y_axis({'name': 'Gasto', 'major_gridlines': {'visible': False}})
+        chart.set_legend({'position': 'bottom'})
+
+        # Insertar gráfico en hoja resumen
+        ws.insert_chart('H2', chart, {'x_scale': 1.4, 'y_scale': 1.4})
+
+        # Escribir resumen por account_id si existe
+        if df_monthly_by_account is not None:
+            df_monthly_by_account.to_excel(writer, sheet_name='Monthly_by_Account', index=False)
+            ws2 = writer.sheets['Monthly_by_Account']
+            nr2, nc2 = df_monthly_by_account.shape
+            header2 = [{'header': col} for col in df_monthly_by_account.columns]
+            ws2.add_table(0, 0, nr2, nc2 - 1, {'columns': header2, 'style': 'Table Style Medium 9'})
+            # (Opcional) crear un gráfico por cada account_id — si quieres descomentar el bloque siguiente.
+            # Nota: si hay muchas cuentas, puede quedar pesado.
+            # unique_accounts = df_monthly_by_account['account_id'].unique()
+            # row_offset = 1
+            # for acct in unique_accounts:
+            #     df_ac = df_monthly_by_account[df_monthly_by_account['account_id'] == acct]
+            #     if df_ac.empty: continue
+            #     r_first = df_monthly_by_account.index[df_monthly_by_account['account_id'] == acct][0] + 1
+            #     r_last = r_first + len(df_ac) - 1
+            #     ch = workbook.add_chart({'type': 'column'})
+            #     ch.add_series({
+            #         'name': f'Gasto - {acct}',
+            #         'categories': ['Monthly_by_Account', r_first, col_map['month_start'], r_last, col_map['month_start']],
+            #         'values': ['Monthly_by_Account', r_first, col_map[SPEND_COL], r_last, col_map[SPEND_COL]],
+            #     })
+            #     ws2.insert_chart(1 + row_offset, nc2 + 2, ch)
+            #     row_offset += 15
+
+        # Escribir resumen por campaña si existe
+        if df_monthly_by_campaign is not None:
+            df_monthly_by_campaign.to_excel(writer, sheet_name='Monthly_by_Campaign', index=False)
+            ws3 = writer.sheets['Monthly_by_Campaign']
+            nr3, nc3 = df_monthly_by_campaign.shape
+            header3 = [{'header': col} for col in df_monthly_by_campaign.columns]
+            ws3.add_table(0, 0, nr3, nc3 - 1, {'columns': header3, 'style': 'Table Style Medium 9'})
+
+    print(f"✅ Archivo creado: {OUT_XLSX}")
+    print("Hojas incluidas: Filtered_2025plus, Monthly_Spend" +
+          (", Monthly_by_Account" if df_monthly_by_account is not None else "") +
+          (", Monthly_by_Campaign" if df_monthly_by_campaign is not None else ""))
+
+
+#----------------------------------------------------------------------------------
+#                        Corrida por etapas
+#----------------------------------------------------------------------------------
+# Cada parte es una etapa con sus entradas y salidas (ver pipeline.py). Se salta
+# si sus entradas no cambiaron desde la última corrida exitosa; las extracciones
+# dependen del día, así que corren una vez por día (o con --force).
+CAMPAIGN_DATA = CAMPAIGN_STORE_DIR if campaign_store is not None else output_path
+ADS_DATA = (ADS_STORE_DIR if STORAGE_BACKEND != 'csv'
+            else os.path.join(BASE_DIR, "datasets", "data", "campaign_video_3s_100pct_1d_ads.csv"))
+# Las ventanas fallidas cambian el archivo de dead letters: la extracción se repite el mismo día
+EXTRACTION_INPUTS = [lambda: date.today().isoformat(), account_map, OFFLINE,
+                     BACKFILL_REFETCH_DAYS, BACKFILL_NEW_ACCOUNT_DAYS, BACKFILL_REQUEST_BUDGET,
+                     DEAD_LETTER_PATH]
+
+# Perfilando, las etapas corren de a una (tracemalloc y el muestreo son de todo el proceso)
+pipeline = Pipeline(PIPELINE_STATE_PATH,
+                    max_workers=1 if POWER_BI_MODE or profiler is not None else PIPELINE_WORKERS,
+                    metrics=metrics, profiler=profiler)
+pipeline.add('extract_campaign', extraer_campaign_1d,
+             inputs=EXTRACTION_INPUTS + [EXTRACTION_MODE], outputs=[CAMPAIGN_DATA])
+pipeline.add('extract_ads', generar_segunda_tabla,
+             inputs=EXTRACTION_INPUTS + [EXTRACTION_MODE],
+             outputs=[ADS_DATA, os.path.join(POWERBI_EXPORT_DIR, "segunda_tabla")],
+             deps=['extract_campaign'] if EXTRACTION_MODE == 'union' else [])
+pipeline.add('rollups', etapa_rollups,
+             inputs=[CAMPAIGN_DATA], outputs=[ROLLUP_DIR], deps=['extract_campaign'])
+pipeline.add('weekly_report', lambda: generar_reporte_semanal(data_ctx),
+             inputs=[ROLLUP_DIR, REPORT_TOP_CAMPAIGNS],
+             outputs=[os.path.join(REPORT_DIR, 'tabla_variaciones.png'),
+                      os.path.join(REPORT_DIR, 'tabla_valores.png')],
+             deps=['rollups'])
+pipeline.add('powerbi_transform', lambda: transformar_para_powerbi(data_ctx),
+             inputs=[CAMPAIGN_DATA, POWERBI_EXPORT_FORMAT, POWERBI_SNAPSHOT],
+             outputs=[os.path.join(POWERBI_EXPORT_DIR, "primera_tabla")],
+             deps=['extract_campaign'])
+pipeline.add('excel_export', lambda: generar_excel_gasto(data_ctx),
+             inputs=[CAMPAIGN_DATA, ROLLUP_DIR], outputs=[OUT_XLSX], deps=['rollups'])
 
+if __name__ == "__main__":
+    if DRY_RUN:
+        planes = [planear_campaign_1d()]
+        if EXTRACTION_MODE == 'union':
+            print("Modo union: las filas de anuncio salen de los requests de campañas")
+        else:
+            planes.append(planear_ads())
+        print(f"Total: {sum(len(p[0]) for p in planes)} ventanas, "
+              f"~{sum(p[2] for p in planes)} requests estimados")
+        print("Dry-run: no se consulta la API ni se modifica ningún archivo.")
+        sys.exit(0)
+
+    # En Power BI todas las etapas corren (primera_tabla / segunda_tabla tienen que quedar cargadas)
+    resultados = pipeline.run(
+        only=[n.strip() for n in ARGS.only.split(',')] if ARGS.only else None,
+        start=ARGS.from_stage,
+        force=ARGS.force or POWER_BI_MODE,
+    )
+    metrics.summary()
+    if profiler is not None:
+        profiler.report()
+    api_retry.report()
+    dead_letters.report()
+    if response_cache is not None:
+        response_cache.report()
+    data_ctx.report()
+    if not POWER_BI_MODE and any(status == 'error' for status, _ in resultados.values()):
+        sys.exit(1)
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+Capa de reintentos compartida por todas las llamadas a la API de Meta.
+
+- classify(exc): tipo de error a partir del código de FacebookRequestError
+  (o de cualquier objeto con api_error_code()):
+  rate_limit (4, 17, 32, 613, 80000-80014), transient (1, 2, 5xx, errores de
+  red), auth (102, 190), too_large (el planificador parte el rango) y fatal.
+- RetryPolicy: reintenta rate_limit y transient con back-off exponencial y
+  jitter, con un presupuesto de reintentos por corrida y un circuit breaker
+  por cuenta (tras N llamadas fallidas seguidas la cuenta se saltea hasta que
+  pase el enfriamiento). auth, too_large y fatal no se reintentan.
+- DeadLetters: ventanas que fallaron después de los reintentos, en un JSON.
+  La corrida siguiente las pide primero (merge_plan).
+
+Reloj, sleep y generador aleatorio son inyectables para probarla con una API
+falsa que inyecta errores (ver benchmarks/bench_retry.py).
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from datetime import date, datetime
+
+from backfill import day_span
+from insights_planner import contiguous_ranges, is_too_large_error
+
+
+RATE_LIMIT = 'rate_limit'
+TRANSIENT = 'transient'
+AUTH = 'auth'
+TOO_LARGE = 'too_large'
+FATAL = 'fatal'
+
+RATE_LIMIT_CODES = {4, 17, 32, 613} | set(range(80000, 80015))
+TRANSIENT_CODES = {1, 2}
+AUTH_CODES = {102, 190}
+
+
+class CircuitOpenError(Exception):
+    """La cuenta acumuló demasiadas fallas seguidas: no se llama hasta que se enfríe."""
+
+
+def _call_or_value(obj, name):
+    value = getattr(obj, name, None)
+    return value() if callable(value) else value
+
+
+def classify(exc) -> str:
+    """Tipo de error de una llamada a la API (ver constantes del módulo)."""
+    if isinstance(exc, CircuitOpenError):
+        return FATAL
+    if is_too_large_error(exc):
+        return TOO_LARGE
+    code = _call_or_value(exc, 'api_error_code')
+    if code is not None:
+        code = int(code)
+        if code in AUTH_CODES:
+            return AUTH
+        if code in RATE_LIMIT_CODES:
+            return RATE_LIMIT
+        if code in TRANSIENT_CODES or _call_or_value(exc, 'api_transient_error'):
+            return TRANSIENT
+    status = _call_or_value(exc, 'http_status')
+    if status is not None and int(status) >= 500:
+        return TRANSIENT
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return TRANSIENT
+    return FATAL
+
+
+class RetryPolicy:
+    """
+    max_attempts: intentos por llamada (el primero incluido)
+    base_s / rate_limit_base_s: espera del primer reintento (transient / rate_limit);
+        se duplica en cada intento hasta max_delay_s y se aplica jitter
+        (entre la mitad y el total)
+    budget: reintentos por corrida entre todas las llamadas (None = sin tope)
+    breaker_failures: llamadas fallidas seguidas que abren el circuito de una cuenta
+    breaker_cooldown_s: segundos que el circuito queda abierto
+    limiter: TokenBucket compartido; un rate_limit lo pausa para todos los hilos
+    metrics: RunMetrics (opcional); cada espera queda como evento sleep
+    """
+
+    def __init__(self, max_attempts=4, base_s=2.0, rate_limit_base_s=60.0, max_delay_s=300.0, budget=40,
+                 breaker_failures=3, breaker_cooldown_s=900.0, limiter=None, metrics=None,
+                 clock=time.monotonic, sleep=time.sleep, rng=None):
+        self.max_attempts = max_attempts
+        self.base_s = base_s
+        self.rate_limit_base_s = rate_limit_base_s
+        self.max_delay_s = max_delay_s
+        self.budget = budget
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown_s = breaker_cooldown_s
+        self.limiter = limiter
+        self.metrics = metrics
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self.retries = {}         # tipo -> reintentos hechos
+        self.failed = {}          # tipo -> llamadas que fallaron del todo
+        self.breakers_opened = 0
+        self.short_circuited = 0
+        self._budget_warned = False
+        self._failures = {}       # cuenta -> fallas seguidas
+        self._open_until = {}     # cuenta -> reloj hasta el que no se llama
+        self._lock = threading.Lock()
+
+    def delay(self, kind, attempt) -> float:
+        """Espera antes del reintento número attempt (1 = primer reintento)."""
+        base = self.rate_limit_base_s if kind == RATE_LIMIT else self.base_s
+        full = min(self.max_delay_s, base * 2 ** (attempt - 1))
+        return self.rng.uniform(full / 2, full)
+
+    def _take_retry(self, kind):
+        with self._lock:
+            used = sum(self.retries.values())
+            if self.budget is not None and used >= self.budget:
+                if not self._budget_warned:
+                    print(f"⚠️ Presupuesto de reintentos agotado ({self.budget}): las fallas ya no se reintentan")
+                    self._budget_warned = True
+                return False
+            self.retries[kind] = self.retries.get(kind, 0) + 1
+            return True
+
+    def _check_breaker(self, key):
+        with self._lock:
+            until = self._open_until.get(key)
+            if until is None:
+                return
+            if self.clock() < until:
+                self.short_circuited += 1
+                raise CircuitOpenError(f"Circuito abierto para {key}: "
+                                       f"{self._failures.get(key, 0)} fallas seguidas")
+            # Medio abierto: se deja pasar una llamada; si falla se vuelve a abrir
+            del self._open_until[key]
+            self._failures[key] = self.breaker_failures - 1
+
+    def _settle(self, key, kind=None):
+        """Cierra el circuito tras un éxito o suma una falla (y lo abre si corresponde)."""
+        with self._lock:
+            if kind is None:
+                self._failures.pop(key, None)
+                return
+            self.failed[kind] = self.failed.get(kind, 0) + 1
+            if key is None or kind in (TOO_LARGE, AUTH):
+                return
+            self._failures[key] = self._failures.get(key, 0) + 1
+            if self._failures[key] >= self.breaker_failures and key not in self._open_until:
+                self._open_until[key] = self.clock() + self.breaker_cooldown_s
+                self.breakers_opened += 1
+                print(f"⚠️ Circuito abierto para {key} por {self.breaker_cooldown_s:.0f}s "
+                      f"tras {self._failures[key]} fallas seguidas")
+
+    def call(self, fn, *args, key=None, source='api', **kwargs):
+        """fn(*args, **kwargs) con reintentos. key: cuenta del circuit breaker."""
+        if key is not None:
+            self._check_breaker(key)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                kind = classify(e)
+                if kind not in (RATE_LIMIT, TRANSIENT) or attempt >= self.max_attempts \
+                        or not self._take_retry(kind):
+                    self._settle(key, kind)
+                    raise
+                wait = self.delay(kind, attempt)
+                print(f"⚠️ {kind} en {source} {key or ''} (intento {attempt}/{self.max_attempts}): {e}. "
+                      f"Reintento en {wait:.1f}s")
+                if kind == RATE_LIMIT and self.limiter is not None:
+                    # Los demás hilos también esperan (la cuota es por app / cuenta)
+                    self.limiter.observe_usage(100.0, wait)
+                self.sleep(wait)
+                if self.metrics is not None:
+                    self.metrics.record('sleep', source=source, reason=f'retry_{kind}', seconds=round(wait, 3))
+                continue
+            if key is not None:
+                self._settle(key)
+            return result
+
+    def report(self):
+        print("\n=== Reintentos de API ===")
+        budget = '-' if self.budget is None else self.budget
+        print(f"Reintentos: {sum(self.retries.values())}/{budget} "
+              f"({', '.join(f'{k}: {v}' for k, v in sorted(self.retries.items())) or 'ninguno'}). "
+              f"Fallas finales: {', '.join(f'{k}: {v}' for k, v in sorted(self.failed.items())) or 'ninguna'}. "
+              f"Circuitos abiertos: {self.breakers_opened} ({self.short_circuited} llamadas salteadas)")
+
+
+class DeadLetters:
+    """
+    Ventanas (account_id, label, since, until) que fallaron, por origen
+    ('campaign', 'ad', ...), guardadas en un JSON para la próxima corrida.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = self._load()
+        self.added = 0
+        self.resolved = 0
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def _matches(e, source, window):
+        return (e['source'], e['account_id'], e['since'], e['until']) == \
+            (source, window[0], window[2].isoformat(), window[3].isoformat())
+
+    def windows(self, source, account_map=None):
+        """Ventanas pendientes de un origen (solo cuentas de account_map, si se da)."""
+        with self._lock:
+            return [(e['account_id'], e['label'], date.fromisoformat(e['since']), date.fromisoformat(e['until']))
+                    for e in self.entries
+                    if e['source'] == source and (account_map is None or e['account_id'] in account_map)]
+
+    def add(self, source, window, error):
+        with self._lock:
+            entry = next((e for e in self.entries if self._matches(e, source, window)), None)
+            if entry is None:
+                entry = {'source': source, 'account_id': window[0], 'label': window[1],
+                         'since': window[2].isoformat(), 'until': window[3].isoformat(), 'attempts': 0}
+                self.entries.append(entry)
+            entry['attempts'] += 1
+            entry['kind'] = classify(error)
+            entry['error'] = f"{type(error).__name__}: {error}"
+            entry['failed_at'] = datetime.now().isoformat(timespec='seconds')
+            self.added += 1
+            self._save()
+
+    def resolve(self, source, window):
+        """Quita la ventana (salió bien en esta corrida). True si estaba pendiente."""
+        with self._lock:
+            before = len(self.entries)
+            self.entries = [e for e in self.entries if not self._matches(e, source, window)]
+            if len(self.entries) == before:
+                return False
+            self.resolved += 1
+            self._save()
+            return True
+
+    def merge_plan(self, source, planned, account_map=None, max_days=None):
+        """
+        Ventanas pendientes primero y después el plan sin sus días (para no
+        pedir dos veces el mismo día).
+        """
+        dead = self.windows(source, account_map)
+        if not dead:
+            return list(planned)
+        covered = {}
+        for w in dead:
+            covered.setdefault(w[1], set()).update(day_span(w[2], w[3]))
+        out = list(dead)
+        for w in planned:
+            days = day_span(w[2], w[3]) - covered.get(w[1], set())
+            out.extend((w[0], w[1], s, u) for s, u in contiguous_ranges(days, max_days))
+        print(f"Reintentando primero {len(dead)} ventanas fallidas de corridas anteriores ({source})")
+        return out
+
+    def report(self):
+        print(f"Ventanas fallidas: {self.added} nuevas, {self.resolved} recuperadas, "
+              f"{len(self.entries)} pendientes en {self.path}")
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Extracción de insights mediante reportes asíncronos (AdReportRun).
+
+Para backfills grandes a nivel anuncio, en lugar de paginar cada consulta de
+forma síncrona se envían jobs asíncronos, se sondean varios a la vez y las
+páginas del resultado se consumen a medida que cada job termina. Un job que
+falla (o cuyo resultado falla a mitad de lectura, ver read_failed) se reenvía
+solo (sin afectar a los demás) hasta max_attempts veces; si sigue fallando y
+hay fallback, la ventana se pide de forma síncrona.
+"""
+
+import time
+
+
+# Valores de async_status de AdReportRun
+JOB_COMPLETED = "Job Completed"
+JOB_FAILED = "Job Failed"
+JOB_SKIPPED = "Job Skipped"
+
+
+class AsyncReportError(Exception):
+    """Un job asíncrono falló más veces de las permitidas o no terminó a tiempo."""
+
+
+class MetaAsyncReportClient:
+    """Cliente real de jobs asíncronos sobre el SDK de Meta."""
+
+    def submit(self, account_id, fields, params):
+        from facebook_business.adobjects.adaccount import AdAccount
+        return AdAccount(account_id).get_insights(fields=fields, params=params, is_async=True)
+
+    def status(self, job):
+        """Devuelve (async_status, async_percent_completion)."""
+        job.api_get()
+        return job["async_status"], job["async_percent_completion"]
+
+    def results(self, job, page_size=500):
+        # Cursor: las páginas se piden a medida que se itera
+        return job.get_result(params={"limit": page_size})
+
+
+class AsyncReportRunner:
+    """
+    Envía y sondea jobs asíncronos para una lista de ventanas
+    (account_id, label, since, until).
+    client: objeto con submit/status/results (MetaAsyncReportClient o un fake)
+    max_in_flight: jobs simultáneos en curso
+    metrics: RunMetrics (opcional); envíos y sondeos quedan como api_call
+    retry: RetryPolicy (opcional, api_retry.py); reintenta envíos y sondeos
+    que fallan por rate limit o errores transitorios, por cuenta
+    fallback: función (account_id, since, until) -> filas (opcional, p. ej.
+    InsightsPlanner.fetch_range) para las ventanas cuyos jobs agotan los intentos
+    """
+
+    def __init__(self, client, fields, params, limiter=None, max_in_flight=4,
+                 poll_interval=5.0, max_attempts=3, timeout=1800.0,
+                 clock=time.monotonic, sleep=time.sleep, metrics=None, source='async', retry=None,
+                 fallback=None):
+        self.client = client
+        self.fields = list(fields)
+        self.params = dict(params)
+        self.limiter = limiter
+        self.max_in_flight = max_in_flight
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.clock = clock
+        self.sleep = sleep
+        self.metrics = metrics
+        self.source = source
+        self.retry = retry
+        self.fallback = fallback
+        self.jobs_submitted = 0
+        self.fallbacks = 0
+        self._read_failures = []
+
+    def _call(self, fn, *args, key=None):
+        if self.retry is not None:
+            return self.retry.call(self._attempt, fn, *args, key=key, source=self.source)
+        return self._attempt(fn, *args)
+
+    def _attempt(self, fn, *args):
+        waited = self.limiter.acquire() if self.limiter is not None else 0.0
+        if self.metrics is None:
+            return fn(*args)
+        t0 = time.perf_counter()
+        error = None
+        try:
+            return fn(*args)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.metrics.record('api_call', source=self.source, call=fn.__name__,
+                                seconds=round(time.perf_counter() - t0, 3), rows=0, bytes=0,
+                                limiter_wait_s=round(waited, 3), error=error)
+
+    def _submit(self, window):
+        account_id, _, since, until = window
+        params = dict(self.params)
+        params["time_range"] = {"since": since.isoformat(), "until": until.isoformat()}
+        self.jobs_submitted += 1
+        return self._call(self.client.submit, account_id, self.fields, params, key=account_id)
+
+    def _give_up(self, window, error):
+        """(window, rows, error) de una ventana que agotó los intentos asíncronos."""
+        if self.fallback is None:
+            return window, [], error
+        account_id, label, since, until = window
+        print(f"⚠️ {error}. Se pide {label} {since} - {until} de forma síncrona.")
+        self.fallbacks += 1
+        try:
+            return window, self.fallback(account_id, since, until), None
+        except Exception as e:
+            return window, [], e
+
+    def read_failed(self, window, error):
+        """
+        Avisa que leer el resultado de window falló a mitad de camino (el que
+        consume el cursor descarta lo que alcanzó a leer). La ventana sigue el
+        mismo camino que un job fallido: reenvío, fallback o error.
+        """
+        self._read_failures.append((window, error))
+
+    def _job_failed(self, w, status, attempts, pending, error=None):
+        """Reencola w o, agotados los intentos, devuelve el resultado de _give_up."""
+        if attempts[w] < self.max_attempts:
+            print(f"⚠️ Job {w[1]} {w[2]} - {w[3]} terminó como '{status}'; "
+                  f"reintento {attempts[w] + 1}/{self.max_attempts}")
+            pending.append(w)
+            return None
+        return self._give_up(w, error or AsyncReportError(
+            f"Job {w[1]} {w[2]} - {w[3]} falló {attempts[w]} veces ('{status}')"))
+
+    def _deliver(self, item, attempts, pending, cursor=False):
+        """Entrega item y atiende un read_failed sobre él (cursor: como un job fallido)."""
+        yield item
+        failures, self._read_failures = self._read_failures, []
+        if not failures:
+            return
+        w, e = item[0], failures[-1][1]
+        if not cursor:
+            # Filas del fallback: no se vuelven a pedir
+            yield w, [], e
+            return
+        out = self._job_failed(w, f"error leyendo el resultado: {e}", attempts, pending, error=e)
+        if out is not None:
+            yield from self._deliver(out, attempts, pending)
+
+    def run(self, windows):
+        """
+        Genera (window, rows, error) por ventana a medida que sus jobs terminan.
+        rows es un iterable perezoso sobre las páginas del resultado; hay que
+        consumirlo antes de pedir el siguiente elemento del generador y, si la
+        lectura falla, llamar a read_failed antes de pedirlo.
+        """
+        pending = list(windows)
+        attempts = {}
+        in_flight = []  # [(window, job, enviado_en)]
+        self._read_failures = []
+
+        while pending or in_flight:
+            # Rellenar hasta max_in_flight jobs en curso
+            while pending and len(in_flight) < self.max_in_flight:
+                w = pending.pop(0)
+                attempts[w] = attempts.get(w, 0) + 1
+                try:
+                    in_flight.append((w, self._submit(w), self.clock()))
+                except Exception as e:
+                    if attempts[w] < self.max_attempts:
+                        print(f"⚠️ No se pudo enviar job {w[1]} {w[2]} - {w[3]}: {e}. Reintentando.")
+                        pending.append(w)
+                    else:
+                        yield from self._deliver(self._give_up(w, e), attempts, pending)
+
+            still_running = []
+            progressed = False
+            for w, job, started in in_flight:
+                try:
+                    status, pct = self._call(self.client.status, job, key=w[0])
+                except Exception as e:
+                    status, pct = JOB_FAILED, 0
+                    print(f"⚠️ Error sondeando job {w[1]} {w[2]} - {w[3]}: {e}")
+
+                if status == JOB_COMPLETED:
+                    progressed = True
+                    yield from self._deliver((w, self.client.results(job), None), attempts, pending, cursor=True)
+                elif status in (JOB_FAILED, JOB_SKIPPED) or self.clock() - started > self.timeout:
+                    progressed = True
+                    if status not in (JOB_FAILED, JOB_SKIPPED):
+                        status = f"sin terminar tras {self.timeout:.0f} s"
+                    out = self._job_failed(w, status, attempts, pending)
+                    if out is not None:
+                        yield from self._deliver(out, attempts, pending)
+                else:
+                    still_running.append((w, job, started))
+            in_flight = still_running
+
+            # Esperar solo si en esta vuelta ningún job terminó
+            if in_flight and not progressed:
+                self.sleep(self.poll_interval)
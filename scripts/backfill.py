@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Planificador de backfill a partir de la cobertura guardada en el manifiesto.
+
+En lugar de pedir siempre "los 7 días siguientes a la última fecha", calcula
+las celdas (cuenta, día) que faltan: días después de la última fecha hasta
+ayer, huecos (gaps) dentro del histórico y una ventana de re-extracción de
+los días recientes (Meta revisa la atribución durante varios días). Luego
+arma el mínimo de requests (rangos contiguos por cuenta, uniendo huecos
+cortos) y los prioriza hasta agotar un presupuesto de requests.
+"""
+
+import math
+from datetime import date, timedelta
+
+from insights_planner import contiguous_ranges
+
+
+def day_span(since, until):
+    """Días de since a until inclusive (vacío si since > until)."""
+    return {since + timedelta(days=i) for i in range((until - since).days + 1)}
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+def missing_cells(coverage, account_map, today, refetch_days=3, new_account_days=7):
+    """
+    Celdas a extraer por cuenta: {label: set(date)}.
+    coverage: {label: {'max_date', 'gaps', 'empty_days'}} (ver Manifest.coverage)
+    refetch_days: días recientes que se vuelven a pedir aunque ya existan
+    new_account_days: días a pedir para una cuenta sin datos
+    """
+    end = today - timedelta(days=1)  # el día en curso todavía está incompleto
+    cells = {}
+    for _, label in account_map.items():
+        info = coverage.get(label) or {}
+        days = set()
+        if info.get('max_date'):
+            days |= day_span(_as_date(info['max_date']) + timedelta(days=1), end)
+            for since, until in info.get('gaps', []):
+                days |= day_span(_as_date(since), _as_date(until))
+            # Días ya consultados que la API devolvió vacíos (cuenta sin actividad)
+            for since, until in info.get('empty_days', []):
+                days -= day_span(_as_date(since), _as_date(until))
+        else:
+            days |= day_span(end - timedelta(days=new_account_days - 1), end)
+        days |= day_span(end - timedelta(days=refetch_days - 1), end) if refetch_days > 0 else set()
+        cells[label] = days
+    return cells
+
+
+def bridge_ranges(ranges, bridge_days=0, max_days=None):
+    """
+    Une rangos separados por a lo más bridge_days días: se re-extraen algunos
+    días que ya existen (el upsert los pisa) a cambio de un request menos.
+    """
+    out = []
+    for since, until in sorted(ranges):
+        if out:
+            prev_since, prev_until = out[-1]
+            gap = (since - prev_until).days - 1
+            if gap <= bridge_days and (max_days is None or (until - prev_since).days < max_days):
+                out[-1] = (prev_since, max(prev_until, until))
+                continue
+        out.append((since, until))
+    return out
+
+
+def estimate_requests(window, rows_per_day=0.0, page_size=25):
+    """Requests estimados de una ventana: páginas según filas por día (mínimo 1)."""
+    days = (window[3] - window[2]).days + 1
+    return max(1, math.ceil(days * rows_per_day / page_size))
+
+
+def rows_per_day(coverage):
+    """{label: filas promedio por día} a partir de la cobertura del manifiesto."""
+    out = {}
+    for label, info in coverage.items():
+        if info.get('rows') and info.get('min_date') and info.get('max_date'):
+            days = (_as_date(info['max_date']) - _as_date(info['min_date'])).days + 1
+            out[label] = info['rows'] / days
+    return out
+
+
+def plan_backfill(cells, account_map, max_days=None, bridge_days=0, budget=None,
+                  rows_per_day=None, page_size=25):
+    """
+    Ventanas (account_id, label, since, until) a pedir, las más recientes primero.
+    budget: tope de requests estimados (None = sin tope)
+    rows_per_day: {label: filas promedio por día} para estimar la paginación
+    Devuelve (planned, deferred, estimated_requests).
+    """
+    rows_per_day = rows_per_day or {}
+    windows = []
+    for account_id, label in account_map.items():
+        ranges = bridge_ranges(contiguous_ranges(cells.get(label, ()), max_days), bridge_days, max_days)
+        windows.extend((account_id, label, since, until) for since, until in ranges)
+    windows.sort(key=lambda w: (w[3], w[2]), reverse=True)
+
+    planned, deferred, total = [], [], 0
+    for w in windows:
+        rate = rows_per_day.get(w[1], 0.0)
+        cost = estimate_requests(w, rate, page_size)
+        if budget is not None and total + cost > budget:
+            # Tomar los primeros días que entran; el resto queda para la próxima corrida
+            fit = int((budget - total) * page_size // rate) if rate > 0 else 0
+            if fit >= 1:
+                head = (w[0], w[1], w[2], w[2] + timedelta(days=fit - 1))
+                planned.append(head)
+                total += estimate_requests(head, rate, page_size)
+                deferred.append((w[0], w[1], head[3] + timedelta(days=1), w[3]))
+            else:
+                deferred.append(w)
+            continue
+        planned.append(w)
+        total += cost
+    return planned, deferred, total
+
+
+def print_plan(planned, deferred, estimated, title="Plan de extracción"):
+    """Resumen legible del plan (modo dry-run y log de cada corrida)."""
+    print(f"\n=== {title} ===")
+    for _, label, since, until in sorted(planned, key=lambda w: (w[1], w[2])):
+        print(f"  {label}: {since} → {until} ({(until - since).days + 1} días)")
+    print(f"Requests: {len(planned)} ventanas, ~{estimated} requests estimados con paginación")
+    if deferred:
+        days = sum((w[3] - w[2]).days + 1 for w in deferred)
+        print(f"Pospuesto por presupuesto: {len(deferred)} ventanas ({days} días cuenta)")
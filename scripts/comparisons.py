@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Comparaciones semanales WoW / MoM / YoY en una sola pasada.
+
+Para cada semana (y opcionalmente cada cuenta o campaña) busca la semana
+anterior, la misma semana del mes anterior (4 semanas antes) y la misma semana
+del año anterior (52 semanas antes) por fecha de calendario, no por posición:
+si falta una semana en los datos la comparación queda vacía en lugar de tomar
+otra semana. El resultado es una tabla larga (una fila por semana y métrica)
+de la que salen las tablas del reporte de cualquier semana sin recalcular.
+"""
+
+import numpy as np
+import pandas as pd
+
+from rollups import derive_ratios
+
+
+METRICS = ['spend', 'messaging_started', 'cpl', 'ctr', 'unique_link_clicks_ctr']
+RATIO_METRIC = 'CTR (todos / links)'
+
+# Nombre de la comparación -> distancia en el calendario
+OFFSETS = {
+    'prev_week': pd.Timedelta(weeks=1),
+    'prev_month': pd.Timedelta(weeks=4),
+    'prev_year': pd.Timedelta(weeks=52),
+}
+
+COLUMNAS_PCT = {
+    'pct_prev_week': 'Cambio vs Semana Anterior (%)',
+    'pct_prev_month': 'Cambio vs Misma Semana Mes Anterior (%)',
+    'pct_prev_year': 'Cambio vs Misma Semana Año Anterior (%)',
+}
+COLUMNAS_VALORES = {
+    'prev_week': 'Semana Anterior',
+    'prev_month': 'Misma Semana Mes Anterior',
+    'prev_year': 'Misma Semana Año Anterior',
+}
+
+
+def _safe_div(a, b):
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(b != 0, a / b, np.nan)
+
+
+def change_pct(actual, base):
+    """(actual - base) / base en %, redondeado a 2; NaN si base es 0 o falta."""
+    actual = np.asarray(actual, dtype=float)
+    return np.round(_safe_div(actual - np.asarray(base, dtype=float), base) * 100, 2)
+
+
+def weekly_frame(cube, by=None):
+    """
+    Cubo semanal de rollups (sumas por week_start / month_start) -> métricas por
+    (by..., week_start) con los ratios derivados. by=None: total de todas las cuentas.
+    """
+    by = list(by or [])
+    sums = [c for c in cube.columns if c not in {'account_id', 'campaign_id', 'campaign_name',
+                                                  'week_start', 'month_start'}]
+    df = cube.groupby(by + ['week_start'], sort=True)[sums].sum()
+    return derive_ratios(df)
+
+
+def weekly_comparisons(dfw, metrics=METRICS, by=None):
+    """
+    Tabla larga con una fila por (by..., week_start, metric):
+    value, prev_week, prev_month, prev_year y pct_prev_* (cambio en %).
+    dfw: métricas semanales indexadas por week_start (df_weekly) o por
+         (by..., week_start) (weekly_frame).
+    Incluye la métrica derivada RATIO_METRIC = ctr / unique_link_clicks_ctr.
+    """
+    by = list(by or [])
+    keys = by + ['week_start']
+    wide = dfw.reset_index()
+    wide['week_start'] = pd.to_datetime(wide['week_start'])
+    wide = wide.set_index(keys)[list(metrics)].astype(float)
+    wide[RATIO_METRIC] = _safe_div(wide['ctr'], wide['unique_link_clicks_ctr'])
+    cols = list(wide.columns)
+
+    out = {'value': wide.to_numpy()}
+    week = wide.index.get_level_values('week_start')
+    for name, offset in OFFSETS.items():
+        # Misma clave, semana desplazada en el calendario
+        if by:
+            arrays = [wide.index.get_level_values(k) for k in by] + [week - offset]
+            target = pd.MultiIndex.from_arrays(arrays, names=keys)
+        else:
+            target = week - offset
+        out[name] = wide.reindex(target).to_numpy()
+
+    n, m = out['value'].shape
+    tidy = pd.DataFrame({k: np.repeat(wide.index.get_level_values(k), m) for k in keys})
+    tidy['metric'] = np.tile(cols, n)
+    for name, values in out.items():
+        tidy[name] = values.ravel()
+    for name in OFFSETS:
+        tidy[f'pct_{name}'] = change_pct(tidy['value'], tidy[name])
+
+    if 'period' in dfw.columns:
+        period = dfw.reset_index().set_index(keys)['period']
+        tidy.insert(len(keys), 'period', np.repeat(period.reindex(wide.index).to_numpy(), m))
+    return tidy
+
+
+def _semana(comp, week_start, group=None):
+    sel = comp['week_start'].to_numpy() == np.datetime64(pd.Timestamp(week_start))
+    for k, v in (group or {}).items():
+        sel &= (comp[k] == v).to_numpy()
+    if not sel.any():
+        raise KeyError(f"Semana {pd.Timestamp(week_start).date()} sin datos{f' para {group}' if group else ''}.")
+    return comp[sel]
+
+
+def _tabla(s, columnas, decimales_ratio, redondear_todo):
+    metricas = s['metric'].to_numpy()
+    valores = s[['value'] + list(columnas)].to_numpy(dtype=float)
+    ratio = metricas == RATIO_METRIC
+    if redondear_todo:
+        valores[ratio] = np.round(valores[ratio], decimales_ratio)
+    else:
+        valores[ratio, 0] = np.round(valores[ratio, 0], decimales_ratio)
+    df = pd.DataFrame(valores, columns=['Semana Actual'] + list(columnas.values()))
+    df.insert(0, 'Métrica', metricas)
+    return df
+
+
+def tabla_variaciones(comp, week_start, group=None):
+    """Tabla de variaciones (%) de una semana, con el formato del PNG."""
+    return _tabla(_semana(comp, week_start, group), COLUMNAS_PCT, 2, redondear_todo=False)
+
+
+def tabla_valores(comp, week_start, group=None):
+    """Tabla de valores absolutos de una semana, con el formato del PNG."""
+    return _tabla(_semana(comp, week_start, group), COLUMNAS_VALORES, 4, redondear_todo=True)
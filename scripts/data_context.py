@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Contexto de datos compartido por todas las etapas de una corrida.
+
+campaign_1d se lee y normaliza una sola vez (fechas como datetime64, IDs como
+texto, métricas numéricas). Cada etapa pide una vista (columnas y rango de
+fechas) en lugar de volver a leer el disco, y las filas nuevas de la
+extracción se incorporan en memoria después del upsert. Al final de la
+corrida report() estima la lectura y el parseo que se evitaron.
+"""
+
+import threading
+import time
+
+import pandas as pd
+
+
+class RunDataContext:
+    """
+    loader: función sin argumentos que lee el dataset completo desde disco
+    keys: columnas que identifican una fila (para incorporar filas nuevas)
+    date_col: columna de fecha
+    text_cols: columnas que se normalizan a texto
+    size_bytes: función opcional que devuelve el tamaño en disco del dataset
+    """
+
+    def __init__(self, loader, keys, date_col='date', text_cols=(), size_bytes=None):
+        self.loader = loader
+        self.keys = list(keys)
+        self.date_col = date_col
+        self.text_cols = list(text_cols)
+        self.size_bytes = size_bytes
+        self.load_seconds = 0.0
+        self.bytes_read = 0
+        self.views = {}  # etapa -> vistas servidas desde memoria
+        self._df = None
+        # Las etapas pueden correr en hilos en paralelo (ver pipeline.py)
+        self._lock = threading.RLock()
+
+    # ---------------- carga ----------------
+    def _normalize(self, df):
+        df = df.copy()
+        df[self.date_col] = pd.to_datetime(df[self.date_col], errors='coerce')
+        for c in self.text_cols:
+            if c in df.columns:
+                df[c] = df[c].astype('string')
+        for c in df.columns:
+            if c != self.date_col and c not in self.text_cols and df[c].dtype == object:
+                converted = pd.to_numeric(df[c], errors='coerce')
+                # Solo columnas que realmente son numéricas (no nombres ni etiquetas)
+                if converted.notna().sum() == df[c].notna().sum():
+                    df[c] = converted
+        return df
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """Dataset completo normalizado (se carga en el primer acceso)."""
+        with self._lock:
+            if self._df is None:
+                t0 = time.perf_counter()
+                self._df = self._normalize(self.loader())
+                self.load_seconds = time.perf_counter() - t0
+                self.bytes_read = self.size_bytes() if self.size_bytes else 0
+                print(f"Dataset cargado una vez: {len(self._df)} filas en {self.load_seconds:.2f}s "
+                      f"({self.bytes_read / 1e6:.1f} MB)")
+            return self._df
+
+    # ---------------- vistas ----------------
+    def view(self, stage, columns=None, start=None, end=None) -> pd.DataFrame:
+        """
+        Copia de las columnas y el rango de fechas pedidos (inclusive) para una
+        etapa; la etapa puede modificarla sin afectar al resto.
+        """
+        df = self.df
+        mask = None
+        if start is not None:
+            mask = df[self.date_col] >= pd.Timestamp(start)
+        if end is not None:
+            m = df[self.date_col] <= pd.Timestamp(end)
+            mask = m if mask is None else mask & m
+        if mask is not None:
+            df = df[mask]
+        if columns is not None:
+            df = df[list(columns)]
+        with self._lock:
+            self.views[stage] = self.views.get(stage, 0) + 1
+        return df.reset_index(drop=True).copy()
+
+    def merge(self, df_new):
+        """Incorpora filas nuevas (ya persistidas) sin releer el dataset."""
+        if df_new is None or len(df_new) == 0:
+            return
+        new = self._normalize(df_new)
+        with self._lock:
+            base = self.df
+            for c in self.text_cols:
+                if c in base.columns and c in new.columns:
+                    new[c] = new[c].astype(base[c].dtype)
+            combined = pd.concat([base, new], ignore_index=True)
+            combined = combined.drop_duplicates(subset=self.keys, keep='last')
+            self._df = combined.sort_values(self.keys, kind='stable').reset_index(drop=True)
+
+    # ---------------- reporte ----------------
+    def report(self):
+        """Lecturas evitadas: cada vista habría sido una lectura y parseo completos."""
+        served = sum(self.views.values())
+        if self._df is None or served == 0:
+            return
+        print("\n=== Contexto de datos ===")
+        print(f"Lecturas de disco: 1 ({self.bytes_read / 1e6:.1f} MB, {self.load_seconds:.2f}s de lectura + parseo)")
+        for stage, n in self.views.items():
+            print(f"  {stage}: {n} vista(s) desde memoria")
+        # Cota superior: las etapas que leían solo columnas/meses cargaban menos
+        print(f"Evitado (estimado, como máximo): {served} lecturas, ~{served * self.bytes_read / 1e6:.1f} MB "
+              f"y ~{served * self.load_seconds:.2f}s")
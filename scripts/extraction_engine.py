@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Motor de extracción concurrente por cuenta y ventana de fechas.
+
+Reparte las ventanas (account_id, label, since, until) en un pool de hilos.
+El ritmo de llamadas no se controla aquí sino en el TokenBucket compartido
+que usa la función fetch.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def build_windows(account_map, ranges):
+    """Producto cuentas x rangos: [(account_id, label, since, until), ...]"""
+    return [
+        (account_id, label, since, until)
+        for account_id, label in account_map.items()
+        for since, until in ranges
+    ]
+
+
+def run_windows(fetch, windows, max_workers=4):
+    """
+    Ejecuta fetch(account_id, since, until) para cada ventana en paralelo.
+    Genera (window, rows, error) a medida que terminan; error es None si salió bien.
+    El procesamiento de rows queda en el hilo que consume el generador.
+    """
+    if max_workers <= 1:
+        for w in windows:
+            try:
+                yield w, fetch(w[0], w[2], w[3]), None
+            except Exception as e:
+                yield w, [], e
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="meta-extract") as pool:
+        futures = {pool.submit(fetch, w[0], w[2], w[3]): w for w in windows}
+        for fut in as_completed(futures):
+            w = futures[fut]
+            try:
+                yield w, fut.result(), None
+            except Exception as e:
+                yield w, [], e
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Aplanado por chunk de los arrays de actions de Meta.
+
+Recibe un chunk de filas crudas de insights y arma las columnas por
+action_type en una sola pasada: las listas anidadas (actions,
+video_*_actions) se aplanan a tres vectores (fila, columna, valor) quedándose
+solo con los action_types mapeados, los valores se convierten de una vez a
+int64 y cada columna sale de operaciones numpy (suma por fila, primera/última
+aparición) sin try/except por valor.
+El mapeo action_type -> columna es configurable (JSON) para sumar nuevos
+eventos de conversión sin tocar código.
+
+Las filas llegan como dicts, así que leer cada entrada sigue siendo un paso
+Python: con 100k filas, a nivel campaña tarda ~1.1x menos que el bucle por fila
+y a nivel anuncio ~1.7x menos (mediana de benchmarks/bench_flatten_actions.py).
+Lo que se gana sobre todo es no armar un dict por fila, el manejo uniforme de
+valores no numéricos y el mapeo.
+"""
+
+import json
+import os
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from record_stream import AD_SCHEMA, CAMPAIGN_SCHEMA
+
+
+# agg: 'sum' suma todos los valores, 'last' se queda con el último,
+# 'first_nonzero' con el primero distinto de cero (en orden de aparición)
+DEFAULT_CAMPAIGN_ACTIONS = [
+    {
+        'column': 'video_25pct',
+        'field': 'video_p25_watched_actions',
+        'action_types': ['video_view'],
+        'agg': 'sum',
+    },
+    {
+        'column': 'link_clicks',
+        'field': 'actions',
+        'action_types': ['link_click'],
+        'agg': 'last',
+    },
+    {
+        'column': 'messaging_started',
+        'field': 'actions',
+        'action_types': [
+            'onsite_conversion.messaging_conversation_started_7d',
+            'onsite_conversion.messaging_conversation_started',
+            'onsite_conversion.messaging_first_reply',
+        ],
+        'agg': 'first_nonzero',
+    },
+    {
+        'column': 'two_way_conversations',
+        'field': 'actions',
+        'action_types': ['onsite_conversion.messaging_user_depth_2_message_send'],
+        'agg': 'last',
+    },
+]
+
+AD_ACTIONS = [
+    {'column': 'video_plays', 'field': 'video_play_actions', 'action_types': ['video_view'], 'agg': 'sum'},
+    {'column': 'video_100pct_views', 'field': 'video_p100_watched_actions', 'action_types': ['video_view'], 'agg': 'sum'},
+]
+
+AGGS = ('sum', 'last', 'first_nonzero')
+
+
+def load_action_mapping(path=None):
+    """
+    Lee el mapeo de columnas de actions desde un JSON (lista de objetos con
+    column, field, action_types y agg). Sin archivo devuelve el mapeo por defecto.
+    """
+    if not path or not os.path.exists(path):
+        return DEFAULT_CAMPAIGN_ACTIONS
+    with open(path, encoding='utf-8') as f:
+        mapping = json.load(f)
+    for spec in mapping:
+        missing = {'column', 'field', 'action_types', 'agg'} - set(spec)
+        if missing:
+            raise ValueError(f"Mapeo de actions inválido en {path}: faltan {sorted(missing)} en {spec}")
+        if spec['agg'] not in AGGS:
+            raise ValueError(f"agg '{spec['agg']}' no soportado (usar uno de {AGGS})")
+    print(f"Mapeo de actions cargado desde {path}: {[s['column'] for s in mapping]}")
+    return mapping
+
+
+def _numeric(values, dtype):
+    """Conversión vectorizada; lo no numérico o faltante queda en 0."""
+    values = np.asarray(values, dtype=object)
+    try:
+        # Camino rápido: todos los valores son números o textos numéricos
+        out = values.astype(dtype)
+        if out.dtype.kind == 'f':
+            out[np.isnan(out)] = 0.0  # None -> nan en la conversión a float
+        return out
+    except (TypeError, ValueError):
+        return pd.to_numeric(pd.Series(values), errors='coerce').fillna(0).to_numpy(dtype=dtype)
+
+
+def _as_dicts(items):
+    """Solo las entradas tipo dict/Mapping (los objetos del SDK son Mappings)."""
+    return [x for x in items if hasattr(x, 'keys')]
+
+
+def _first_index(i):
+    """Posición de la primera aparición de cada fila en i."""
+    _, pos = np.unique(i, return_index=True)
+    return pos
+
+
+def flatten_actions(rows, specs):
+    """
+    rows: lista de filas de insights (dicts o AdsInsights)
+    specs: mapeo de columnas (ver DEFAULT_CAMPAIGN_ACTIONS)
+    Devuelve {columna: np.ndarray int64 de largo len(rows)}.
+    """
+    n = len(rows)
+    out = {}
+    fields = {}
+    for spec in specs:
+        fields.setdefault(spec['field'], []).append(spec)
+
+    for field, field_specs in fields.items():
+        wanted = sorted({t for spec in field_specs for t in spec['action_types']})
+
+        # (fila, action_type) de todas las filas del chunk, en orden de aparición
+        lists = [r.get(field) or () for r in rows]
+        items = list(chain.from_iterable(lists))
+        try:
+            types = [a.get('action_type') for a in items]
+        except AttributeError:
+            # Entradas que no son dicts: se descartan como en los bucles originales
+            lists = [_as_dicts(x) for x in lists]
+            items = list(chain.from_iterable(lists))
+            types = [a.get('action_type') for a in items]
+        types = pd.Series(types, dtype=object)
+        lens = np.fromiter(map(len, lists), dtype=np.int64, count=n)
+        row_idx = np.repeat(np.arange(n, dtype=np.int64), lens)
+
+        # Solo se leen y convierten los valores de los action_types mapeados
+        hit = np.flatnonzero(types.isin(wanted).to_numpy())
+        hit_types = types.iloc[hit].reset_index(drop=True)
+        hit_rows = row_idx[hit]
+        hit_vals = _numeric([items[j].get('value', 0) for j in hit.tolist()], np.int64)
+
+        for spec in field_specs:
+            sel = hit_types.isin(spec['action_types']).to_numpy()
+            i = hit_rows[sel]
+            v = hit_vals[sel]
+            col = np.zeros(n, dtype=np.int64)
+            if spec['agg'] == 'sum':
+                np.add.at(col, i, v)
+            elif spec['agg'] == 'last':
+                # Primera aparición recorriendo al revés = última en orden original
+                pos = _first_index(i[::-1])
+                col[i[::-1][pos]] = v[::-1][pos]
+            else:
+                nz = v != 0
+                pos = _first_index(i[nz])
+                col[i[nz][pos]] = v[nz][pos]
+            out[spec['column']] = col
+    return out
+
+
+def _curve_pct(r, second):
+    """% de la curva video_play_curve_actions en el segundo indicado."""
+    for entry in r.get('video_play_curve_actions') or ():
+        if not hasattr(entry, 'get') or entry.get('action_type') != 'video_view':
+            continue
+        vals = entry.get('value', [])
+        if isinstance(vals, list) and len(vals) > second:
+            try:
+                return float(vals[second] or 0)
+            except (TypeError, ValueError):
+                return 0.0
+        return 0.0
+    return 0.0
+
+
+def flatten_campaign_chunk(labels, rows, action_specs=None) -> pd.DataFrame:
+    """Chunk de filas nivel campaña -> DataFrame con las columnas de CAMPAIGN_SCHEMA."""
+    action_specs = action_specs or DEFAULT_CAMPAIGN_ACTIONS
+    acts = flatten_actions(rows, action_specs)
+    # Escalares de todas las filas en una sola construcción columnar; dtype=object
+    # evita que pandas convierta cada columna de texto a str para volver a leerla
+    raw = pd.DataFrame(rows, columns=[
+        'date_start', 'campaign_id', 'campaign_name', 'spend', 'impressions',
+        'reach', 'clicks', 'ctr', 'unique_link_clicks_ctr',
+    ], dtype=object)
+    cols = {
+        'account_id': pd.Series(labels, dtype=object),
+        'date': raw['date_start'],
+        'campaign_id': raw['campaign_id'],
+        'campaign_name': raw['campaign_name'],
+        'spend': _numeric(raw['spend'], np.float64),
+        'impressions': _numeric(raw['impressions'], np.int64),
+        'reach': _numeric(raw['reach'], np.int64),
+        'clicks_all': _numeric(raw['clicks'], np.int64),
+        'ctr': _numeric(raw['ctr'], np.float64),
+        'unique_link_clicks_ctr': _numeric(raw['unique_link_clicks_ctr'], np.float64),
+    }
+    cols.update(acts)
+    # Columnas del esquema primero; las de eventos nuevos del mapeo van al final
+    order = [c for c, _ in CAMPAIGN_SCHEMA if c in cols] + [c for c in acts if c not in dict(CAMPAIGN_SCHEMA)]
+    return pd.DataFrame({c: cols[c] for c in order})
+
+
+def flatten_ad_chunk(labels, rows) -> pd.DataFrame:
+    """Chunk de filas nivel anuncio -> DataFrame con las columnas de AD_SCHEMA."""
+    acts = flatten_actions(rows, AD_ACTIONS)
+    raw = pd.DataFrame(rows, columns=['ad_id', 'campaign_id', 'date_start', 'impressions'], dtype=object)
+    impressions = _numeric(raw['impressions'], np.int64)
+    plays = acts['video_plays']
+    p100 = acts['video_100pct_views']
+    pct_3s = np.array([_curve_pct(r, 3) for r in rows], dtype=np.float64)
+
+    video_3s = np.where((plays > 0) & (pct_3s > 0), np.round(plays * (pct_3s / 100.0)), 0).astype(np.int64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        retention_3s = np.where(impressions > 0, video_3s / impressions, 0.0)
+        retention_complete = np.where(video_3s > 0, p100 / video_3s, 0.0)
+
+    cols = {
+        'account': pd.Series(labels, dtype=object),
+        'ad_id': raw['ad_id'],
+        'campaign_id': raw['campaign_id'],
+        'date_start': raw['date_start'],
+        'impressions': impressions,
+        'video_plays': plays,
+        'video_3s_views': video_3s,
+        'video_100pct_views': p100,
+        'retention_3s_pct': retention_3s,
+        'retention_complete_pct': retention_complete,
+        'thruplay': p100,
+        'curve_3s_pct_api': pct_3s,
+    }
+    return pd.DataFrame({c: cols[c] for c, _ in AD_SCHEMA})
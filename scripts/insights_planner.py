@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Planificador de consultas de insights por rangos de varios días.
+
+En vez de llamar a get_insights una vez por cuenta y por día, agrupa los días
+contiguos en un solo time_range (con time_increment=1 Meta igual devuelve una
+fila por día) y solo parte el rango cuando la API avisa que la respuesta es
+demasiado grande.
+
+El cursor se lee página por página dentro del hilo que hizo el request: con
+consume (p. ej. record_stream.chunk_rows) cada página se aplana al llegar y la
+ventana nunca queda como lista de dicts; el cache se escribe fila por fila.
+"""
+
+import threading
+import time
+from datetime import timedelta
+
+from rate_limit import parse_usage_headers
+from run_metrics import rows_bytes
+
+
+# Mensajes con los que Meta pide reducir el volumen de la consulta
+TOO_LARGE_MESSAGES = (
+    "reduce the amount of data",
+    "too much data",
+)
+
+
+def _as_list(account_id, rows):
+    return list(rows)
+
+
+class ResponseTooLargeError(Exception):
+    """La API indica que la respuesta es demasiado grande para el rango pedido."""
+
+
+def is_too_large_error(exc) -> bool:
+    """True si el error de la API pide achicar el rango de la consulta."""
+    if isinstance(exc, ResponseTooLargeError):
+        return True
+    msg = str(exc).lower()
+    return any(m in msg for m in TOO_LARGE_MESSAGES)
+
+
+def contiguous_ranges(dates, max_days=None):
+    """
+    Agrupa fechas en rangos (since, until) de días contiguos.
+    dates: iterable de datetime.date (puede tener huecos o duplicados)
+    max_days: tope de días por rango, o None para no partir rangos contiguos
+    """
+    ranges = []
+    start = prev = None
+    for d in sorted(set(dates)):
+        if start is not None and d == prev + timedelta(days=1) \
+                and (max_days is None or (d - start).days < max_days):
+            prev = d
+            continue
+        if start is not None:
+            ranges.append((start, prev))
+        start = prev = d
+    if start is not None:
+        ranges.append((start, prev))
+    return ranges
+
+
+def split_range(since, until):
+    """Parte un rango en dos mitades contiguas."""
+    mid = since + timedelta(days=(until - since).days // 2)
+    return (since, mid), (mid + timedelta(days=1), until)
+
+
+def response_headers(cursor):
+    """Headers de la última respuesta de un Cursor del SDK (o de un fake), si los hay."""
+    headers = getattr(cursor, "headers", None)
+    if callable(headers):
+        headers = headers()
+    return headers or {}
+
+
+class MetaInsightsClient:
+    """Cliente real: delega en AdAccount.get_insights del SDK de Meta."""
+
+    def get_insights(self, account_id, fields, params):
+        from facebook_business.adobjects.adaccount import AdAccount
+        return AdAccount(account_id).get_insights(fields=fields, params=params)
+
+
+class InsightsPlanner:
+    """
+    Ejecuta consultas de insights por rangos usando un cliente intercambiable.
+    Cualquier objeto con get_insights(account_id, fields, params) sirve como
+    cliente, lo que permite probar contra un fake local sin credenciales.
+    limiter: TokenBucket compartido (opcional); se consulta antes de cada
+    request y se alimenta con los headers de uso de la respuesta.
+    metrics: RunMetrics (opcional); cada request queda como un evento api_call
+    con el nombre source.
+    cache: ResponseCache (opcional); un acierto no consume el limitador ni
+    cuenta en requests_made.
+    retry: RetryPolicy (opcional, api_retry.py); cada request se reintenta
+    según el tipo de error, con circuit breaker por cuenta.
+    """
+
+    def __init__(self, client, fields, params, max_days=None, limiter=None, metrics=None, source='insights',
+                 cache=None, retry=None):
+        self.client = client
+        self.fields = list(fields)
+        self.params = dict(params)
+        self.max_days = max_days
+        self.limiter = limiter
+        self.metrics = metrics
+        self.source = source
+        self.cache = cache
+        self.retry = retry
+        self.requests_made = 0
+        self._lock = threading.Lock()
+
+    def plan(self, dates):
+        return contiguous_ranges(dates, self.max_days)
+
+    def fetch_range(self, account_id, since, until, consume=None) -> list:
+        """
+        Filas del rango (partiéndolo si es demasiado grande).
+        consume(account_id, rows) -> list: lee el cursor de cada request y
+        devuelve lo que se guarda de él (p. ej. chunks ya aplanados); por
+        defecto la lista de filas. Se llama una vez por intento y por mitad.
+        """
+        params = dict(self.params)
+        params["time_range"] = {"since": since.isoformat(), "until": until.isoformat()}
+        try:
+            return self._fetch(account_id, since, until, params, consume or _as_list)
+        except Exception as e:
+            if since == until or not is_too_large_error(e):
+                raise
+            left, right = split_range(since, until)
+            print(f"Respuesta demasiado grande para {since} - {until}; partiendo en "
+                  f"{left[0]} - {left[1]} y {right[0]} - {right[1]}")
+            return self.fetch_range(account_id, *left, consume) + self.fetch_range(account_id, *right, consume)
+
+    def _fetch(self, account_id, since, until, params, consume):
+        """Un request (o un acierto del cache) para el rango exacto."""
+        if self.cache is not None:
+            hit = self.cache.get(account_id, self.fields, params)
+            if hit is not None:
+                rows = hit.get('rows', ())
+                self._record(account_id, since, until, time.perf_counter(), 0.0, 0.0,
+                             len(rows), rows_bytes(rows) if self.metrics is not None else 0, cache_hit=True)
+                if hit.get('too_large'):
+                    raise ResponseTooLargeError(f"Respuesta demasiado grande para {since} - {until} (cache)")
+                return consume(account_id, rows)
+        if self.retry is not None:
+            return self.retry.call(self._request, account_id, since, until, params, consume,
+                                   key=account_id, source=self.source)
+        return self._request(account_id, since, until, params, consume)
+
+    def _tap(self, cursor, read, writer):
+        """Pasa las filas del cursor contando filas/bytes y copiándolas al cache."""
+        for r in cursor:
+            read[0] += 1
+            if self.metrics is not None:
+                read[1] += rows_bytes((r,))
+            if writer is not None:
+                writer.write(r)
+            yield r
+
+    def _request(self, account_id, since, until, params, consume=None):
+        """Un request a la API (un intento)."""
+        with self._lock:
+            self.requests_made += 1
+        waited = self.limiter.acquire() if self.limiter is not None else 0.0
+        t0 = time.perf_counter()
+        request_s = None
+        writer = None
+        try:
+            # Consumir el cursor dentro del try: la paginación también puede fallar
+            cursor = self.client.get_insights(account_id, self.fields, params)
+            request_s = time.perf_counter() - t0
+            read = [0, 0]
+            writer = self.cache.writer(account_id, self.fields, params) if self.cache is not None else None
+            out = (consume or _as_list)(account_id, self._tap(cursor, read, writer))
+            headers = response_headers(cursor)
+            usage_pct = None
+            if self.limiter is not None and headers:
+                usage_pct = self.limiter.observe_headers(headers)
+            elif headers:
+                usage_pct = parse_usage_headers(headers)[0]
+            self._record(account_id, since, until, t0, request_s, waited, read[0], read[1], usage_pct)
+        except Exception as e:
+            if writer is not None:
+                writer.abort()
+            self._record(account_id, since, until, t0, request_s, waited, error=e)
+            # El rango demasiado grande también se cachea: la próxima vez se parte sin pedirlo
+            if self.cache is not None and since != until and is_too_large_error(e):
+                self.cache.put(account_id, self.fields, params, too_large=True)
+            raise
+        if writer is not None:
+            writer.commit()
+        return out
+
+    def _record(self, account_id, since, until, t0, request_s, waited, rows=0, nbytes=0, usage_pct=None,
+                error=None, cache_hit=False):
+        if self.metrics is None:
+            return
+        seconds = time.perf_counter() - t0
+        self.metrics.record(
+            'api_call', source=self.source, account_id=account_id,
+            since=since.isoformat(), until=until.isoformat(),
+            seconds=round(seconds, 3),
+            request_s=None if request_s is None else round(request_s, 3),
+            paging_s=0.0 if request_s is None else round(seconds - request_s, 3),
+            rows=rows, bytes=nbytes,
+            limiter_wait_s=round(waited, 3), usage_pct=usage_pct, cache_hit=cache_hit,
+            error=None if error is None else f"{type(error).__name__}: {error}",
+        )
+
+    def fetch(self, account_id, dates):
+        """Genera (since, until, rows) por cada rango planificado."""
+        for since, until in self.plan(dates):
+            yield since, until, self.fetch_range(account_id, since, until)
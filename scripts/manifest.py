@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+Manifiesto (sidecar JSON) de un dataset diario por cuenta.
+
+Quien escribe el dataset mantiene junto a él un resumen chico por cuenta:
+primera y última fecha, cantidad de filas, días faltantes (gaps) entre ambas y
+un checksum de las claves. Al arrancar alcanza con leer este archivo para saber
+desde qué fecha extraer, sin parsear el histórico.
+
+files_checksum es una huella (ruta, tamaño, mtime) de los archivos de datos:
+si alguien modifica el dataset por fuera, el manifiesto deja de coincidir y se
+reconstruye en la próxima escritura.
+"""
+
+import hashlib
+import io
+import json
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+
+SCHEMA_VERSION = 1
+
+
+def files_checksum(paths) -> str:
+    """Huella barata (sin leer contenido) de un conjunto de archivos."""
+    h = hashlib.sha1()
+    for p in sorted(paths):
+        st = os.stat(p)
+        h.update(f"{p}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+def _dates_to_gaps(dates):
+    """Fechas (ordenadas, únicas) -> rangos [since, until] de días faltantes entre ellas."""
+    gaps = []
+    for prev, cur in zip(dates[:-1], dates[1:]):
+        if (cur - prev).days > 1:
+            gaps.append([(prev + timedelta(days=1)).isoformat(), (cur - timedelta(days=1)).isoformat()])
+    return gaps
+
+
+def _gap_days(gaps):
+    days = set()
+    for since, until in gaps:
+        d, end = date.fromisoformat(since), date.fromisoformat(until)
+        while d <= end:
+            days.add(d)
+            d += timedelta(days=1)
+    return days
+
+
+def csv_tail_last_dates(csv_path, account_col, date_col, nbytes=256 * 1024, encoding='utf-8-sig'):
+    """
+    Última fecha por cuenta leyendo solo el final del CSV (fallback sin
+    manifiesto). Las corridas agregan las filas nuevas al final, así que la cola
+    tiene las fechas más recientes; una cuenta que no aparece en la cola queda
+    afuera y se trata como cuenta sin datos.
+    """
+    with open(csv_path, 'rb') as f:
+        header = f.readline()
+        start = max(f.tell(), os.path.getsize(csv_path) - nbytes)
+        f.seek(start)
+        tail = f.read()
+    if start > len(header):
+        tail = tail.split(b"\n", 1)[1] if b"\n" in tail else b""  # primera línea puede estar cortada
+    df = pd.read_csv(io.BytesIO(header + tail), encoding=encoding, usecols=[account_col, date_col])
+    df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
+    last = df.dropna().groupby(df[account_col].astype(str))[date_col].max()
+    return {acc: ts.date() for acc, ts in last.items()}
+
+
+def csv_coverage(csv_path, manifest):
+    """Cobertura por cuenta de un CSV: del manifiesto si está al día, si no de la cola del archivo."""
+    coverage = manifest.coverage(files_checksum([csv_path]))
+    if coverage is not None:
+        return coverage
+    last = csv_tail_last_dates(csv_path, manifest.account_col, manifest.date_col)
+    return {acc: {'max_date': d.isoformat(), 'gaps': []} for acc, d in last.items()}
+
+
+def _dates_to_ranges(dates):
+    """Fechas -> rangos [since, until] de días contiguos (ISO)."""
+    out = []
+    for d in sorted(set(dates)):
+        if out and (d - date.fromisoformat(out[-1][1])).days == 1:
+            out[-1][1] = d.isoformat()
+        else:
+            out.append([d.isoformat(), d.isoformat()])
+    return out
+
+
+class Manifest:
+    """
+    path: archivo JSON del manifiesto
+    account_col / date_col: columnas de cuenta y fecha del dataset
+    keys: columnas clave (para el checksum por cuenta)
+    """
+
+    def __init__(self, path, account_col, date_col, keys):
+        self.path = path
+        self.account_col = account_col
+        self.date_col = date_col
+        self.keys = list(keys)
+
+    # ---------------- lectura ----------------
+    def load(self):
+        """Contenido del manifiesto, o None si falta o es de otra versión de esquema."""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('schema_version') != SCHEMA_VERSION:
+            return None
+        return data
+
+    def is_fresh(self, checksum) -> bool:
+        data = self.load()
+        return data is not None and data.get('files_checksum') == checksum
+
+    def coverage(self, checksum=None):
+        """{cuenta: {min_date, max_date, rows, gaps, empty_days}}; None si no hay manifiesto válido."""
+        data = self.load()
+        if data is None or (checksum is not None and data.get('files_checksum') != checksum):
+            return None
+        return data['accounts']
+
+    # ---------------- escritura ----------------
+    def _key_sums(self, df):
+        """Suma (mod 2**64) de los hashes de clave por cuenta: no depende del orden de las filas."""
+        keys = df[self.keys].copy()
+        keys[self.date_col] = pd.to_datetime(keys[self.date_col]).dt.strftime('%Y-%m-%d')
+        keys = keys.astype(str)
+        h = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+        sums = {}
+        for acc, idx in keys.groupby(self.account_col).indices.items():
+            sums[acc] = int(np.add.reduce(h[idx], dtype=np.uint64))
+        return sums
+
+    def _save(self, data):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def mark_empty(self, account, days):
+        """
+        Registra días ya consultados que la API devolvió sin filas, para que el
+        backfill no los vuelva a pedir como huecos en cada corrida.
+        """
+        data = self.load()
+        if data is None or not days:
+            return
+        info = data['accounts'].setdefault(str(account), {
+            'min_date': None, 'max_date': None, 'rows': 0, 'gaps': [], 'keys_checksum': f"{0:016x}"})
+        known = _gap_days(info.get('empty_days', []))
+        info['empty_days'] = _dates_to_ranges(known | set(days))
+        self._save(data)
+
+    def rebuild(self, df, checksum):
+        """Manifiesto completo a partir del dataset entero (primera vez o si quedó desactualizado)."""
+        previous = (self.load() or {'accounts': {}})['accounts']
+        accounts = {}
+        dates = pd.to_datetime(df[self.date_col], errors='coerce')
+        sums = self._key_sums(df) if len(df) else {}
+        for acc, idx in df.groupby(df[self.account_col].astype(str)).indices.items():
+            days = sorted(set(dates.iloc[idx].dropna().dt.date))
+            accounts[acc] = {
+                'min_date': days[0].isoformat() if days else None,
+                'max_date': days[-1].isoformat() if days else None,
+                'rows': int(len(idx)),
+                'gaps': _dates_to_gaps(days),
+                'keys_checksum': f"{sums.get(acc, 0):016x}",
+            }
+            empty = _gap_days(previous.get(acc, {}).get('empty_days', [])) - set(days)
+            if empty:
+                accounts[acc]['empty_days'] = _dates_to_ranges(empty)
+        self._save({
+            'schema_version': SCHEMA_VERSION,
+            'columns': [str(c) for c in df.columns],
+            'files_checksum': checksum,
+            'accounts': accounts,
+        })
+
+    def apply(self, df_inserted, checksum, columns=None):
+        """
+        Actualiza el manifiesto con las filas recién insertadas (no las que
+        solo pisaron una clave existente) sin leer el histórico.
+        """
+        data = self.load()
+        if data is None:
+            raise ValueError(f"No hay manifiesto válido en {self.path} para actualizar")
+        sums = self._key_sums(df_inserted) if len(df_inserted) else {}
+        dates = pd.to_datetime(df_inserted[self.date_col], errors='coerce')
+        for acc, idx in df_inserted.groupby(df_inserted[self.account_col].astype(str)).indices.items():
+            info = data['accounts'].setdefault(acc, {
+                'min_date': None, 'max_date': None, 'rows': 0, 'gaps': [], 'keys_checksum': f"{0:016x}"})
+            covered = set(dates.iloc[idx].dropna().dt.date)
+            if info['min_date']:
+                old = pd.date_range(info['min_date'], info['max_date']).date
+                covered |= set(old) - _gap_days(info['gaps'])
+            if not covered:
+                continue
+            covered = sorted(covered)
+            first, last = covered[0], covered[-1]
+            if info.get('empty_days'):
+                # Días que antes vinieron vacíos y ahora tienen filas (atribución tardía)
+                info['empty_days'] = _dates_to_ranges(_gap_days(info['empty_days']) - set(covered))
+            info.update({
+                'min_date': first.isoformat(),
+                'max_date': last.isoformat(),
+                'rows': info['rows'] + int(len(idx)),
+                'gaps': _dates_to_gaps(covered),
+                'keys_checksum': f"{(int(info['keys_checksum'], 16) + sums.get(acc, 0)) % 2**64:016x}",
+            })
+        data['files_checksum'] = checksum
+        if columns is not None:
+            data['columns'] = [str(c) for c in columns]
+        self._save(data)
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Ejecución de la corrida como un grafo de etapas.
+
+Cada etapa declara sus entradas y salidas y de qué etapas depende. Las etapas
+sin dependencias pendientes corren en paralelo (hilos: comparten el limitador
+de la API y el contexto de datos). Antes de correr una etapa se calcula la
+huella de sus entradas:
+- ruta (archivo o carpeta): tamaño y mtime de cada archivo, sin leerlos;
+- función: se llama y se usa su valor (p. ej. la fecha del día);
+- cualquier otro valor: su repr.
+Si la huella es igual a la de la última corrida exitosa y las salidas existen,
+la etapa se salta. Las huellas se guardan en un JSON (state_path).
+Con metrics (RunMetrics) cada etapa queda además como un evento 'stage' y con
+profiler (StageProfiler) cada etapa corre perfilada.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import traceback
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+OK = 'ok'
+SKIPPED = 'sin cambios'
+FAILED = 'error'
+BLOCKED = 'bloqueada'
+NOT_SELECTED = 'no seleccionada'
+
+
+class Stage:
+    """
+    name: nombre de la etapa (para --only / --from)
+    fn: función sin argumentos que ejecuta la etapa (si devuelve algo con len,
+        se registra como filas)
+    inputs: rutas, funciones o valores que determinan el resultado
+    outputs: rutas que la etapa escribe (si falta alguna, no se salta)
+    deps: etapas que tienen que terminar antes
+    """
+
+    def __init__(self, name, fn, inputs=(), outputs=(), deps=()):
+        self.name = name
+        self.fn = fn
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.deps = list(deps)
+
+
+def _path_signature(path):
+    """(ruta, tamaño, mtime) de un archivo o de todos los archivos de una carpeta."""
+    if os.path.isfile(path):
+        st = os.stat(path)
+        return [(os.path.basename(path), st.st_size, st.st_mtime_ns)]
+    if not os.path.isdir(path):
+        return None
+    sig = []
+    for d, dirs, names in os.walk(path):
+        dirs.sort()
+        for n in sorted(names):
+            if n.endswith('.tmp'):
+                continue
+            st = os.stat(os.path.join(d, n))
+            sig.append((os.path.relpath(os.path.join(d, n), path), st.st_size, st.st_mtime_ns))
+    return sig
+
+
+def fingerprint(inputs) -> str:
+    """Huella sha1 de las entradas de una etapa."""
+    h = hashlib.sha1()
+    for item in inputs:
+        if callable(item):
+            item = item()
+        if isinstance(item, str) and os.path.isabs(item):
+            item = (item, _path_signature(item))
+        h.update(repr(item).encode('utf-8'))
+    return h.hexdigest()
+
+
+class Pipeline:
+    """Grafo de etapas con salto por huella y ejecución en paralelo."""
+
+    def __init__(self, state_path, max_workers=2, metrics=None, profiler=None):
+        self.state_path = state_path
+        self.max_workers = max_workers
+        self.metrics = metrics
+        self.profiler = profiler
+        self.stages = {}
+        self.results = {}  # nombre -> (estado, segundos)
+        self._lock = threading.Lock()
+
+    def add(self, name, fn, inputs=(), outputs=(), deps=()):
+        for d in deps:
+            if d not in self.stages:
+                raise ValueError(f"La etapa '{name}' depende de '{d}', que no está declarada")
+        self.stages[name] = Stage(name, fn, inputs, outputs, deps)
+        return self.stages[name]
+
+    # ---------------- estado ----------------
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.state_path)
+
+    # ---------------- selección ----------------
+    def downstream(self, name):
+        """name y todas las etapas que dependen de ella (directa o indirectamente)."""
+        out = {name}
+        for stage in self.stages.values():  # declaradas en orden topológico
+            if out.intersection(stage.deps):
+                out.add(stage.name)
+        return out
+
+    def select(self, only=None, start=None):
+        """Etapas a correr según --only (lista) y --from (etapa y sus dependientes)."""
+        names = set(self.stages)
+        for n in list(only or []) + ([start] if start else []):
+            if n not in self.stages:
+                raise ValueError(f"Etapa desconocida '{n}' (etapas: {', '.join(self.stages)})")
+        if only:
+            names &= set(only)
+        if start:
+            names &= self.downstream(start)
+        return names
+
+    # ---------------- ejecución ----------------
+    def _run_stage(self, stage, state, force):
+        t0 = time.perf_counter()
+        status, rows = self._execute(stage, state, force)
+        seconds = time.perf_counter() - t0
+        if self.metrics is not None:
+            from run_metrics import peak_rss_mb
+            rss = peak_rss_mb()
+            self.metrics.record('stage', stage=stage.name, status=status, seconds=round(seconds, 3),
+                                rows=rows, peak_rss_mb=None if rss is None else round(rss, 1))
+        return status, seconds
+
+    def _execute(self, stage, state, force):
+        """Corre (o salta) una etapa. Devuelve (estado, filas)."""
+        fp = fingerprint(stage.inputs)
+        previous = state.get(stage.name, {})
+        outputs_ok = all(os.path.exists(p) for p in stage.outputs)
+        if not force and previous.get('fingerprint') == fp and outputs_ok:
+            print(f"⏭️ Etapa {stage.name}: entradas sin cambios, se salta")
+            return SKIPPED, None
+        print(f"\n▶️ Etapa {stage.name}")
+        try:
+            with self.profiler.stage(stage.name) if self.profiler is not None else nullcontext():
+                result = stage.fn()
+        except Exception as e:
+            print(f"❌ Etapa {stage.name} falló: {e}")
+            traceback.print_exc()
+            return FAILED, None
+        with self._lock:
+            state[stage.name] = {'fingerprint': fp, 'finished_at': time.strftime('%Y-%m-%d %H:%M:%S')}
+            self._save_state(state)
+        return OK, len(result) if hasattr(result, '__len__') else None
+
+    def run(self, only=None, start=None, force=False) -> dict:
+        """
+        Corre las etapas seleccionadas respetando dependencias. Una etapa que
+        falla bloquea a sus dependientes; el resto sigue. Devuelve los resultados.
+        """
+        selected = self.select(only, start)
+        state = self._load_state()
+        self.results = {n: (NOT_SELECTED, 0.0) for n in self.stages if n not in selected}
+        pending = [n for n in self.stages if n in selected]
+        running = {}
+
+        def ready(name):
+            # Dependencias fuera de la selección cuentan como ya resueltas
+            return all(self.results.get(d, (None,))[0] in (OK, SKIPPED, NOT_SELECTED)
+                       for d in self.stages[name].deps)
+
+        def blocked(name):
+            return any(self.results.get(d, (None,))[0] in (FAILED, BLOCKED) for d in self.stages[name].deps)
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers), thread_name_prefix="stage") as pool:
+            while pending or running:
+                for name in list(pending):
+                    if blocked(name):
+                        self.results[name] = (BLOCKED, 0.0)
+                        if self.metrics is not None:
+                            self.metrics.record('stage', stage=name, status=BLOCKED, seconds=0.0, rows=None)
+                        pending.remove(name)
+                    elif ready(name):
+                        running[pool.submit(self._run_stage, self.stages[name], state, force)] = name
+                        pending.remove(name)
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    self.results[running.pop(fut)] = fut.result()
+        return self.results
+
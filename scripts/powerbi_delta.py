@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+Export particionado para la actualización incremental de Power BI.
+
+Cada tabla se escribe en una carpeta con un archivo por cuenta y mes:
+
+    <root>/month=YYYY-MM/<cuenta>.csv   (o .parquet)
+
+Cada fila lleva la columna _loaded_at: el momento de la corrida que escribió
+ese (cuenta, día) por última vez. En modo incremental solo se reescriben los
+archivos de los meses que contienen algún (cuenta, día) cambiado en la corrida;
+las filas de días que no cambiaron conservan su _loaded_at. En Power BI la
+carpeta se carga con el conector de carpeta, se filtra date_start entre
+RangeStart y RangeEnd y _loaded_at sirve para "detectar cambios en los datos".
+
+El modo full (primera carga, o cuando se pide) reescribe la carpeta completa.
+Cada escritura agrega una línea a <root>/_changes.jsonl con la marca de agua y
+los rangos de días cambiados por cuenta.
+
+La etapa que actualiza los datos anota los (cuenta, día) cambiados en
+<root>/_pending.json (add_pending) y export los suma a los suyos; el archivo se
+borra recién después de un export exitoso. Así, si el export falla o no corre
+(--only, --from, etapa salteada), esos días se exportan en la corrida siguiente.
+"""
+
+import json
+import os
+import re
+import shutil
+from datetime import date, datetime
+
+import pandas as pd
+
+from insights_planner import contiguous_ranges
+from storage import _replace_dir
+
+
+WATERMARK_COL = '_loaded_at'
+CHANGELOG_FILE = '_changes.jsonl'
+PENDING_FILE = '_pending.json'
+FORMATS = {'csv': '.csv', 'parquet': '.parquet'}
+
+
+def _slug(text):
+    return re.sub(r'[^\w\-]+', '_', str(text)).strip('_') or 'sin_cuenta'
+
+
+def changed_partitions(df, account_col, date_col, rename=None):
+    """{(cuenta, date)} presentes en df (filas nuevas o actualizadas de la corrida)."""
+    if df is None or len(df) == 0:
+        return set()
+    accounts = df[account_col].astype(str)
+    if rename:
+        accounts = accounts.replace(rename)
+    dates = pd.to_datetime(df[date_col], errors='coerce')
+    valid = dates.notna()
+    return set(zip(accounts[valid], dates[valid].dt.date))
+
+
+class PartitionedExport:
+    """Carpeta de una tabla para Power BI, particionada por mes y cuenta."""
+
+    def __init__(self, root, account_col, date_col, fmt='csv'):
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato '{fmt}' no soportado (usar uno de {list(FORMATS)})")
+        self.root = root
+        self.account_col = account_col
+        self.date_col = date_col
+        self.fmt = fmt
+        self.pending_path = os.path.join(root, PENDING_FILE)
+
+    def exists(self):
+        return os.path.isdir(self.root) and any(n.startswith('month=') for n in os.listdir(self.root))
+
+    def path(self, account, month, root=None):
+        return os.path.join(root or self.root, f"month={month}", _slug(account) + FORMATS[self.fmt])
+
+    # ---------------- archivos ----------------
+    def _write(self, df, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        if self.fmt == 'parquet':
+            df.to_parquet(tmp, index=False)
+        else:
+            df.to_csv(tmp, index=False, encoding='utf-8-sig', date_format='%Y-%m-%d %H:%M:%S')
+        os.replace(tmp, path)
+
+    def _read_watermarks(self, path):
+        """{date: _loaded_at} del archivo existente (vacío si no existe)."""
+        if not os.path.exists(path):
+            return {}
+        cols = [self.date_col, WATERMARK_COL]
+        if self.fmt == 'parquet':
+            old = pd.read_parquet(path, columns=cols)
+        else:
+            old = pd.read_csv(path, usecols=cols, encoding='utf-8-sig')
+        old[self.date_col] = pd.to_datetime(old[self.date_col]).dt.date
+        return dict(zip(old[self.date_col], pd.to_datetime(old[WATERMARK_COL])))
+
+    # ---------------- cambios pendientes ----------------
+    def pending(self) -> set:
+        """{(cuenta, date)} anotados y todavía no exportados."""
+        path = self.pending_path
+        if not os.path.exists(path):
+            return set()
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return {(account, date.fromisoformat(d)) for account, days in data.items() for d in days}
+
+    def add_pending(self, changed):
+        """Anota (cuenta, día) cambiados hasta el próximo export exitoso."""
+        changed = {(str(a), d) for a, d in changed} | self.pending()
+        if not changed:
+            return
+        by_account = {}
+        for account, day in sorted(changed):
+            by_account.setdefault(account, []).append(day.isoformat())
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self.pending_path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(by_account, f, ensure_ascii=False)
+        os.replace(tmp, self.pending_path)
+
+    def clear_pending(self):
+        if os.path.exists(self.pending_path):
+            os.remove(self.pending_path)
+
+    def _log(self, entry):
+        with open(os.path.join(self.root, CHANGELOG_FILE), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    # ---------------- escritura ----------------
+    def write_full(self, df, watermark=None) -> dict:
+        """Snapshot completo: reescribe todos los archivos (primera carga)."""
+        watermark = pd.Timestamp(watermark or datetime.now()).floor('s')
+        out = df.copy()
+        out[WATERMARK_COL] = watermark
+        dates = pd.to_datetime(out[self.date_col])
+        months = dates.dt.strftime('%Y-%m')
+
+        tmp_root = self.root + ".tmp"
+        if os.path.isdir(tmp_root):
+            shutil.rmtree(tmp_root)
+        os.makedirs(tmp_root)
+        files = 0
+        for (account, month), part in out.groupby([out[self.account_col].astype(str), months], sort=True):
+            self._write(part, self.path(account, month, root=tmp_root))
+            files += 1
+        old_log = os.path.join(self.root, CHANGELOG_FILE)
+        if os.path.exists(old_log):
+            shutil.copy2(old_log, os.path.join(tmp_root, CHANGELOG_FILE))
+        _replace_dir(tmp_root, self.root)
+
+        self._log({'watermark': str(watermark), 'mode': 'full', 'rows': int(len(out)), 'files': files})
+        return {'mode': 'full', 'files': files, 'rows': len(out)}
+
+    def write_changes(self, df, changed, watermark=None) -> dict:
+        """
+        Reescribe solo los archivos (cuenta, mes) que contienen algún (cuenta, día)
+        de changed. df: tabla completa (o al menos esos meses).
+        """
+        watermark = pd.Timestamp(watermark or datetime.now()).floor('s')
+        if not changed:
+            return {'mode': 'incremental', 'files': 0, 'rows': 0}
+        by_account = {}
+        for account, day in changed:
+            by_account.setdefault(str(account), set()).add(day)
+
+        accounts = df[self.account_col].astype(str)
+        dates = pd.to_datetime(df[self.date_col])
+        months = dates.dt.strftime('%Y-%m')
+        days = dates.dt.date
+        files = rows = 0
+        for account, changed_days in sorted(by_account.items()):
+            for month in sorted({d.strftime('%Y-%m') for d in changed_days}):
+                mask = (accounts == account) & (months == month)
+                part = df[mask].copy()
+                path = self.path(account, month)
+                previous = self._read_watermarks(path)
+                part_days = days[mask]
+                part[WATERMARK_COL] = [
+                    watermark if d in changed_days or d not in previous else previous[d]
+                    for d in part_days
+                ]
+                part[WATERMARK_COL] = pd.to_datetime(part[WATERMARK_COL])
+                self._write(part, path)
+                files += 1
+                rows += len(part)
+
+        self._log({
+            'watermark': str(watermark),
+            'mode': 'incremental',
+            'changed': {a: [[str(s), str(u)] for s, u in contiguous_ranges(d)]
+                        for a, d in sorted(by_account.items())},
+            'files': files,
+        })
+        return {'mode': 'incremental', 'files': files, 'rows': rows}
+
+    def export(self, df, changed=(), mode='incremental', watermark=None) -> dict:
+        """
+        write_full si mode='full' o si la carpeta todavía no existe; si no,
+        write_changes con changed más los pendientes. Después borra los pendientes.
+        """
+        if mode == 'full' or not self.exists():
+            res = self.write_full(df, watermark)
+        else:
+            res = self.write_changes(df, set(changed) | self.pending(), watermark)
+        self.clear_pending()
+        return res
+
+
+def read_export(root, fmt='parquet', text_cols=(), drop_watermark=True) -> pd.DataFrame:
+    """Une los archivos de una carpeta exportada (None si no existe o está vacía)."""
+    if not os.path.isdir(root):
+        return None
+    ext = FORMATS[fmt]
+    files = sorted(
+        os.path.join(d, f) for d, _, names in os.walk(root) for f in names
+        if f.endswith(ext) and os.path.basename(d).startswith('month=')
+    )
+    if not files:
+        return None
+    if fmt == 'parquet':
+        parts = [pd.read_parquet(f) for f in files]
+    else:
+        dtype = {c: str for c in text_cols}
+        parts = [pd.read_csv(f, encoding='utf-8-sig', dtype=dtype) for f in files]
+    df = pd.concat(parts, ignore_index=True)
+    if drop_watermark:
+        df = df.drop(columns=[WATERMARK_COL], errors='ignore')
+    return df
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Punto de entrada liviano para Power BI Desktop.
+
+Solo carga los datasets ya generados por a01.py en primera_tabla y
+segunda_tabla: no valida credenciales, no inicializa la API, no extrae, no
+genera PNGs ni Excel. facebook_business, matplotlib y xlsxwriter no se
+importan. Orden de lectura de cada tabla:
+1. carpeta particionada de datasets/data/powerbi/<tabla>/ (siempre al día);
+2. snapshot powerbi_ready.parquet / .csv (primera_tabla) o el CSV de anuncios
+   (segunda_tabla).
+
+En Power BI: Obtener datos > Script de Python y pegar este archivo (igual que
+se hacía con a01.py). Los imports de a01.py quedan para las corridas de
+extracción.
+"""
+
+import os
+import sys
+import time
+
+_t0 = time.perf_counter()
+
+POWER_BI_MODE = 'powerbi' in sys.executable.lower() if sys.executable else False
+
+# Mismas rutas que a01.py; META_BASE_DIR permite apuntar a otra carpeta (benchmark)
+if os.environ.get('META_BASE_DIR'):
+    BASE_DIR = os.environ['META_BASE_DIR']
+elif POWER_BI_MODE:
+    BASE_DIR = r"C:\Users\Lima - Rodrigo\Documents\3pro\meta\reporte_semanal"
+else:
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SCRIPTS_DIR = os.path.join(BASE_DIR, "scripts") if POWER_BI_MODE else os.path.dirname(os.path.abspath(__file__))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+import pandas as pd
+
+from powerbi_delta import read_export
+from powerbi_frame import compact_powerbi_frame
+
+DATA_DIR = os.path.join(BASE_DIR, "datasets", "data")
+POWERBI_EXPORT_DIR = os.path.join(DATA_DIR, "powerbi")
+POWERBI_READY = os.path.join(DATA_DIR, "powerbi_ready")
+ADS_CSV = os.path.join(DATA_DIR, "campaign_video_3s_100pct_1d_ads.csv")
+
+PRIMERA_SORT = ['account', 'date_start', 'campaign_id']
+SEGUNDA_SORT = ['account', 'date_start', 'campaign_id', 'ad_id']
+
+
+def _leer_carpeta(nombre, text_cols):
+    """Carpeta particionada en Parquet o CSV (None si no hay)."""
+    root = os.path.join(POWERBI_EXPORT_DIR, nombre)
+    for fmt in ('parquet', 'csv'):
+        try:
+            df = read_export(root, fmt=fmt, text_cols=text_cols)
+        except ImportError:
+            continue  # sin pyarrow
+        if df is not None:
+            return df, f"{root} ({fmt})"
+    return None, None
+
+
+def cargar_primera_tabla():
+    df, origen = _leer_carpeta("primera_tabla", ['account', 'campaign_id', 'campaign_name'])
+    if df is None and os.path.exists(POWERBI_READY + ".parquet"):
+        try:
+            df, origen = pd.read_parquet(POWERBI_READY + ".parquet"), POWERBI_READY + ".parquet"
+        except ImportError:
+            pass
+    if df is None and os.path.exists(POWERBI_READY + ".csv"):
+        df = pd.read_csv(POWERBI_READY + ".csv", encoding='utf-8-sig',
+                         dtype={'account': str, 'campaign_id': str, 'campaign_name': str})
+        origen = POWERBI_READY + ".csv"
+    if df is None:
+        raise FileNotFoundError(f"No hay datos para primera_tabla en {DATA_DIR}. Ejecutar a01.py primero.")
+    df = compact_powerbi_frame(df)
+    df = df.sort_values(PRIMERA_SORT, kind='stable').reset_index(drop=True)
+    return df, origen
+
+
+def cargar_segunda_tabla():
+    text_cols = ['account', 'ad_id', 'campaign_id']
+    df, origen = _leer_carpeta("segunda_tabla", text_cols)
+    if df is None and os.path.exists(ADS_CSV):
+        df, origen = pd.read_csv(ADS_CSV, encoding='utf-8-sig', dtype={c: str for c in text_cols}), ADS_CSV
+    if df is None:
+        return pd.DataFrame(), None
+    for c in text_cols:
+        if c in df.columns:
+            df[c] = df[c].astype('string')
+    df['date_start'] = pd.to_datetime(df['date_start'], errors='coerce').dt.date
+    df = df.sort_values(SEGUNDA_SORT, kind='stable').reset_index(drop=True)
+    return df, origen
+
+
+primera_tabla, _origen_primera = cargar_primera_tabla()
+segunda_tabla, _origen_segunda = cargar_segunda_tabla()
+
+STARTUP_SECONDS = time.perf_counter() - _t0
+print(f"primera_tabla: {primera_tabla.shape} desde {_origen_primera}")
+print(f"segunda_tabla: {segunda_tabla.shape} desde {_origen_segunda}")
+print(f"Carga en {STARTUP_SECONDS:.2f}s")
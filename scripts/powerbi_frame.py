@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Tipos compactos para primera_tabla.
+
+Cuentas, campañas e IDs como categóricos (en Parquet quedan con dictionary
+encoding), fechas como datetime64 en vez de objetos date de Python y conteos
+enteros con el tipo más chico que alcance. spend y los CTR quedan en float64:
+son montos y ratios, y así el CSV exportado sale igual que antes.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+CATEGORY_COLS = ['account', 'campaign_id', 'campaign_name']
+DATE_COLS = ['date_start', 'date_stop']
+COUNT_COLS = ['impressions', 'reach', 'video_25pct', 'clicks_all', 'link_clicks',
+              'first_replies', 'two_way_conversations']
+
+# pandas no tiene datetime64[D]; segundos es la resolución más chica
+DATE_DTYPE = 'datetime64[s]'
+
+
+def _downcast_counts(s):
+    """Entero más chico posible si la columna no tiene NaN ni decimales."""
+    values = s.to_numpy()
+    if s.isna().any() or not np.all(np.mod(values, 1) == 0):
+        return s
+    return pd.to_numeric(s.astype(np.int64), downcast='integer')
+
+
+def compact_powerbi_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Copia de primera_tabla con tipos compactos (mismas columnas y valores)."""
+    out = df.copy()
+    for c in CATEGORY_COLS:
+        if c in out.columns:
+            out[c] = out[c].astype('category')
+    for c in DATE_COLS:
+        if c in out.columns:
+            out[c] = pd.to_datetime(out[c], errors='coerce').dt.normalize().astype(DATE_DTYPE)
+    for c in COUNT_COLS:
+        if c in out.columns:
+            out[c] = _downcast_counts(pd.to_numeric(out[c], errors='coerce'))
+    return out
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame, title="Memoria primera_tabla"):
+    """Imprime memory_usage(deep=True) por columna antes / después."""
+    mb = 1024 * 1024
+    b = before.memory_usage(deep=True, index=False)
+    a = after.memory_usage(deep=True, index=False)
+    print(f"\n=== {title} ===")
+    print(f"{'columna':<24}{'antes MB':>10}{'después MB':>12}  tipo")
+    for col in after.columns:
+        print(f"{col:<24}{b.get(col, 0) / mb:>10.2f}{a[col] / mb:>12.2f}  {after[col].dtype}")
+    print(f"{'TOTAL':<24}{b.sum() / mb:>10.2f}{a.sum() / mb:>12.2f}"
+          f"  ({(1 - a.sum() / b.sum()) * 100 if b.sum() else 0:.0f}% menos)")
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Limitador de tasa compartido para las llamadas a la API de Meta.
+
+Token bucket thread-safe que reemplaza las pausas fijas (time.sleep) entre
+consultas. Además lee los headers de uso de Meta (x-business-use-case-usage,
+x-ad-account-usage) y frena o pausa las llamadas cuando el uso se acerca al
+límite. El reloj y la función de espera son inyectables para poder probarlo
+con un reloj falso.
+"""
+
+import json
+import threading
+import time
+
+
+def _load_header(raw):
+    if isinstance(raw, (dict, list)):
+        return raw
+    try:
+        return json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_usage_headers(headers):
+    """
+    Devuelve (pct_uso_max, segundos_para_recuperar_acceso) a partir de los
+    headers de uso de Meta. Sin headers (o ilegibles) devuelve (0.0, 0.0).
+    """
+    pct = 0.0
+    regain_s = 0.0
+    if not headers:
+        return pct, regain_s
+    lower = {str(k).lower(): v for k, v in dict(headers).items()}
+
+    # {"<business_id>": [{"type": "ads_insights", "call_count": 28, "total_cputime": 25,
+    #                     "total_time": 25, "estimated_time_to_regain_access": 0}]}
+    buc = _load_header(lower.get("x-business-use-case-usage"))
+    if isinstance(buc, dict):
+        for entries in buc.values():
+            for e in entries or []:
+                if not isinstance(e, dict):
+                    continue
+                for k in ("call_count", "total_cputime", "total_time"):
+                    pct = max(pct, float(e.get(k) or 0))
+                # Viene en minutos
+                regain_s = max(regain_s, float(e.get("estimated_time_to_regain_access") or 0) * 60)
+
+    # {"acc_id_util_pct": 9.67, "reset_time_duration": 0, "ads_api_access_tier": "..."}
+    acc = _load_header(lower.get("x-ad-account-usage"))
+    if isinstance(acc, dict):
+        pct = max(pct, float(acc.get("acc_id_util_pct") or 0))
+        regain_s = max(regain_s, float(acc.get("reset_time_duration") or 0))
+
+    return pct, regain_s
+
+
+class TokenBucket:
+    """
+    Token bucket compartido entre hilos.
+    rate: tokens por segundo (llamadas por segundo en régimen)
+    capacity: ráfaga máxima permitida
+    slow_pct: a partir de este % de uso reportado por Meta se reduce la tasa
+    pause_pct: a partir de este % se pausan todas las llamadas pause_s segundos
+    """
+
+    def __init__(self, rate=1.0, capacity=4, slow_pct=50.0, pause_pct=90.0, pause_s=60.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.slow_pct = slow_pct
+        self.pause_pct = pause_pct
+        self.pause_s = pause_s
+        self.clock = clock
+        self.sleep = sleep
+        self.current_rate = self.rate
+        self.last_usage_pct = 0.0
+        self.total_wait = 0.0
+        self._tokens = self.capacity
+        self._last = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = max(0.0, now - self._last)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.current_rate)
+        self._last = now
+
+    def acquire(self, tokens=1.0) -> float:
+        """Bloquea hasta tener tokens disponibles. Devuelve los segundos esperados."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= tokens:
+                    self._tokens -= tokens
+                    self.total_wait += waited
+                    return waited
+                else:
+                    wait = (tokens - self._tokens) / self.current_rate
+            self.sleep(wait)
+            waited += wait
+
+    def observe_usage(self, pct, regain_s=0.0):
+        """Ajusta la tasa según el % de uso y el tiempo de recuperación que informa Meta."""
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            self.last_usage_pct = pct
+            if regain_s > 0:
+                self._paused_until = max(self._paused_until, now + regain_s)
+            elif pct >= self.pause_pct:
+                self._paused_until = max(self._paused_until, now + self.pause_s)
+
+            if pct > self.slow_pct:
+                # Baja lineal de la tasa entre slow_pct y 100%
+                factor = max(0.1, (100.0 - pct) / (100.0 - self.slow_pct))
+                self.current_rate = self.rate * factor
+            else:
+                self.current_rate = self.rate
+
+    def observe_headers(self, headers):
+        pct, regain_s = parse_usage_headers(headers)
+        self.observe_usage(pct, regain_s)
+        return pct
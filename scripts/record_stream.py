@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Parseo en streaming de filas de insights hacia DataFrames por chunk.
+
+En lugar de acumular una lista de dicts por fila (records / ad_level_records)
+y construir el DataFrame al final, RowChunker junta chunk_size filas crudas y
+entrega cada chunk a una función por columnas (flatten_actions) que lo
+convierte en un DataFrame pequeño con los tipos del esquema; así el costo de
+parseo queda acotado por el tamaño del chunk y no por el rango de fechas.
+
+chunk_rows hace lo mismo con el cursor de una sola ventana dentro del hilo que
+lo lee (InsightsPlanner.fetch_range(consume=...)): la ventana llega al hilo
+principal como chunks ya aplanados y se suma con add_chunks.
+
+Los parsers fila por fila anteriores quedan en benchmarks/row_parsers.py.
+"""
+
+import pandas as pd
+
+
+# Esquemas (columna, tipo) de las columnas que arman los flatten.
+# Tipos: 'f8' -> float64, 'i8' -> int64, 'str' -> object (texto o None)
+CAMPAIGN_SCHEMA = [
+    ('account_id', 'str'),
+    ('date', 'str'),
+    ('campaign_id', 'str'),
+    ('campaign_name', 'str'),
+    ('spend', 'f8'),
+    ('impressions', 'i8'),
+    ('reach', 'i8'),
+    ('video_25pct', 'i8'),
+    ('clicks_all', 'i8'),
+    ('link_clicks', 'i8'),
+    ('ctr', 'f8'),
+    ('unique_link_clicks_ctr', 'f8'),
+    ('messaging_started', 'i8'),
+    ('two_way_conversations', 'i8'),
+]
+
+AD_SCHEMA = [
+    ("account", 'str'),
+    ("ad_id", 'str'),
+    ("campaign_id", 'str'),
+    ("date_start", 'str'),
+    ("impressions", 'i8'),
+    ("video_plays", 'i8'),
+    ("video_3s_views", 'i8'),
+    ("video_100pct_views", 'i8'),
+    ("retention_3s_pct", 'f8'),
+    ("retention_complete_pct", 'f8'),
+    ("thruplay", 'i8'),
+    ("curve_3s_pct_api", 'f8'),
+]
+
+_TYPECODES = {'f8': 'd', 'i8': 'q'}
+
+
+class RowChunker:
+    """
+    Agrupa filas crudas en chunks de chunk_size y convierte cada chunk con una
+    función flatten(labels, rows) -> DataFrame (ver flatten_actions).
+    """
+
+    def __init__(self, flatten, schema, chunk_size=50_000):
+        self.flatten = flatten
+        self.schema = list(schema)
+        self.chunk_size = chunk_size
+        self.chunks = []
+        self.rows = 0
+        self._labels = []
+        self._pending = []
+
+    def __len__(self):
+        return self.rows
+
+    def extend(self, rows, label):
+        """Agrega filas de un cursor/iterable sin materializarlo."""
+        for r in rows:
+            self._labels.append(label)
+            self._pending.append(r)
+            self.rows += 1
+            if len(self._pending) >= self.chunk_size:
+                self.flush()
+
+    def add_chunks(self, chunks):
+        """Agrega chunks ya aplanados (p. ej. de chunk_rows) después de lo pendiente."""
+        self.flush()
+        for chunk in chunks:
+            self.chunks.append(chunk)
+            self.rows += len(chunk)
+
+    def truncate(self, n):
+        """Descarta las filas desde la posición n (p. ej. una ventana leída a medias)."""
+        if n >= self.rows:
+            return
+        flushed = self.rows - len(self._pending)
+        if n >= flushed:
+            del self._labels[n - flushed:]
+            del self._pending[n - flushed:]
+        else:
+            self._labels = []
+            self._pending = []
+            kept = []
+            total = 0
+            for chunk in self.chunks:
+                if total >= n:
+                    break
+                kept.append(chunk if total + len(chunk) <= n else chunk.iloc[:n - total])
+                total += len(kept[-1])
+            self.chunks = kept
+        self.rows = n
+
+    def flush(self):
+        if not self._pending:
+            return
+        self.chunks.append(self.flatten(self._labels, self._pending))
+        self._labels = []
+        self._pending = []
+
+    def to_frame(self) -> pd.DataFrame:
+        self.flush()
+        if not self.chunks:
+            return pd.DataFrame({
+                name: pd.Series(dtype=t if t in _TYPECODES else object) for name, t in self.schema
+            })
+        df = pd.concat(self.chunks, ignore_index=True)
+        self.chunks = [df]
+        return df
+
+
+def chunk_rows(rows, label, flatten, schema, chunk_size=50_000) -> list:
+    """Lee rows (un cursor) y devuelve sus chunks aplanados, con a lo sumo chunk_size filas crudas a la vez."""
+    chunker = RowChunker(flatten, schema, chunk_size=chunk_size)
+    chunker.extend(rows, label)
+    chunker.flush()
+    return chunker.chunks
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Packs del reporte semanal por cuenta y por campaña.
+
+Las comparaciones de todas las cuentas (y de todas las campañas) salen de una
+sola pasada agrupada sobre los cubos semanales de rollups. Para la semana del
+reporte se arman las tablas de variaciones y de valores de cada cuenta y de
+las top-N campañas por gasto de cada cuenta, y se escriben en:
+
+    insight/<period>/<cuenta>/tabla_variaciones.png
+    insight/<period>/<cuenta>/campaigns/<campaña>_<campaign_id>/tabla_*.png
+
+Cada corte se identifica por un hash de sus filas semanales (semana actual y
+semanas de comparación). Si el hash no cambió desde el último render y los PNG
+siguen ahí, el corte se salta. Los hashes se guardan en
+insight/<period>/_render_state.json.
+"""
+
+import hashlib
+import json
+import os
+import re
+
+import pandas as pd
+
+from comparisons import tabla_valores, tabla_variaciones, weekly_comparisons, weekly_frame
+from table_render import render_tables
+
+
+STATE_FILE = "_render_state.json"
+PNG_FILES = ('tabla_variaciones.png', 'tabla_valores.png')
+
+
+def _slug(text, max_len=60):
+    return re.sub(r'[^\w\-]+', '_', str(text)).strip('_')[:max_len] or 'sin_nombre'
+
+
+def slice_hash(rows: pd.DataFrame) -> str:
+    """Hash del contenido de un corte (independiente del índice)."""
+    h = pd.util.hash_pandas_object(rows.reset_index(drop=True), index=False)
+    return hashlib.sha1(h.to_numpy().tobytes()).hexdigest()
+
+
+def _load_state(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(path, state):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _semana(comp, week_start):
+    return comp[comp['week_start'] == pd.Timestamp(week_start)]
+
+
+def top_campaigns(comp_week, top_n):
+    """(account_id, campaign_id) de las top_n campañas por gasto de cada cuenta."""
+    spend = comp_week[(comp_week['metric'] == 'spend') & (comp_week['value'] > 0)]
+    spend = spend.sort_values(['account_id', 'value'], ascending=[True, False], kind='stable')
+    return spend.groupby('account_id', sort=False).head(top_n)[['account_id', 'campaign_id']]
+
+
+def plan_packs(cube_account, cube_campaign, week_start, top_n=5):
+    """
+    Cortes de la semana: [(ruta relativa, filas del corte)].
+    Una pasada de comparaciones por nivel (todas las cuentas / campañas juntas).
+    """
+    comp_acc = _semana(weekly_comparisons(weekly_frame(cube_account, by=['account_id']),
+                                          by=['account_id']), week_start)
+    slices = [(_slug(acc), rows) for acc, rows in comp_acc.groupby('account_id', sort=True)]
+
+    if top_n and cube_campaign is not None and len(cube_campaign):
+        keys = ['account_id', 'campaign_id']
+        comp_camp = _semana(weekly_comparisons(weekly_frame(cube_campaign, by=keys), by=keys), week_start)
+        # Nombre más reciente de cada campaña (puede cambiar en el tiempo)
+        names = (cube_campaign.sort_values('week_start')
+                              .drop_duplicates(keys, keep='last')
+                              .set_index(keys)['campaign_name'])
+        top = top_campaigns(comp_camp, top_n)
+        comp_camp = comp_camp.merge(top, on=keys)
+        for (acc, camp), rows in comp_camp.groupby(keys, sort=True):
+            name = names.get((acc, camp), camp)
+            slices.append((os.path.join(_slug(acc), 'campaigns', f"{_slug(name)}_{camp}"), rows))
+    return slices
+
+
+def generar_packs(cube_account, cube_campaign, week_start, period, output_dir, metric_map,
+                  top_n=5, workers=None, force=False) -> dict:
+    """
+    Escribe los packs de la semana en output_dir/<period>/... y devuelve
+    {'slices', 'rendered', 'skipped'}.
+    force: renderiza aunque el hash no haya cambiado.
+    """
+    base = os.path.join(output_dir, _slug(period))
+    state_path = os.path.join(base, STATE_FILE)
+    state = _load_state(state_path)
+
+    jobs, hashes = [], {}
+    slices = plan_packs(cube_account, cube_campaign, week_start, top_n)
+    for rel, rows in slices:
+        digest = slice_hash(rows)
+        folder = os.path.join(base, rel)
+        paths = [os.path.join(folder, f) for f in PNG_FILES]
+        if not force and state.get(rel) == digest and all(os.path.exists(p) for p in paths):
+            continue
+        jobs += [(tabla_variaciones(rows, week_start), paths[0]),
+                 (tabla_valores(rows, week_start), paths[1])]
+        hashes[rel] = digest
+
+    if jobs:
+        render_tables(jobs, metric_map, workers=workers)
+        state.update(hashes)
+        _save_state(state_path, state)
+    return {'slices': len(slices), 'rendered': len(hashes), 'skipped': len(slices) - len(hashes)}
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Cache en disco de respuestas de get_insights.
+
+Clave: sha1 de (cuenta, fields, params), donde params incluye level, time_range
+y el resto de los parámetros. Cada respuesta es un JSON comprimido con gzip en
+<root>/<2 primeros>/<clave>.json.gz con las filas como dicts. writer() la
+escribe fila por fila mientras se lee el cursor, sin juntar la respuesta.
+
+Vencimiento según la antigüedad de los datos: si el último día del rango ya
+salió de la ventana de atribución (attribution_days) Meta no lo vuelve a
+revisar y la entrada no vence nunca; si no, vence a los recent_ttl segundos.
+El tamaño total se limita a max_bytes desalojando las entradas usadas hace
+más tiempo (LRU por mtime: cada acierto toca el archivo).
+
+En modo offline se sirven también las entradas vencidas y una entrada que
+falta levanta CacheMissError en vez de ir a la API.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+
+class CacheMissError(Exception):
+    """Modo offline: la respuesta pedida no está en el cache."""
+
+
+def _plain(row):
+    """Fila del SDK (AdsInsights) o dict -> dict serializable."""
+    if hasattr(row, 'export_all_data'):
+        return row.export_all_data()
+    return dict(row)
+
+
+class CacheWriter:
+    """Entrada del cache escrita fila por fila; queda visible recién con commit()."""
+
+    def __init__(self, cache, path, entry):
+        self.cache = cache
+        self.path = path
+        self.tmp = f"{path}.{threading.get_ident()}.tmp"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._f = gzip.open(self.tmp, 'wt', encoding='utf-8', compresslevel=5)
+        # Mismo JSON que json.dump(entry con 'rows'), abierto en la lista de filas
+        self._f.write(json.dumps(entry, default=str)[:-1] + ', "rows": [')
+        self._first = True
+
+    def write(self, row):
+        if not self._first:
+            self._f.write(', ')
+        self._first = False
+        json.dump(_plain(row), self._f, default=str)
+
+    def commit(self):
+        self._f.write(']}')
+        self._f.close()
+        os.replace(self.tmp, self.path)
+        self.cache._stored(self.path)
+
+    def abort(self):
+        self._f.close()
+        try:
+            os.remove(self.tmp)
+        except OSError:
+            pass
+
+
+class ResponseCache:
+    """
+    root: carpeta del cache
+    max_bytes: tamaño máximo en disco (comprimido)
+    attribution_days: días recientes que Meta todavía puede corregir
+    recent_ttl: segundos de vida de las entradas con días recientes
+    offline: servir solo desde el cache (sin vencimiento, miss = error)
+    """
+
+    def __init__(self, root, max_bytes=500 * 1024 * 1024, attribution_days=7, recent_ttl=6 * 3600,
+                 offline=False, today=date.today, clock=time.time):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.attribution_days = attribution_days
+        self.recent_ttl = recent_ttl
+        self.offline = offline
+        self.today = today
+        self.clock = clock
+        self.hits = self.misses = self.expired = self.stored = self.evicted = 0
+        self._lock = threading.Lock()
+        self._index = None  # path -> (bytes, mtime)
+
+    # ---------------- claves y archivos ----------------
+    @staticmethod
+    def key(account_id, fields, params) -> str:
+        payload = json.dumps([str(account_id), sorted(fields), params], sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key + ".json.gz")
+
+    def _load_index(self):
+        if self._index is None:
+            self._index = {}
+            if os.path.isdir(self.root):
+                for d, _, names in os.walk(self.root):
+                    for n in names:
+                        if n.endswith(".json.gz"):
+                            p = os.path.join(d, n)
+                            st = os.stat(p)
+                            self._index[p] = (st.st_size, st.st_mtime)
+        return self._index
+
+    def size_bytes(self):
+        with self._lock:
+            return sum(size for size, _ in self._load_index().values())
+
+    # ---------------- lectura / escritura ----------------
+    def _is_fresh(self, entry):
+        until = date.fromisoformat(entry['until']) if entry.get('until') else None
+        if until is not None and until < self.today() - timedelta(days=self.attribution_days):
+            return True
+        return self.clock() - entry['stored_at'] < self.recent_ttl
+
+    def get(self, account_id, fields, params):
+        """
+        Entrada {'rows': [...]} o {'too_large': True}; None si no está o venció.
+        Offline: CacheMissError si no está.
+        """
+        path = self.path(self.key(account_id, fields, params))
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            elif not self.offline and not self._is_fresh(entry):
+                self.expired += 1
+                entry = None
+            else:
+                self.hits += 1
+                now = self.clock()
+                try:
+                    os.utime(path, (now, now))
+                    self._load_index()[path] = (os.path.getsize(path), now)
+                except OSError:
+                    pass
+        if entry is None and self.offline:
+            tr = params.get('time_range', {})
+            raise CacheMissError(f"Sin respuesta en cache para {account_id} {tr.get('since')} - {tr.get('until')}")
+        return entry
+
+    def _entry(self, account_id, params):
+        return {
+            'account_id': str(account_id),
+            'until': params.get('time_range', {}).get('until'),
+            'stored_at': self.clock(),
+        }
+
+    def writer(self, account_id, fields, params):
+        """CacheWriter para guardar una respuesta mientras se lee (None en modo offline)."""
+        if self.offline:
+            return None
+        return CacheWriter(self, self.path(self.key(account_id, fields, params)), self._entry(account_id, params))
+
+    def put(self, account_id, fields, params, rows=None, too_large=False):
+        """Guarda las filas de una respuesta (o que el rango fue demasiado grande)."""
+        if self.offline:
+            return
+        if not too_large:
+            w = self.writer(account_id, fields, params)
+            for r in rows:
+                w.write(r)
+            w.commit()
+            return
+        entry = self._entry(account_id, params)
+        entry['too_large'] = True
+        path = self.path(self.key(account_id, fields, params))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, 'wt', encoding='utf-8', compresslevel=5) as f:
+            json.dump(entry, f, default=str)
+        os.replace(tmp, path)
+        self._stored(path)
+
+    def _stored(self, path):
+        with self._lock:
+            self._load_index()[path] = (os.path.getsize(path), self.clock())
+            self.stored += 1
+            self._evict()
+
+    def _evict(self):
+        """Borra las entradas menos usadas hasta quedar bajo max_bytes (con el lock tomado)."""
+        index = self._load_index()
+        total = sum(size for size, _ in index.values())
+        if total <= self.max_bytes:
+            return
+        for path, (size, _) in sorted(index.items(), key=lambda kv: kv[1][1]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            del index[path]
+            total -= size
+            self.evicted += 1
+
+    def report(self):
+        print(f"\n=== Cache de respuestas ({'offline' if self.offline else 'online'}) ===")
+        print(f"Aciertos: {self.hits}. Faltantes: {self.misses}. Vencidas: {self.expired}. "
+              f"Guardadas: {self.stored}. Desalojadas: {self.evicted}. "
+              f"Tamaño: {self.size_bytes() / 1e6:.1f} MB en {self.root}")
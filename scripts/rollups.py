@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Cubos de agregados semanales y mensuales de campaign_1d.
+
+Guarda sumas de las métricas aditivas (spend, impresiones, clicks, leads...)
+por cuenta y por campaña, a grano semana (W-MON, partida por mes cuando la
+semana cruza dos meses) y a grano mes. Los ratios (CTR, CPL,
+unique_link_clicks_ctr) no se guardan: se derivan al leer a partir de las
+sumas, así siguen siendo correctos al re-agrupar. reach no es aditivo y queda
+fuera.
+
+Después de cada upsert solo se recalculan los buckets (semanas y meses) que
+contienen días actualizados, leyendo del diario únicamente ese tramo.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+
+ADDITIVE_COLS = [
+    'spend', 'impressions', 'video_25pct', 'clicks_all', 'link_clicks',
+    'messaging_started', 'two_way_conversations',
+]
+
+LEVELS = {
+    'account': ['account_id'],
+    'campaign': ['account_id', 'campaign_id', 'campaign_name'],
+}
+
+GRAINS = {
+    'week': ['week_start', 'month_start'],
+    'month': ['month_start'],
+}
+
+EXTENSIONS = {'parquet': '.parquet', 'feather': '.feather', 'csv': '.csv'}
+
+
+def week_start(dates):
+    """Inicio de la semana W-MON (la semana termina el lunes) de cada fecha."""
+    return pd.to_datetime(dates).dt.to_period('W-MON').dt.start_time
+
+
+def month_start(dates):
+    return pd.to_datetime(dates).dt.to_period('M').dt.start_time
+
+
+def derive_ratios(df):
+    """Agrega ctr, unique_link_clicks_ctr y cpl calculados desde las sumas."""
+    df = df.copy()
+    impressions = df['impressions'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['ctr'] = np.where(impressions > 0, df['clicks_all'] / impressions, np.nan)
+        df['unique_link_clicks_ctr'] = np.where(impressions > 0, df['link_clicks'] / impressions, np.nan)
+        leads = df['messaging_started'].to_numpy(dtype=float)
+        df['cpl'] = np.where(leads > 0, df['spend'] / leads, np.nan)
+    return df
+
+
+def aggregate(daily, grain, level):
+    """Diario -> cubo (grano, nivel) con las sumas de ADDITIVE_COLS."""
+    keys = LEVELS[level] + GRAINS[grain]
+    cols = [c for c in ADDITIVE_COLS if c in daily.columns]
+    df = daily[[c for c in LEVELS[level] if c in daily.columns] + cols].copy()
+    for c in LEVELS[level]:
+        df[c] = daily[c].astype('string') if c in daily.columns else pd.Series(pd.NA, index=daily.index, dtype='string')
+    df['month_start'] = month_start(daily['date'])
+    if grain == 'week':
+        df['week_start'] = week_start(daily['date'])
+    return (
+        df.groupby(keys, sort=True, dropna=False)[cols].sum()
+          .reset_index()
+    )
+
+
+class RollupStore:
+    """
+    Un archivo por cubo: <root>/<grano>_<nivel>.<ext>
+    backend: 'parquet', 'feather' o 'csv'
+    """
+
+    def __init__(self, root, backend='parquet'):
+        if backend not in EXTENSIONS:
+            raise ValueError(f"Backend '{backend}' no soportado (usar uno de {list(EXTENSIONS)})")
+        self.root = root
+        self.backend = backend
+
+    def path(self, grain, level):
+        return os.path.join(self.root, f"{grain}_{level}{EXTENSIONS[self.backend]}")
+
+    def exists(self):
+        return all(os.path.exists(self.path(g, l)) for g in GRAINS for l in LEVELS)
+
+    # ---------------- lectura ----------------
+    def _load(self, grain, level):
+        path = self.path(grain, level)
+        if self.backend == 'parquet':
+            df = pd.read_parquet(path)
+        elif self.backend == 'feather':
+            df = pd.read_feather(path)
+        else:
+            df = pd.read_csv(path, encoding='utf-8-sig', dtype={c: str for c in LEVELS[level]},
+                             parse_dates=GRAINS[grain])
+        for c in LEVELS[level]:
+            df[c] = df[c].astype('string')
+        return df
+
+    def read(self, grain, level, start=None, end=None, ratios=True) -> pd.DataFrame:
+        """
+        Cubo con los ratios derivados. start / end filtran por el inicio del
+        bucket (week_start o month_start), inclusive.
+        """
+        df = self._load(grain, level)
+        bucket = df[GRAINS[grain][0]]
+        if start is not None:
+            df = df[bucket >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[bucket <= pd.Timestamp(end)]
+        df = df.reset_index(drop=True)
+        return derive_ratios(df) if ratios else df
+
+    # ---------------- escritura ----------------
+    def _save(self, df, grain, level):
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(grain, level)
+        tmp = path + ".tmp"
+        if self.backend == 'parquet':
+            df.to_parquet(tmp, index=False)
+        elif self.backend == 'feather':
+            df.reset_index(drop=True).to_feather(tmp)
+        else:
+            df.to_csv(tmp, index=False, encoding='utf-8-sig', date_format='%Y-%m-%d')
+        os.replace(tmp, path)
+
+    def rebuild(self, daily):
+        """Recalcula todos los cubos desde el diario completo."""
+        for grain in GRAINS:
+            for level in LEVELS:
+                self._save(aggregate(daily, grain, level), grain, level)
+
+    def update(self, load_daily, days) -> dict:
+        """
+        Recalcula solo los buckets que contienen alguno de los días actualizados.
+        load_daily(start, end): diario de ese tramo (inclusive)
+        days: fechas recién upserteadas
+        Devuelve {grano: buckets recalculados}.
+        """
+        days = pd.to_datetime(pd.Series(list(days))).dropna()
+        if days.empty:
+            return {g: 0 for g in GRAINS}
+        weeks = set(week_start(days))
+        months = set(month_start(days))
+        # Tramo que cubre las semanas y los meses afectados completos
+        start = min(min(weeks), min(months))
+        end = max(max(weeks) + pd.Timedelta(days=6),
+                  max(months) + pd.offsets.MonthEnd(0))
+        daily = load_daily(start.date(), end.date())
+
+        touched = {}
+        for grain in GRAINS:
+            bucket_col = GRAINS[grain][0]
+            affected = weeks if grain == 'week' else months
+            touched[grain] = len(affected)
+            for level in LEVELS:
+                old = self._load(grain, level)
+                fresh = aggregate(daily, grain, level)
+                fresh = fresh[fresh[bucket_col].isin(affected)]
+                merged = pd.concat([old[~old[bucket_col].isin(affected)], fresh], ignore_index=True)
+                merged = merged.sort_values(LEVELS[level] + GRAINS[grain], kind='stable').reset_index(drop=True)
+                self._save(merged, grain, level)
+        return touched
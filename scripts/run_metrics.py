@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Métricas estructuradas de la corrida: una línea JSON por etapa y por llamada
+a la API, en logs/meta_extractor_<timestamp>.metrics.jsonl (junto al log).
+
+- stage: etapa del pipeline, estado, segundos, filas y pico de memoria (RSS
+  del proceso al terminar la etapa; con etapas en paralelo es el del proceso).
+- api_call: una consulta de insights (rango de días de una cuenta) con
+  segundos totales, segundos del request inicial y de la paginación, filas,
+  bytes (JSON de las filas), espera en el limitador y % de uso de los headers
+  de Meta. Si falla, lleva el error; cache_hit si salió del cache.
+- sleep: pausas fuera del limitador (back-off de reintentos, sondeo de jobs
+  asíncronos), por origen.
+- step: un paso medido dentro de una etapa (p. ej. el merge de campaign_1d).
+- profile: perfil de una etapa con META_PROFILE (ver stage_profiler.py).
+
+Al final summary() imprime una tabla por etapa y otra por origen de API: así se
+ve si una corrida lenta se fue en rate limit (espera + back-off), en
+paginación o en procesamiento local (segundos de etapa sin API).
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+
+def peak_rss_mb():
+    """Pico de RSS del proceso en MB (None si no se puede medir)."""
+    try:
+        import resource
+    except ImportError:  # Windows (Power BI)
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+        except (ImportError, AttributeError):
+            return None
+    # ru_maxrss: KB en Linux, bytes en macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def rows_bytes(rows):
+    """Tamaño aproximado de la respuesta: bytes del JSON de las filas."""
+    total = 0
+    for r in rows:
+        try:
+            total += len(json.dumps(dict(r), default=str))
+        except (TypeError, ValueError):
+            total += len(str(r))
+    return total
+
+
+class RunMetrics:
+    """
+    Registro thread-safe de métricas de una corrida.
+    path: JSONL de salida (None = solo en memoria)
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.events = []
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def record(self, kind, **fields):
+        event = {'ts': datetime.now().isoformat(timespec='milliseconds'), 'kind': kind, **fields}
+        with self._lock:
+            self.events.append(event)
+            if self.path:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+        return event
+
+    def sleeper(self, source, reason, sleep=time.sleep):
+        """Función sleep que además registra cuánto se durmió y por qué."""
+        def _sleep(seconds):
+            sleep(seconds)
+            self.record('sleep', source=source, reason=reason, seconds=round(seconds, 3))
+        return _sleep
+
+    # ---------------- resumen ----------------
+    def _of(self, kind):
+        with self._lock:
+            return [e for e in self.events if e['kind'] == kind]
+
+    def summary(self):
+        stages = self._of('stage')
+        calls = self._of('api_call')
+        sleeps = self._of('sleep')
+
+        if stages:
+            print("\n=== Métricas por etapa ===")
+            print(f"{'etapa':<22}{'estado':<18}{'segundos':>10}{'filas':>10}{'pico RSS MB':>13}")
+            for e in stages:
+                rows = '-' if e.get('rows') is None else f"{e['rows']:,}"
+                rss = '-' if e.get('peak_rss_mb') is None else f"{e['peak_rss_mb']:.0f}"
+                print(f"{e['stage']:<22}{e['status']:<18}{e['seconds']:>10.2f}{rows:>10}{rss:>13}")
+
+        sources = sorted({e['source'] for e in calls} | {e['source'] for e in sleeps})
+        if not sources:
+            return
+        print("\n=== Métricas de API por origen ===")
+        print(f"{'origen':<12}{'llamadas':>9}{'cache':>7}{'errores':>8}{'filas':>10}{'MB':>8}{'API s':>9}"
+              f"{'pagin. s':>9}{'espera s':>9}{'sleep s':>9}{'uso máx %':>10}")
+        for src in sources:
+            mine = [e for e in calls if e['source'] == src]
+            hits = sum(1 for e in mine if e.get('cache_hit'))
+            ok = [e for e in mine if not e.get('error')]
+            slept = sum(e['seconds'] for e in sleeps if e['source'] == src)
+            usage = max((e.get('usage_pct') or 0 for e in mine), default=0)
+            print(f"{src:<12}{len(mine) - hits:>9}{hits:>7}{len(mine) - len(ok):>8}"
+                  f"{sum(e['rows'] for e in ok):>10,}{sum(e['bytes'] for e in ok) / 1e6:>8.1f}"
+                  f"{sum(e['seconds'] for e in mine):>9.1f}{sum(e.get('paging_s', 0) for e in mine):>9.1f}"
+                  f"{sum(e.get('limiter_wait_s', 0) for e in mine):>9.1f}{slept:>9.1f}{usage:>10.0f}")
+        if self.path:
+            print(f"Detalle en: {self.path}")
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Perfilado opcional por etapa (a01.py con META_PROFILE).
+
+Mientras corre cada etapa:
+- un muestreador lee las pilas de todos los hilos (menos el principal, que solo
+  espera al pipeline) cada interval segundos; así entran también los hilos de
+  extracción. Las pilas van a <prefijo>.collapsed en formato collapsed
+  ("etapa;archivo:función;... muestras"), el que leen flamegraph.pl y speedscope;
+- con mode='cprofile' además cProfile del hilo de la etapa: <prefijo>.<etapa>.prof
+  (pstats) y un resumen de texto con las funciones de mayor tiempo acumulado;
+- con memory=True, tracemalloc: pico de memoria trazada de la etapa y las líneas
+  que más memoria dejaron asignada (diff de snapshots) en <prefijo>.<etapa>.memory.txt.
+  Tracemalloc hace todo más lento y el diff tarda según la memoria viva y la
+  profundidad de las trazas (frames=1 por defecto: solo la línea que asigna).
+  Los segundos de la tabla de perfil no incluyen los snapshots; los de las
+  métricas de la etapa sí.
+
+Las etapas se perfilan de a una (lock): tracemalloc y el muestreo son del proceso
+y con etapas en paralelo se mezclarían. Con metrics (RunMetrics) cada etapa deja
+un evento 'profile'.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class _Sampler(threading.Thread):
+    """Cuenta pilas de los hilos vivos cada interval segundos."""
+
+    def __init__(self, interval, root):
+        super().__init__(name="stage-sampler", daemon=True)
+        self.interval = interval
+        self.root = root
+        self.stacks = {}
+        self.samples = 0
+        self._stop_event = threading.Event()
+        self._skip = {threading.main_thread().ident}
+
+    def run(self):
+        self._skip.add(threading.get_ident())
+        while not self._stop_event.wait(self.interval):
+            self.samples += 1
+            for tid, frame in sys._current_frames().items():
+                if tid in self._skip:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                key = ";".join([self.root] + names[::-1])
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class StageProfiler:
+    """
+    prefix: ruta base de los archivos (p. ej. logs/meta_extractor_<timestamp>)
+    mode: 'sample' (solo muestreo) o 'cprofile' (muestreo + cProfile)
+    memory: tracemalloc por etapa (más lento)
+    frames: profundidad de las trazas de tracemalloc (con más de 1 se escriben
+        las trazas completas de las mayores asignaciones)
+    interval: segundos entre muestras
+    top: líneas de los resúmenes de texto
+    """
+
+    def __init__(self, prefix, mode='sample', memory=True, interval=0.01, top=25, frames=1, metrics=None):
+        self.prefix = prefix
+        self.mode = mode
+        self.memory = memory
+        self.interval = interval
+        self.top = top
+        self.frames = frames
+        self.metrics = metrics
+        self.results = []
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(prefix), exist_ok=True)
+        # Desde ya: el pico incluye lo que se carga antes de la primera etapa
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    @staticmethod
+    def _snapshot():
+        # Sin las asignaciones de tracemalloc, del muestreador ni de los imports
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    @contextmanager
+    def stage(self, name):
+        with self._lock:
+            sampler = _Sampler(self.interval, name)
+            profile = cProfile.Profile() if self.mode == 'cprofile' else None
+            before = None
+            if self.memory:
+                tracemalloc.reset_peak()
+                before = self._snapshot()
+            t0 = time.perf_counter()
+            sampler.start()
+            if profile is not None:
+                profile.enable()
+            try:
+                yield
+            finally:
+                if profile is not None:
+                    profile.disable()
+                sampler.stop()
+                seconds = time.perf_counter() - t0
+                self._write(name, seconds, sampler, profile, before)
+
+    # ---------------- salidas ----------------
+    def _path(self, name, suffix):
+        return f"{self.prefix}.{name}.{suffix}"
+
+    def _write(self, name, seconds, sampler, profile, before):
+        result = {'stage': name, 'seconds': round(seconds, 3), 'samples': sampler.samples,
+                  'collapsed': self.prefix + ".collapsed"}
+        with open(result['collapsed'], 'a', encoding='utf-8') as f:
+            for stack, count in sorted(sampler.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+        if profile is not None:
+            result['prof'] = self._path(name, "prof")
+            profile.dump_stats(result['prof'])
+            out = io.StringIO()
+            pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(self.top)
+            with open(self._path(name, "prof.txt"), 'w', encoding='utf-8') as f:
+                f.write(out.getvalue())
+
+        if before is not None:
+            _, peak = tracemalloc.get_traced_memory()
+            after = self._snapshot()
+            diff = after.compare_to(before, 'lineno')
+            result['peak_traced_mb'] = round(peak / 1e6, 1)
+            result['net_traced_mb'] = round(sum(d.size_diff for d in diff) / 1e6, 1)
+            result['memory'] = self._path(name, "memory.txt")
+            with open(result['memory'], 'w', encoding='utf-8') as f:
+                f.write(f"Etapa {name}: pico trazado {result['peak_traced_mb']} MB, "
+                        f"neto {result['net_traced_mb']:+} MB\n\n")
+                for d in diff[:self.top]:
+                    f.write(f"{d.size_diff / 1e6:+10.2f} MB {d.count_diff:+10,} bloques  {d.traceback[0]}\n")
+                if self.frames > 1:
+                    f.write("\nTrazas completas de las 5 mayores:\n")
+                    for d in diff[:5]:
+                        f.write(f"\n{d.size_diff / 1e6:+.2f} MB\n" + "\n".join(d.traceback.format()) + "\n")
+
+        self.results.append(result)
+        if self.metrics is not None:
+            self.metrics.record('profile', **result)
+
+    def report(self):
+        if not self.results:
+            return
+        print(f"\n=== Perfil por etapa ({self.mode}{', memoria' if self.memory else ''}) ===")
+        print(f"{'etapa':<22}{'segundos':>10}{'muestras':>10}{'pico MB':>10}{'neto MB':>10}")
+        for r in self.results:
+            peak = '-' if r.get('peak_traced_mb') is None else f"{r['peak_traced_mb']:.1f}"
+            net = '-' if r.get('net_traced_mb') is None else f"{r['net_traced_mb']:+.1f}"
+            print(f"{r['stage']:<22}{r['seconds']:>10.2f}{r['samples']:>10}{peak:>10}{net:>10}")
+        print(f"Pilas (flamegraph): {self.prefix}.collapsed")
@@ -0,0 +1,592 @@
+# -*- coding: utf-8 -*-
+"""
+Almacenamiento columnar de los datasets (campaign_1d y nivel anuncio).
+
+Los datos se guardan en Parquet (o Feather) particionados por cuenta y mes:
+
+    <root>/<account_col>=<cuenta>/month=YYYY-MM/part-00000.parquet
+
+Cada etapa puede leer solo las columnas y el rango de fechas que necesita:
+las particiones fuera del rango ni se abren. El CSV queda como export
+opcional para Power BI.
+
+Las actualizaciones son incrementales (upsert): solo se tocan las particiones
+de las fechas nuevas. Un índice de claves (hash de las columnas clave) permite
+saber sin leer el histórico si una fila es nueva -> se agrega como un archivo
+part-NNNNN más en la partición- o si pisa una existente -> solo esa partición
+se reescribe. Toda escritura es atómica (archivo/carpeta temporal + rename).
+upsert_csv hace lo mismo sobre un CSV plano: con su propio índice de claves
+(hash y offset de cada fila) agrega las filas nuevas al final del archivo y,
+si alguna pisa una existente, reescribe solo desde esa fila (los días que se
+re-extraen están al final). Ambos mantienen el manifiesto del dataset (ver
+manifest.py).
+"""
+
+import io
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from manifest import Manifest, files_checksum
+
+
+BACKENDS = {
+    'parquet': '.parquet',
+    'feather': '.feather',
+}
+
+INDEX_FILE = "_key_index.parquet"
+MANIFEST_FILE = "_manifest.json"
+# Junto al CSV: índice de claves (numpy, sin pyarrow) y journal de la cola reescrita
+CSV_INDEX_SUFFIX = ".key_index.npz"
+CSV_JOURNAL_SUFFIX = ".tail"
+
+# Con más archivos part-* que esto, el siguiente upsert compacta la partición
+MAX_PARTS_PER_PARTITION = 8
+
+
+def _as_text(s):
+    """IDs a texto sin el '.0' que deja un CSV con faltantes (float)."""
+    if pd.api.types.is_float_dtype(s):
+        s = s.astype('Int64')
+    return s.astype('string')
+
+
+def _replace_dir(tmp_dir, final_dir):
+    """Reemplaza final_dir por tmp_dir; si se corta a mitad, _recover lo repara."""
+    old_dir = final_dir + ".old"
+    if os.path.isdir(final_dir):
+        os.replace(final_dir, old_dir)
+    os.replace(tmp_dir, final_dir)
+    if os.path.isdir(old_dir):
+        shutil.rmtree(old_dir)
+
+
+def _copy_csv_without(src_path, dst_path, drop, encoding):
+    """Copia un CSV salteando las filas marcadas en drop (una línea por fila)."""
+    with open(src_path, 'rb') as f:
+        n_lines = sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b""))
+    # Campos con saltos de línea entre comillas: no hay 1 línea por fila, copiar vía pandas
+    if n_lines - 1 not in (len(drop), len(drop) - 1):
+        old = pd.read_csv(src_path, encoding=encoding, dtype=str, keep_default_na=False)
+        old[~drop].to_csv(dst_path, index=False, encoding=encoding)
+        return
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        dst.write(src.readline())
+        for line, skip in zip(src, drop.tolist()):
+            if not skip:
+                dst.write(line)
+
+
+def _line_starts(data, base=0):
+    """Offset (base + posición) del comienzo de cada línea terminada en \\n de data."""
+    ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 10)
+    if not len(ends):
+        return np.array([], dtype=np.int64)
+    return np.concatenate([[0], ends[:-1] + 1]).astype(np.int64) + base
+
+
+def _csv_key_hash(keys_df):
+    """Hash de las claves tal como quedan escritas en el CSV (leídas como texto)."""
+    return pd.util.hash_pandas_object(keys_df.astype(str), index=False).to_numpy()
+
+
+def _new_key_hash(df_new, keys):
+    # Ida y vuelta por texto CSV: mismo hash que esas filas leídas del archivo
+    text = df_new[keys].to_csv(index=False, date_format='%Y-%m-%d')
+    return _csv_key_hash(pd.read_csv(io.StringIO(text), dtype=str)[keys])
+
+
+def _save_csv_index(csv_path, hashes, offsets):
+    tmp = csv_path + CSV_INDEX_SUFFIX + ".tmp"
+    with open(tmp, 'wb') as f:
+        np.savez(f, hash=hashes, offset=offsets if offsets is not None else np.array([], dtype=np.int64),
+                 checksum=np.array(files_checksum([csv_path])))
+    os.replace(tmp, csv_path + CSV_INDEX_SUFFIX)
+
+
+def _load_csv_index(csv_path, keys, encoding):
+    """
+    (hash, offset) de cada fila del CSV en orden de archivo. Sale del índice si
+    está al día; si no (primera vez o archivo editado) se arma leyendo las
+    columnas clave y se guarda. offset es None si hay campos con saltos de línea.
+    """
+    path = csv_path + CSV_INDEX_SUFFIX
+    if os.path.exists(path):
+        try:
+            with np.load(path, allow_pickle=False) as z:
+                if str(z['checksum']) == files_checksum([csv_path]):
+                    offsets = z['offset']
+                    return z['hash'], (offsets if len(offsets) == len(z['hash']) else None)
+        except (OSError, ValueError, KeyError):
+            pass
+    hashes = _csv_key_hash(pd.read_csv(csv_path, encoding=encoding, usecols=keys, dtype=str)[keys])
+    with open(csv_path, 'rb') as f:
+        offsets = _line_starts(f.read())[1:]  # sin el encabezado
+    offsets = offsets if len(offsets) == len(hashes) else None
+    _save_csv_index(csv_path, hashes, offsets)
+    return hashes, offsets
+
+
+def _recover_csv(csv_path):
+    """Deshace una reescritura de cola cortada a mitad (queda el journal con la cola original)."""
+    journal = csv_path + CSV_JOURNAL_SUFFIX
+    if os.path.exists(journal + ".tmp"):
+        os.remove(journal + ".tmp")
+    if not os.path.exists(journal):
+        return
+    with open(journal, 'rb') as f:
+        offset = int(f.readline())
+        tail = f.read()
+    with open(csv_path, 'r+b') as f:
+        f.truncate(offset)
+        f.seek(offset)
+        f.write(tail)
+    os.remove(journal)
+    print(f"{csv_path}: restaurado tras una escritura incompleta")
+
+
+def _rewrite_tail(csv_path, offset, new_tail):
+    """Reemplaza el CSV desde offset por new_tail; la cola original queda en el journal hasta terminar."""
+    journal = csv_path + CSV_JOURNAL_SUFFIX
+    with open(csv_path, 'rb') as f:
+        f.seek(offset)
+        old_tail = f.read()
+    with open(journal + ".tmp", 'wb') as f:
+        f.write(b"%d\n" % offset)
+        f.write(old_tail)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(journal + ".tmp", journal)
+    with open(csv_path, 'r+b') as f:
+        f.truncate(offset)
+        f.seek(offset)
+        f.write(new_tail)
+        f.flush()
+        os.fsync(f.fileno())
+    os.remove(journal)
+
+
+def _sync_manifest(manifest, was_fresh, checksum, df_inserted, read_all):
+    """Actualiza el manifiesto con las filas insertadas, o lo reconstruye si no estaba al día."""
+    if manifest is None:
+        return
+    if was_fresh:
+        manifest.apply(df_inserted, checksum)
+    else:
+        manifest.rebuild(read_all(), checksum)
+
+
+def upsert_csv(csv_path, df_new, keys, sort_by=None, encoding='utf-8-sig', manifest=None) -> dict:
+    """
+    Upsert sobre un CSV plano (STORAGE_BACKEND='csv' o el export para Power BI).
+    Los duplicados se detectan con el índice de claves del CSV (<csv>.key_index.npz,
+    se arma una vez leyendo solo las columnas clave). Las filas nuevas se
+    agregan al final sin reordenar ni copiar el histórico; si alguna pisa una
+    existente, se reescribe solo la cola desde la primera fila pisada (sin
+    parsear tipos). Esas escrituras en el lugar dejan la cola original en
+    <csv>.tail hasta terminar: si el proceso se corta, el próximo upsert la restaura.
+    Columnas de df_new que el CSV no tiene (p. ej. un evento nuevo en
+    action_mapping.json) se agregan al final del encabezado: ese upsert
+    reescribe el archivo (copia temporal + rename) con la columna vacía en las
+    filas existentes.
+    manifest: Manifest opcional a mantener junto al CSV.
+    """
+    stats = {'inserted': 0, 'updated': 0, 'rewritten': False, 'tail_rows': 0, 'added_columns': []}
+    df_new = df_new.drop_duplicates(subset=keys, keep='last')
+    df_new = df_new.sort_values(sort_by or keys, kind='stable')
+    tmp = csv_path + ".tmp"
+    read_all = lambda: pd.read_csv(csv_path, encoding=encoding)
+
+    if not os.path.exists(csv_path):
+        df_new.to_csv(tmp, index=False, encoding=encoding, date_format='%Y-%m-%d')
+        os.replace(tmp, csv_path)
+        stats['inserted'] = len(df_new)
+        _sync_manifest(manifest, False, files_checksum([csv_path]), df_new, read_all)
+        return stats
+    _recover_csv(csv_path)
+    was_fresh = manifest is not None and manifest.is_fresh(files_checksum([csv_path]))
+
+    header = pd.read_csv(csv_path, encoding=encoding, nrows=0).columns.tolist()
+    missing_keys = [k for k in keys if k not in header]
+    if missing_keys:
+        raise ValueError(f"{csv_path} no tiene las columnas clave {missing_keys}")
+    added = [c for c in df_new.columns if c not in header]
+    # Mismo orden que el archivo; columnas que df_new no trae quedan vacías
+    df_new = df_new.reindex(columns=header + added)
+
+    old_hash, offsets = _load_csv_index(csv_path, keys, encoding)
+    new_hash = _new_key_hash(df_new, keys)
+    # isin de pandas (tabla hash): np.isin sobre uint64 tarda segundos con años de historia
+    replaced = pd.Series(old_hash).isin(new_hash).to_numpy()
+    existing = pd.Series(new_hash).isin(old_hash).to_numpy()
+    stats['updated'] = int(existing.sum())
+    stats['inserted'] = len(df_new) - stats['updated']
+    data = df_new.to_csv(header=False, index=False, date_format='%Y-%m-%d').encode('utf-8')
+    kept_hash = np.concatenate([old_hash[~replaced], new_hash])
+
+    if added or (replaced.any() and offsets is None):
+        if added:
+            # Esquema nuevo: filas existentes como texto (sin cambiar sus valores) + columnas vacías
+            old = pd.read_csv(csv_path, encoding=encoding, dtype=str, keep_default_na=False)
+            old[~replaced].reindex(columns=header + added, fill_value='').to_csv(tmp, index=False, encoding=encoding)
+            stats['added_columns'] = added
+            print(f"{csv_path}: columnas nuevas {added} (vacías en las filas anteriores)")
+        else:
+            _copy_csv_without(csv_path, tmp, replaced, encoding)
+        with open(tmp, 'rb+') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+            f.write(data)
+        os.replace(tmp, csv_path)
+        stats['rewritten'] = True
+        with open(csv_path, 'rb') as f:
+            new_offsets = _line_starts(f.read())[1:]
+    else:
+        # Cola desde la primera fila pisada (o solo las filas nuevas al final)
+        size = os.path.getsize(csv_path)
+        first = int(np.argmax(replaced)) if replaced.any() else len(old_hash)
+        offset = int(offsets[first]) if first < len(old_hash) else size
+        with open(csv_path, 'rb') as f:
+            f.seek(offset)
+            tail = f.read()
+        if tail and not tail.endswith(b"\n"):
+            tail += b"\n"
+        bounds = list(_line_starts(tail)) + [len(tail)]
+        keep = ~replaced[first:]
+        new_tail = b"".join(tail[a:b] for a, b, k in zip(bounds[:-1], bounds[1:], keep) if k) + data
+        _rewrite_tail(csv_path, offset, new_tail)
+        stats['tail_rows'] = int(keep.sum())
+        new_offsets = None
+        if offsets is not None:
+            new_offsets = np.concatenate([offsets[:first], _line_starts(new_tail, base=offset)])
+    if new_offsets is not None and len(new_offsets) != len(kept_hash):
+        new_offsets = None
+    _save_csv_index(csv_path, kept_hash, new_offsets)
+    _sync_manifest(manifest, was_fresh, files_checksum([csv_path]),
+                   df_new[~existing], read_all)
+    return stats
+
+
+class DatasetStore:
+    """
+    Dataset particionado por cuenta y mes.
+    root: carpeta del dataset
+    account_col / date_col: columnas de partición
+    keys: columnas que identifican una fila (deben incluir cuenta y fecha)
+    text_cols: columnas que se guardan como texto (IDs que el CSV leía como números)
+    backend: 'parquet' o 'feather'
+    """
+
+    def __init__(self, root, account_col, date_col, keys=None, text_cols=(), backend='parquet'):
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend '{backend}' no soportado (usar uno de {list(BACKENDS)})")
+        self.root = root
+        self.account_col = account_col
+        self.date_col = date_col
+        self.keys = list(keys) if keys else [account_col, date_col]
+        self.text_cols = list(text_cols)
+        self.backend = backend
+        self.ext = BACKENDS[backend]
+        self._index = None
+        self.manifest = Manifest(os.path.join(root, MANIFEST_FILE), account_col, date_col, self.keys)
+        self._recover()
+
+    # ---------------- particiones ----------------
+    def partition_dir(self, account, month):
+        return os.path.join(self.root, f"{self.account_col}={account}", f"month={month}")
+
+    def _part_files(self, pdir):
+        return sorted(
+            os.path.join(pdir, f) for f in os.listdir(pdir)
+            if f.endswith(self.ext) and not f.startswith(".")
+        )
+
+    def partitions(self):
+        """Lista [(cuenta, 'YYYY-MM', [archivos])] de las particiones existentes."""
+        out = []
+        if not os.path.isdir(self.root):
+            return out
+        for acc_dir in sorted(os.listdir(self.root)):
+            if not acc_dir.startswith(self.account_col + "="):
+                continue
+            account = acc_dir.split("=", 1)[1]
+            acc_path = os.path.join(self.root, acc_dir)
+            for month_dir in sorted(os.listdir(acc_path)):
+                if not month_dir.startswith("month=") or "." in month_dir:
+                    continue
+                files = self._part_files(os.path.join(acc_path, month_dir))
+                if files:
+                    out.append((account, month_dir.split("=", 1)[1], files))
+        return out
+
+    def exists(self):
+        return bool(self.partitions())
+
+    def size_bytes(self):
+        """Tamaño en disco de los archivos de datos."""
+        return sum(os.path.getsize(f) for _, _, files in self.partitions() for f in files)
+
+    def checksum(self):
+        """Huella de los archivos de datos (para validar el manifiesto)."""
+        return files_checksum(f for _, _, files in self.partitions() for f in files)
+
+    def coverage(self):
+        """
+        Cobertura por cuenta (ver Manifest.coverage). Sin manifiesto al día se
+        lee solo la columna de fecha del último mes de cada cuenta (sin gaps).
+        """
+        coverage = self.manifest.coverage(self.checksum())
+        if coverage is not None:
+            return coverage
+        latest = {}
+        for account, month, files in self.partitions():
+            latest[account] = files  # partitions() viene ordenado por mes
+        coverage = {}
+        for account, files in latest.items():
+            last = pd.to_datetime(self._read_partition(files, [self.date_col])[self.date_col]).max()
+            if not pd.isna(last):
+                coverage[account] = {'max_date': last.date().isoformat(), 'gaps': []}
+        return coverage
+
+    def _recover(self):
+        """Repara un reemplazo de partición cortado a mitad (queda .old sin la final)."""
+        if not os.path.isdir(self.root):
+            return
+        for acc_dir in os.listdir(self.root):
+            acc_path = os.path.join(self.root, acc_dir)
+            if not os.path.isdir(acc_path):
+                continue
+            for d in os.listdir(acc_path):
+                path = os.path.join(acc_path, d)
+                if d.endswith(".old"):
+                    final = path[:-4]
+                    if os.path.isdir(final):
+                        shutil.rmtree(path)
+                    else:
+                        os.replace(path, final)
+                elif d.endswith(".tmp"):
+                    shutil.rmtree(path)
+
+    def _month_keys(self, df):
+        return pd.to_datetime(df[self.date_col]).dt.strftime('%Y-%m')
+
+    # ---------------- lectura ----------------
+    def _read_file(self, path, columns=None):
+        if self.backend == 'parquet':
+            return pd.read_parquet(path, columns=columns)
+        return pd.read_feather(path, columns=columns)
+
+    def _read_partition(self, files, columns=None):
+        frames = [self._read_file(f, columns) for f in files]
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+    def read(self, columns=None, start=None, end=None, accounts=None) -> pd.DataFrame:
+        """
+        Lee el dataset podando particiones.
+        columns: columnas a cargar (None = todas)
+        start / end: fechas inclusive (date o Timestamp); filtra por mes y luego por día
+        accounts: cuentas a incluir (None = todas)
+        """
+        start_m = pd.Timestamp(start).strftime('%Y-%m') if start is not None else None
+        end_m = pd.Timestamp(end).strftime('%Y-%m') if end is not None else None
+
+        read_cols = None
+        if columns is not None:
+            read_cols = list(dict.fromkeys(list(columns) + [self.date_col]))
+
+        frames = []
+        for account, month, files in self.partitions():
+            if accounts is not None and account not in accounts:
+                continue
+            if (start_m and month < start_m) or (end_m and month > end_m):
+                continue
+            frames.append(self._read_partition(files, read_cols))
+
+        if not frames:
+            return pd.DataFrame(columns=columns if columns is not None else [])
+        df = pd.concat(frames, ignore_index=True)
+
+        if start is not None or end is not None:
+            dates = pd.to_datetime(df[self.date_col])
+            mask = pd.Series(True, index=df.index)
+            if start is not None:
+                mask &= dates >= pd.Timestamp(start)
+            if end is not None:
+                mask &= dates <= pd.Timestamp(end)
+            df = df[mask].reset_index(drop=True)
+
+        if columns is not None:
+            df = df[list(columns)]
+        return df
+
+    # ---------------- índice de claves ----------------
+    def key_hash(self, df) -> np.ndarray:
+        """Hash uint64 de las columnas clave (normalizadas)."""
+        keys = df[self.keys].copy()
+        # Misma resolución de fecha venga de la API o de un archivo leído
+        keys[self.date_col] = pd.to_datetime(keys[self.date_col]).astype('datetime64[ns]')
+        for c in keys.columns:
+            if c != self.date_col:
+                keys[c] = keys[c].astype(object)
+        return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+    def _index_path(self):
+        return os.path.join(self.root, INDEX_FILE)
+
+    def load_index(self) -> pd.DataFrame:
+        """Índice {hash, partición}; se reconstruye con un escaneo completo si falta."""
+        if self._index is not None:
+            return self._index
+        path = self._index_path()
+        if os.path.exists(path):
+            self._index = pd.read_parquet(path)
+        else:
+            self._index = self._build_index()
+            if len(self._index):
+                self._save_index(self._index)
+        return self._index
+
+    def _build_index(self):
+        frames = []
+        for account, month, files in self.partitions():
+            part = self._normalize(self._read_partition(files, self.keys))
+            frames.append(pd.DataFrame({'hash': self.key_hash(part), 'partition': f"{account}/{month}"}))
+        if not frames:
+            return pd.DataFrame({'hash': np.array([], dtype=np.uint64), 'partition': pd.Series([], dtype=object)})
+        return pd.concat(frames, ignore_index=True)
+
+    def _save_index(self, index):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self._index_path() + ".tmp"
+        index.to_parquet(tmp, index=False)
+        os.replace(tmp, self._index_path())
+        self._index = index
+
+    # ---------------- escritura ----------------
+    def _write_file(self, df, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = os.path.join(os.path.dirname(path), "." + os.path.basename(path) + ".tmp")
+        if self.backend == 'parquet':
+            df.to_parquet(tmp, index=False)
+        else:
+            df.reset_index(drop=True).to_feather(tmp)
+        os.replace(tmp, path)
+
+    def _write_partition(self, df, account, month):
+        """Reescribe una partición completa de forma atómica (carpeta temporal + rename)."""
+        final_dir = self.partition_dir(account, month)
+        tmp_dir = final_dir + ".tmp"
+        if os.path.isdir(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        self._write_file(df.reset_index(drop=True), os.path.join(tmp_dir, "part-00000" + self.ext))
+        _replace_dir(tmp_dir, final_dir)
+
+    def _normalize(self, df):
+        df = df.copy()
+        df[self.date_col] = pd.to_datetime(df[self.date_col], errors='coerce')
+        df[self.account_col] = df[self.account_col].astype(str)
+        for c in self.text_cols:
+            if c in df.columns:
+                df[c] = _as_text(df[c])
+        return df
+
+    def write(self, df, overwrite=True):
+        """
+        Reemplaza el dataset completo (migraciones / reconstrucciones). Con
+        overwrite=True borra además las particiones que ya no tienen filas en df.
+        Devuelve la cantidad de particiones escritas.
+        """
+        df = self._normalize(df)
+        months = self._month_keys(df)
+        written = set()
+        for (account, month), part in df.groupby([df[self.account_col], months], sort=True):
+            self._write_partition(part.sort_values(self.keys, kind='stable'), account, month)
+            written.add((account, month))
+
+        if overwrite:
+            for account, month, _ in self.partitions():
+                if (account, month) not in written:
+                    shutil.rmtree(self.partition_dir(account, month))
+        self._index = None
+        if os.path.exists(self._index_path()):
+            os.remove(self._index_path())
+        self.load_index()
+        self.manifest.rebuild(df, self.checksum())
+        return len(written)
+
+    def upsert(self, df_new) -> dict:
+        """
+        Inserta/actualiza filas por clave tocando solo las particiones afectadas.
+        Filas con clave nueva se agregan como un archivo part-* más; si alguna
+        clave ya existe, esa partición se reescribe (gana la fila nueva).
+        Devuelve {'inserted', 'updated', 'appended_parts', 'rewritten_parts'}.
+        """
+        stats = {'inserted': 0, 'updated': 0, 'appended_parts': 0, 'rewritten_parts': 0}
+        if df_new is None or len(df_new) == 0:
+            return stats
+
+        was_fresh = self.manifest.is_fresh(self.checksum())
+        new = self._normalize(df_new).drop_duplicates(subset=self.keys, keep='last').reset_index(drop=True)
+        hashes = self.key_hash(new)
+        index = self.load_index()
+        existing = np.isin(hashes, index['hash'].to_numpy())
+        months = self._month_keys(new)
+        part_ids = new[self.account_col] + "/" + months
+
+        # El índice se guarda ANTES que los datos: si el proceso se corta entre
+        # ambos, el índice solo puede sobrar claves (fuerza una reescritura
+        # innecesaria) pero nunca faltar (lo que duplicaría filas).
+        added = pd.DataFrame({'hash': hashes[~existing], 'partition': part_ids[~existing].to_numpy()})
+        if len(added):
+            self._save_index(pd.concat([index, added], ignore_index=True))
+
+        for (account, month), part in new.groupby([new[self.account_col], months], sort=True):
+            part_existing = existing[part.index.to_numpy()]
+            pdir = self.partition_dir(account, month)
+            files = self._part_files(pdir) if os.path.isdir(pdir) else []
+
+            if part_existing.any() or len(files) >= MAX_PARTS_PER_PARTITION:
+                old = self._read_partition(files) if files else part.iloc[0:0]
+                combined = pd.concat([self._normalize(old), part], ignore_index=True)
+                combined = combined.drop_duplicates(subset=self.keys, keep='last')
+                self._write_partition(combined.sort_values(self.keys, kind='stable'), account, month)
+                stats['rewritten_parts'] += 1
+            else:
+                self._write_file(part.sort_values(self.keys, kind='stable').reset_index(drop=True),
+                                 os.path.join(pdir, f"part-{len(files):05d}" + self.ext))
+                stats['appended_parts'] += 1
+            stats['updated'] += int(part_existing.sum())
+            stats['inserted'] += int((~part_existing).sum())
+        _sync_manifest(self.manifest, was_fresh, self.checksum(), new[~existing], self.read)
+        return stats
+
+    # ---------------- CSV (compatibilidad / Power BI) ----------------
+    def import_csv(self, csv_path, encoding='utf-8-sig'):
+        """Migración única: carga un CSV histórico al store."""
+        df = pd.read_csv(csv_path, encoding=encoding)
+        n = self.write(df)
+        print(f"Migrado {csv_path} → {self.root} ({len(df)} filas, {n} particiones)")
+        return df
+
+    def export_csv(self, csv_path, sort_by=None, encoding='utf-8-sig'):
+        """Escribe el dataset completo como CSV (formato que consume Power BI)."""
+        df = self.read()
+        df = df.sort_values(sort_by or self.keys, kind='stable').reset_index(drop=True)
+        df[self.date_col] = pd.to_datetime(df[self.date_col]).dt.date
+        os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+        tmp = csv_path + ".tmp"
+        df.to_csv(tmp, index=False, encoding=encoding, date_format='%Y-%m-%d')
+        os.replace(tmp, csv_path)
+        return df
+
+    def backup(self, dest):
+        """Copia completa del store (equivalente al backup del CSV)."""
+        if os.path.isdir(dest):
+            shutil.rmtree(dest)
+        if os.path.isdir(self.root):
+            shutil.copytree(self.root, dest)
+        return dest
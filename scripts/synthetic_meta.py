@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+API de insights sintética para medir la corrida sin credenciales.
+
+SyntheticMeta genera filas deterministas (misma semilla -> mismos valores) con
+la forma de AdsInsights para cuentas x campañas x anuncios x días: spend,
+impresiones, reach, clicks, arrays de actions (link_click, mensajería,
+engagement), video_*_actions y la curva de retención. El nivel campaña es la
+suma de sus anuncios (reach deduplicada y ratios recalculados), así los dos
+niveles son coherentes entre sí.
+
+Sirve como cliente de InsightsPlanner (get_insights, con paginación, latencia
+por página y headers de uso) y de AsyncReportRunner (submit / status /
+results, con jobs que terminan después de job_latency_s). Con max_rows, un
+rango que devolvería más filas responde como Meta cuando la respuesta es
+demasiado grande.
+
+a01.py la usa con META_SYNTHETIC (JSON con los parámetros, p. ej.
+'{"campaigns": 50, "ads": 3, "latency_s": 0.02}').
+"""
+
+import random
+import threading
+import time
+from datetime import date, timedelta
+
+from async_reports import JOB_COMPLETED
+
+MESSAGING_TYPES = [
+    'onsite_conversion.messaging_conversation_started_7d',
+    'onsite_conversion.messaging_first_reply',
+    'onsite_conversion.messaging_user_depth_2_message_send',
+]
+CURVE_POINTS = 16
+
+
+class SyntheticRequestError(Exception):
+    """Error con la interfaz de FacebookRequestError (api_error_code)."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self._code = code
+
+    def api_error_code(self):
+        return self._code
+
+
+class SyntheticCursor:
+    """Iterable por páginas: cada página (la primera incluida) tarda latency_s."""
+
+    def __init__(self, rows, page_size, latency_s, headers, sleep):
+        self._rows = rows
+        self._page_size = max(1, page_size)
+        self._latency_s = latency_s
+        self._headers = headers
+        self._sleep = sleep
+        self.pages = 0
+
+    def headers(self):
+        return self._headers
+
+    def __iter__(self):
+        for i in range(0, max(1, len(self._rows)), self._page_size):
+            if self._latency_s:
+                self._sleep(self._latency_s)
+            self.pages += 1
+            yield from self._rows[i:i + self._page_size]
+
+
+class SyntheticJob(dict):
+    """Job asíncrono: se indexa como AdReportRun (async_status, async_percent_completion)."""
+
+
+class SyntheticMeta:
+    """
+    campaigns / ads: campañas por cuenta y anuncios por campaña
+    active_share: probabilidad de que una campaña tenga datos un día dado
+    latency_s: segundos por página (request inicial y cada página siguiente)
+    page_size: filas por página
+    max_rows: filas máximas por respuesta (None = sin tope)
+    usage_pct: % de uso que informan los headers
+    job_latency_s: segundos hasta que un job asíncrono termina
+    """
+
+    def __init__(self, campaigns=20, ads=3, seed=1, active_share=0.85, latency_s=0.0, page_size=25,
+                 max_rows=None, usage_pct=5.0, job_latency_s=0.0, clock=time.monotonic, sleep=time.sleep):
+        self.campaigns = campaigns
+        self.ads = ads
+        self.seed = seed
+        self.active_share = active_share
+        self.latency_s = latency_s
+        self.page_size = page_size
+        self.max_rows = max_rows
+        self.usage_pct = usage_pct
+        self.job_latency_s = job_latency_s
+        self.clock = clock
+        self.sleep = sleep
+        self.requests = 0
+        self.jobs = 0
+        self._lock = threading.Lock()
+
+    # ---------------- datos ----------------
+    def _rnd(self, *key):
+        return random.Random("|".join(str(k) for k in (self.seed,) + key))
+
+    def _active(self, account_id, day, c):
+        return self._rnd(account_id, day, c, 'on').random() < self.active_share
+
+    def ad_row(self, account_id, day, c, k):
+        """Fila nivel anuncio con todos los fields (day: 'YYYY-MM-DD')."""
+        rnd = self._rnd(account_id, day, c, k)
+        impressions = rnd.randint(50, 20000)
+        reach = int(impressions * rnd.uniform(0.55, 0.9))
+        clicks = int(impressions * rnd.uniform(0.002, 0.04))
+        link_clicks = int(clicks * rnd.uniform(0.3, 0.8))
+        plays = int(impressions * rnd.uniform(0.1, 0.6))
+        actions = [
+            {'action_type': 'link_click', 'value': str(link_clicks)},
+            {'action_type': 'post_engagement', 'value': str(clicks + rnd.randint(0, 200))},
+            {'action_type': 'video_view', 'value': str(plays)},
+        ]
+        for t in rnd.sample(MESSAGING_TYPES, rnd.randint(0, len(MESSAGING_TYPES))):
+            actions.append({'action_type': t, 'value': str(rnd.randint(1, 40))})
+        curve, pct = [], 100.0
+        for _ in range(CURVE_POINTS):
+            curve.append(int(pct))
+            pct *= rnd.uniform(0.7, 0.95)
+        return {
+            'date_start': day,
+            'date_stop': day,
+            'account_id': account_id,
+            'campaign_id': str(120100000000000 + c),
+            'campaign_name': f"campaña_{c}",
+            'ad_id': str(120200000000000 + c * 100 + k),
+            'spend': f"{impressions * rnd.uniform(1.5, 8.0) / 1000:.2f}",
+            'impressions': str(impressions),
+            'reach': str(reach),
+            'clicks': str(clicks),
+            'unique_inline_link_clicks': str(int(link_clicks * rnd.uniform(0.7, 1.0))),
+            'ctr': f"{clicks / impressions * 100:.6f}",
+            'unique_link_clicks_ctr': f"{link_clicks / reach * 100:.6f}",
+            'actions': actions,
+            'video_p25_watched_actions': [{'action_type': 'video_view', 'value': str(plays // 2)}],
+            'video_play_actions': [{'action_type': 'video_view', 'value': str(plays)}],
+            'video_p100_watched_actions': [{'action_type': 'video_view', 'value': str(plays // 10)}],
+            'video_play_curve_actions': [{'action_type': 'video_view', 'value': curve}],
+        }
+
+    def campaign_row(self, account_id, day, c):
+        """Suma de los anuncios de la campaña (reach deduplicada: 90% de la suma)."""
+        ads = [self.ad_row(account_id, day, c, k) for k in range(self.ads)]
+        num = {f: sum(float(a[f]) for a in ads)
+               for f in ('spend', 'impressions', 'reach', 'clicks', 'unique_inline_link_clicks')}
+        reach = int(num['reach'] * 0.9)
+        row = {
+            'date_start': day, 'date_stop': day, 'account_id': account_id,
+            'campaign_id': ads[0]['campaign_id'], 'campaign_name': ads[0]['campaign_name'],
+            'spend': f"{num['spend']:.2f}", 'impressions': str(int(num['impressions'])),
+            'reach': str(reach), 'clicks': str(int(num['clicks'])),
+            'unique_inline_link_clicks': str(int(num['unique_inline_link_clicks'])),
+            'ctr': f"{num['clicks'] / num['impressions'] * 100:.6f}",
+            'unique_link_clicks_ctr': f"{num['unique_inline_link_clicks'] / reach * 100:.6f}" if reach else "0",
+        }
+        for field in ('actions', 'video_p25_watched_actions', 'video_play_actions', 'video_p100_watched_actions'):
+            totals = {}
+            for a in ads:
+                for item in a[field]:
+                    totals[item['action_type']] = totals.get(item['action_type'], 0) + int(item['value'])
+            row[field] = [{'action_type': t, 'value': str(v)} for t, v in totals.items()]
+        return row
+
+    def rows(self, account_id, since, until, level='campaign', fields=None):
+        """Filas diarias de since a until (date o 'YYYY-MM-DD') para un nivel."""
+        since, until = (d if isinstance(d, date) else date.fromisoformat(d) for d in (since, until))
+        out = []
+        for i in range((until - since).days + 1):
+            day = (since + timedelta(days=i)).isoformat()
+            for c in range(self.campaigns):
+                if not self._active(account_id, day, c):
+                    continue
+                if level == 'ad':
+                    out.extend(self.ad_row(account_id, day, c, k) for k in range(self.ads))
+                else:
+                    out.append(self.campaign_row(account_id, day, c))
+        if fields is not None:
+            keep = set(fields) | {'date_start', 'date_stop'}
+            out = [{f: v for f, v in r.items() if f in keep} for r in out]
+        return out
+
+    def _query(self, account_id, fields, params):
+        tr = params['time_range']
+        rows = self.rows(account_id, tr['since'], tr['until'], params.get('level', 'campaign'), fields)
+        if self.max_rows is not None and len(rows) > self.max_rows and tr['since'] != tr['until']:
+            raise SyntheticRequestError(1, "Please reduce the amount of data you're asking for, then retry your request")
+        return rows
+
+    def _headers(self):
+        return {'x-ad-account-usage': {'acc_id_util_pct': self.usage_pct, 'reset_time_duration': 0}}
+
+    # ---------------- cliente síncrono (InsightsPlanner) ----------------
+    def get_insights(self, account_id, fields, params):
+        with self._lock:
+            self.requests += 1
+        rows = self._query(account_id, fields, params)
+        return SyntheticCursor(rows, self.page_size, self.latency_s, self._headers(), self.sleep)
+
+    # ---------------- cliente asíncrono (AsyncReportRunner) ----------------
+    def submit(self, account_id, fields, params):
+        with self._lock:
+            self.jobs += 1
+        return SyntheticJob(account_id=account_id, fields=list(fields), params=dict(params),
+                            ready_at=self.clock() + self.job_latency_s)
+
+    def status(self, job):
+        remaining = job['ready_at'] - self.clock()
+        if remaining <= 0:
+            return JOB_COMPLETED, 100
+        done = 1 - remaining / self.job_latency_s if self.job_latency_s else 1
+        return "Job Running", int(done * 100)
+
+    def results(self, job, page_size=500):
+        rows = self._query(job['account_id'], job['fields'], job['params'])
+        return SyntheticCursor(rows, page_size, self.latency_s, self._headers(), self.sleep)
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Render de las tablas del reporte semanal a PNG.
+
+format_table arma el texto de las celdas por columna (no por celda) con las
+mismas reglas que el export_table_png original. TableRenderer reutiliza una
+sola Figure con canvas Agg (sin pyplot ni figure manager) para todas las
+tablas. render_tables reparte lotes grandes en un pool de procesos, cada uno
+con su propio renderer.
+
+matplotlib se importa recién al crear el primer renderer: las corridas que no
+generan reportes no pagan ese import.
+"""
+
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+
+PERCENT_METRICS = {"ctr", "unique_link_clicks_ctr"}
+
+# A partir de cuántas tablas conviene levantar procesos
+MIN_TABLES_PER_WORKER = 16
+
+
+def _to_float_text(val):
+    """Último recurso del formato original para celdas de texto."""
+    try:
+        vf = float(str(val).replace('%', '').replace(',', '').strip())
+        return f"{vf:,.2f}"
+    except Exception:
+        return str(val)
+
+
+def format_table(df_in: pd.DataFrame, metric_map: dict):
+    """
+    Filas de texto (encabezado + una por métrica) listas para ax.table.
+    Reglas: '(%)' en la columna -> '1,234.56%'; métricas de CTR -> valor x100
+    con '%'; floats -> '1,234.56'; enteros -> '1,234'; NaN -> ''.
+    """
+    df = df_in.reset_index(drop=True)
+    keys = df['Métrica'].astype(str).str.strip().str.lower()
+    display = [metric_map.get(k, v) for k, v in zip(keys, df['Métrica'])]
+    is_pct_metric = keys.isin(PERCENT_METRICS).to_numpy()
+
+    columns = [display]
+    for col in df.columns:
+        if col == 'Métrica':
+            continue
+        s = df[col]
+        if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            values = s.to_numpy(dtype=float)
+            missing = np.isnan(values)
+            if "(%)" in str(col):
+                text = [f"{v:,.2f}%" for v in values]
+            else:
+                scaled = np.where(is_pct_metric, values * 100, values)
+                if pd.api.types.is_integer_dtype(s):
+                    plain = [f"{v:,d}" for v in s.to_numpy()]
+                else:
+                    plain = [f"{v:,.2f}" for v in values]
+                text = [f"{v:,.2f}%" if p else t for v, p, t in zip(scaled, is_pct_metric, plain)]
+            columns.append(['' if m else t for m, t in zip(missing, text)])
+        else:
+            # Columnas mixtas / texto: regla por celda
+            text = []
+            for v, p in zip(s.to_numpy(dtype=object), is_pct_metric):
+                if pd.isna(v):
+                    text.append('')
+                    continue
+                try:
+                    vf = float(v)
+                    if "(%)" in str(col):
+                        text.append(f"{vf:,.2f}%")
+                        continue
+                    if p:
+                        text.append(f"{vf * 100:,.2f}%")
+                        continue
+                except Exception:
+                    pass
+                if isinstance(v, (float, np.floating)):
+                    text.append(f"{v:,.2f}")
+                elif isinstance(v, (int, np.integer)):
+                    text.append(f"{v:,d}")
+                else:
+                    text.append(_to_float_text(v))
+            columns.append(text)
+
+    return [df.columns.tolist()] + [list(row) for row in zip(*columns)]
+
+
+class TableRenderer:
+    """
+    Figure + canvas Agg reutilizados entre tablas.
+
+    tight_layout y bbox_inches='tight' dibujan la figura completa una vez cada
+    uno solo para medirla. Como las tablas del reporte tienen celdas de ancho
+    fijo, el resultado depende únicamente de la forma (filas x columnas): se
+    mide la primera tabla de cada forma y el resto reutiliza la posición de los
+    ejes y el recorte.
+    """
+
+    def __init__(self, dpi=200, fontsize=10, compress_level=1):
+        from matplotlib import rcParams
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.dpi = dpi
+        self.fontsize = fontsize
+        self.pad_inches = rcParams['savefig.pad_inches']
+        # Compresión PNG baja: mismos píxeles, archivo algo más grande
+        self.pil_kwargs = {'compress_level': compress_level}
+        self.fig = Figure()
+        FigureCanvasAgg(self.fig)
+        self._layouts = {}
+
+    def render(self, text_table, output_path):
+        """Dibuja y guarda una tabla ya formateada (ver format_table)."""
+        nrows = len(text_table) - 1
+        ncols = len(text_table[0])
+        fig = self.fig
+        fig.clear()
+        fig.set_size_inches(max(8, ncols * 1.5), max(2 + nrows * 0.5, 1.8 + nrows * 0.45))
+        ax = fig.add_subplot()
+        ax.axis('off')
+
+        table = ax.table(cellText=text_table, cellLoc='center', loc='center')
+        table.auto_set_font_size(False)
+        table.set_fontsize(self.fontsize)
+        table.scale(1, 1.2)
+
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        layout = self._layouts.get((nrows, ncols))
+        if layout is None:
+            fig.tight_layout()
+            layout = (ax.get_position(), self._tight_bbox())
+            self._layouts[(nrows, ncols)] = layout
+        ax.set_position(layout[0])
+        fig.savefig(output_path, dpi=self.dpi, bbox_inches=layout[1], pil_kwargs=self.pil_kwargs)
+        return output_path
+
+    def _tight_bbox(self):
+        """Recorte que calcularía savefig(bbox_inches='tight') al dpi de salida."""
+        fig = self.fig
+        screen_dpi = fig.dpi
+        fig.dpi = self.dpi
+        try:
+            fig.draw_without_rendering()
+            bbox = fig.get_tightbbox(fig.canvas.get_renderer())
+        finally:
+            fig.dpi = screen_dpi
+        return bbox.padded(self.pad_inches)
+
+
+_worker_renderer = None
+
+
+@contextmanager
+def _main_oculto():
+    """
+    Con spawn (Windows) cada proceso hijo importa el script principal. El
+    guard __main__ de a01.py evita que corra la extracción, pero el nivel de
+    módulo igual abre un log y un .metrics.jsonl nuevos, redirige stdout y
+    arma clientes y pipeline en cada hijo. Mientras se crean los procesos se
+    oculta el path de __main__ para que los hijos no lo importen; se restaura
+    al salir aunque falle el pool.
+    """
+    main = sys.modules.get('__main__')
+    path = getattr(main, '__file__', None)
+    if path is None or multiprocessing.get_start_method() == 'fork':
+        yield
+        return
+    del main.__file__
+    try:
+        yield
+    finally:
+        main.__file__ = path
+
+
+def _init_worker(dpi, fontsize):
+    global _worker_renderer
+    _worker_renderer = TableRenderer(dpi=dpi, fontsize=fontsize)
+
+
+def _render_batch(batch):
+    return [_worker_renderer.render(text, path) for text, path in batch]
+
+
+def render_tables(jobs, metric_map, workers=None, dpi=200, fontsize=10):
+    """
+    Renderiza [(df, output_path), ...]. Devuelve los paths en el mismo orden.
+    workers: procesos del pool (None = según CPUs y cantidad de tablas; 1 = en
+    este proceso).
+    """
+    items = [(format_table(df, metric_map), path) for df, path in jobs]
+    if workers is None:
+        workers = min(os.cpu_count() or 1, len(items) // MIN_TABLES_PER_WORKER)
+    if workers <= 1:
+        renderer = TableRenderer(dpi=dpi, fontsize=fontsize)
+        return [renderer.render(text, path) for text, path in items]
+
+    # Lotes contiguos, uno o dos por proceso, para amortizar el arranque
+    size = -(-len(items) // (workers * 2))
+    batches = [items[i:i + size] for i in range(0, len(items), size)]
+    with _main_oculto(), ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                             initargs=(dpi, fontsize)) as pool:
+        return [path for paths in pool.map(_render_batch, batches) for path in paths]
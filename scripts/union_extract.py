@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Extracción en una sola pasada a nivel anuncio (modo 'union').
+
+En vez de dos familias de consultas para las mismas cuentas y días (nivel
+campaña para campaign_1d y nivel anuncio para segunda_tabla) se pide una vez a
+nivel anuncio la unión de los fields de ambas. Cada chunk se aplana a una fila
+por anuncio y día con las columnas de los dos esquemas, y:
+- segunda_tabla sale de las columnas de anuncio (igual que flatten_ad_chunk);
+- campaign_1d sale de agregar los anuncios por (cuenta, día, campaña).
+
+Métricas aditivas: se suman. Ratios: se recalculan desde las sumas
+(ctr = clicks / impresiones, unique_link_clicks_ctr = clicks únicos en links /
+reach, en % como los devuelve Meta). reach NO es aditiva: la suma de la reach
+de los anuncios es una cota superior de la reach de la campaña (una persona
+puede ver varios anuncios). Queda marcada en NON_ADDITIVE y en
+df.attrs['non_additive'] del resultado; unique_link_clicks_ctr hereda la
+aproximación.
+"""
+
+import numpy as np
+import pandas as pd
+
+from flatten_actions import DEFAULT_CAMPAIGN_ACTIONS, flatten_ad_chunk, flatten_campaign_chunk, _numeric
+from record_stream import AD_SCHEMA, CAMPAIGN_SCHEMA
+
+
+CAMPAIGN_FIELDS = [
+    'date_start', 'campaign_id', 'campaign_name', 'spend', 'impressions', 'reach',
+    'video_p25_watched_actions', 'clicks', 'ctr', 'unique_link_clicks_ctr', 'actions',
+]
+AD_FIELDS = [
+    'ad_id', 'campaign_id', 'date_start', 'impressions',
+    'video_play_actions', 'video_play_curve_actions', 'video_p100_watched_actions',
+]
+# unique_inline_link_clicks: numerador de unique_link_clicks_ctr para recalcularlo
+UNION_FIELDS = list(dict.fromkeys(CAMPAIGN_FIELDS + AD_FIELDS + ['unique_inline_link_clicks']))
+
+CAMPAIGN_KEYS = ['account_id', 'date', 'campaign_id']
+AD_ONLY_COLS = [c for c, _ in AD_SCHEMA if c not in ('account', 'campaign_id', 'date_start', 'impressions')]
+
+UNION_SCHEMA = CAMPAIGN_SCHEMA + [('ad_id', 'str'), ('unique_link_clicks', 'i8')] + \
+    [(c, t) for c, t in AD_SCHEMA if c in AD_ONLY_COLS and c != 'ad_id']
+
+# Columnas de campaign_1d que no se pueden sumar entre anuncios -> cómo quedan
+NON_ADDITIVE = {
+    'reach': 'suma de la reach de los anuncios (cota superior)',
+    'unique_link_clicks_ctr': 'clicks únicos sumados / reach sumada (aproximado)',
+}
+RATIOS = {
+    'ctr': ('clicks_all', 'impressions'),
+    'unique_link_clicks_ctr': ('unique_link_clicks', 'reach'),
+}
+
+
+def flatten_union_chunk(labels, rows, action_specs=None) -> pd.DataFrame:
+    """Chunk de filas nivel anuncio con la unión de fields -> una fila por anuncio y día."""
+    camp = flatten_campaign_chunk(labels, rows, action_specs or DEFAULT_CAMPAIGN_ACTIONS)
+    ads = flatten_ad_chunk(labels, rows)
+    camp['ad_id'] = ads['ad_id']
+    camp['unique_link_clicks'] = _numeric([r.get('unique_inline_link_clicks') for r in rows], np.int64)
+    for c in AD_ONLY_COLS:
+        if c != 'ad_id':
+            camp[c] = ads[c].to_numpy()
+    return camp
+
+
+def ads_from_union(df) -> pd.DataFrame:
+    """Filas de anuncio con las columnas de AD_SCHEMA (segunda_tabla)."""
+    out = df.rename(columns={'account_id': 'account', 'date': 'date_start'})
+    return out[[c for c, _ in AD_SCHEMA]].reset_index(drop=True)
+
+
+def campaign_from_ads(df) -> pd.DataFrame:
+    """
+    Agrega las filas de anuncio a (cuenta, día, campaña) con las columnas de
+    CAMPAIGN_SCHEMA (más las de eventos nuevos del mapeo de actions).
+    """
+    schema_cols = [c for c, _ in CAMPAIGN_SCHEMA]
+    extra = [c for c in df.columns if c not in schema_cols and c not in dict(UNION_SCHEMA)]
+    additive = [c for c in schema_cols if c not in CAMPAIGN_KEYS + ['campaign_name'] + list(RATIOS)] + extra
+    sums = additive + ['unique_link_clicks']
+
+    g = df.groupby(CAMPAIGN_KEYS, sort=True, dropna=False)
+    out = g[sums].sum()
+    out['campaign_name'] = g['campaign_name'].last()
+    out = out.reset_index()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for col, (num, den) in RATIOS.items():
+            d = out[den].to_numpy(dtype=float)
+            out[col] = np.where(d > 0, out[num].to_numpy(dtype=float) / d * 100.0, 0.0)
+
+    out = out[schema_cols + extra]
+    out.attrs['non_additive'] = dict(NON_ADDITIVE)
+    return out
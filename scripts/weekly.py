@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Agregación semanal de campaign_1d para el reporte semanal.
+
+Semanas W-MON (terminan el lunes), numeradas dentro de cada mes y etiquetadas
+como '<año>_<mes>_semana<n>'. preparar_weekly_rollup las arma desde el cubo
+semanal de rollups.py, sin pasar por las filas diarias. La versión original
+sobre el diario (apply por fila) queda como referencia en
+benchmarks/weekly_reference.py.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+MES_MAP = {1: 'enero', 2: 'febrero', 3: 'marzo', 4: 'abril', 5: 'mayo', 6: 'junio',
+           7: 'julio', 8: 'agosto', 9: 'septiembre', 10: 'octubre',
+           11: 'noviembre', 12: 'diciembre'}
+
+METRIC_COLS = ['spend', 'messaging_started', 'impressions', 'clicks_all', 'link_clicks']
+
+
+def weekly_metrics(df):
+    """Suma semanal por week_start + CTRs y CPL ponderados."""
+    df_weekly = (
+        df.groupby('week_start', as_index=True)
+          .agg({c: 'sum' for c in METRIC_COLS})
+          .sort_index()
+    )
+
+    # CTR ponderado semanal
+    df_weekly['ctr'] = np.where(
+        df_weekly['impressions'] > 0,
+        df_weekly['clicks_all'] / df_weekly['impressions'],
+        np.nan
+    )
+
+    # Unique link clicks CTR ponderado semanal
+    df_weekly['unique_link_clicks_ctr'] = np.where(
+        df_weekly['impressions'] > 0,
+        df_weekly['link_clicks'] / df_weekly['impressions'],
+        np.nan
+    )
+
+    df_weekly['cpl'] = np.where(
+        df_weekly['messaging_started'] > 0,
+        df_weekly['spend'] / df_weekly['messaging_started'],
+        np.nan
+    )
+    return df_weekly
+
+
+def preparar_weekly_rollup(cube: pd.DataFrame):
+    """
+    Devuelve (df_weekly, map_period) desde el cubo semanal de rollups
+    (week_start, month_start + sumas; cualquier nivel).
+    Las semanas se numeran por orden cronológico dentro de cada mes; sobre datos
+    ordenados por fecha coincide con la versión sobre el diario.
+    """
+    pairs = (
+        cube[['week_start', 'month_start']]
+          .drop_duplicates()
+          .sort_values(['month_start', 'week_start'])
+    )
+    pairs['week_of_month'] = pairs.groupby('month_start').cumcount() + 1
+    pairs['period'] = [
+        f"{m.year}_{MES_MAP[m.month]}_semana{k}"
+        for m, k in zip(pairs['month_start'], pairs['week_of_month'])
+    ]
+    pairs = pairs.sort_values(['week_start', 'month_start'])
+    map_period = pairs.set_index('period')['week_start']
+    inv_map = pairs.drop_duplicates(subset='week_start').set_index('week_start')['period']
+
+    df_weekly = weekly_metrics(cube)
+    df_weekly['period'] = df_weekly.index.map(inv_map)
+    return df_weekly, map_period
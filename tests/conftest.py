@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""Configuración común de los tests: módulos de scripts/ y benchmarks/ importables y reloj falso."""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+
+class FakeClock:
+    """Reloj y sleep falsos: sleep avanza el reloj sin esperar."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        self.slept += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Capa de reintentos (api_retry.py) con una API falsa que falla según un guion
+y un reloj falso: clasificación, back-off, limitador, token inválido, circuit
+breaker, presupuesto y dead letters.
+"""
+
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from api_retry import (AUTH, FATAL, RATE_LIMIT, TOO_LARGE, TRANSIENT, CircuitOpenError, DeadLetters,
+                       RetryPolicy, classify)
+from insights_planner import InsightsPlanner
+from rate_limit import TokenBucket
+
+DAY = date(2026, 1, 1)
+
+
+class FakeRequestError(Exception):
+    """Misma interfaz que FacebookRequestError para clasificar."""
+
+    def __init__(self, code, message="fake error", status=400):
+        super().__init__(f"({code}) {message}")
+        self._code = code
+        self._status = status
+
+    def api_error_code(self):
+        return self._code
+
+    def http_status(self):
+        return self._status
+
+
+class FlakyClient:
+    """get_insights que falla según un guion {(cuenta, since): [códigos]} (un código por intento) o siempre."""
+
+    def __init__(self, script=None, always_fail=()):
+        self.script = {k: list(v) for k, v in (script or {}).items()}
+        self.always_fail = set(always_fail)
+        self.calls = 0
+
+    def get_insights(self, account_id, fields, params):
+        self.calls += 1
+        since = params['time_range']['since']
+        if account_id in self.always_fail:
+            raise FakeRequestError(2, "Service temporarily unavailable")
+        queue = self.script.get((account_id, since))
+        if queue:
+            raise FakeRequestError(queue.pop(0))
+        return [{'date_start': since, 'campaign_id': '1', 'spend': '1.0'}]
+
+
+def window(account, offset, days=1):
+    since = DAY + timedelta(days=offset)
+    return (account, account[-3:], since, since + timedelta(days=days - 1))
+
+
+def policy(clock, **kw):
+    kw.setdefault('rng', random.Random(0))
+    return RetryPolicy(clock=clock, sleep=clock.sleep, **kw)
+
+
+def planner(client, retry=None, limiter=None):
+    return InsightsPlanner(client, ['spend'], {'level': 'campaign'}, retry=retry, limiter=limiter)
+
+
+@pytest.mark.parametrize("error, kind", [
+    (FakeRequestError(17), RATE_LIMIT),
+    (FakeRequestError(80004), RATE_LIMIT),
+    (FakeRequestError(2), TRANSIENT),
+    (FakeRequestError(1), TRANSIENT),
+    (FakeRequestError(190), AUTH),
+    (FakeRequestError(100), FATAL),
+    (FakeRequestError(1, "Please reduce the amount of data you're asking for"), TOO_LARGE),
+    (FakeRequestError(None, status=503), TRANSIENT),
+    (ConnectionError("reset"), TRANSIENT),
+])
+def test_classify(error, kind):
+    assert classify(error) == kind
+
+
+def test_transient_errors_back_off_and_recover(clock):
+    retry = policy(clock, base_s=2.0)
+    client = FlakyClient({('act_1', DAY.isoformat()): [2, 1]})
+    assert planner(client, retry).fetch_range('act_1', DAY, DAY)
+    assert client.calls == 3 and retry.retries == {TRANSIENT: 2}
+    assert 1.0 + 2.0 <= clock.slept <= 2.0 + 4.0  # exponencial con jitter
+
+
+def test_rate_limit_waits_and_slows_shared_limiter(clock):
+    limiter = TokenBucket(rate=100, capacity=100, clock=clock, sleep=clock.sleep)
+    retry = policy(clock, rate_limit_base_s=60.0, limiter=limiter)
+    client = FlakyClient({('act_1', DAY.isoformat()): [17]})
+    planner(client, retry, limiter).fetch_range('act_1', DAY, DAY)
+    assert 30.0 <= clock.slept <= 60.0 and limiter.current_rate < limiter.rate
+
+
+def test_invalid_token_is_not_retried(clock):
+    client = FlakyClient({('act_1', DAY.isoformat()): [190]})
+    with pytest.raises(FakeRequestError) as e:
+        planner(client, policy(clock)).fetch_range('act_1', DAY, DAY)
+    assert classify(e.value) == AUTH and client.calls == 1 and clock.slept == 0
+
+
+def test_circuit_breaker_isolates_failing_account(clock):
+    retry = policy(clock, max_attempts=2, breaker_failures=3, breaker_cooldown_s=600, budget=None)
+    client = FlakyClient(always_fail={'act_bad'})
+    p = planner(client, retry)
+    errors = []
+    for i in range(6):
+        for acc in ('act_bad', 'act_ok'):
+            try:
+                p.fetch_range(acc, *window(acc, i)[2:])
+            except Exception as e:
+                errors.append((acc, type(e)))
+    assert client.calls == 3 * 2 + 6  # 3 ventanas x 2 intentos + las 6 de act_ok
+    assert [e for e in errors if e[0] == 'act_ok'] == []
+    assert sum(1 for e in errors if e[1] is CircuitOpenError) == 3
+    # Tras el enfriamiento se deja pasar una llamada (medio abierto)
+    clock.now += 601
+    client.always_fail.clear()
+    assert p.fetch_range('act_bad', DAY, DAY)
+
+
+def test_retry_budget_caps_retries_per_run(clock):
+    retry = policy(clock, budget=3, breaker_failures=100)
+    client = FlakyClient(always_fail={'act_bad'})
+    for i in range(5):
+        with pytest.raises(FakeRequestError):
+            planner(client, retry).fetch_range('act_bad', *window('act_bad', i)[2:])
+    assert sum(retry.retries.values()) == 3 and client.calls == 5 + 3
+
+
+def test_dead_letters_go_first_without_duplicating_plan(tmp_path):
+    path = str(tmp_path / "_dead_letters.json")
+    dl = DeadLetters(path)
+    dl.add('campaign', window('act_1', 2), FakeRequestError(2))
+    dl.add('campaign', window('act_2', 0), FakeRequestError(17))
+    dl = DeadLetters(path)  # corrida siguiente
+    merged = dl.merge_plan('campaign', [window('act_1', 0, days=5)], account_map={'act_1': 'x'})
+    assert merged[0] == window('act_1', 2)
+    assert merged[1:] == [window('act_1', 0, days=2), window('act_1', 3, days=2)]
+    assert dl.resolve('campaign', window('act_1', 2)) and not dl.resolve('campaign', window('act_1', 2))
+    assert len(DeadLetters(path).entries) == 1
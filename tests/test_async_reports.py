@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+AsyncReportRunner contra la API sintética con jobs que siguen un guion por
+ventana y un reloj falso (la duración de los jobs avanza el reloj sin esperas).
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from async_reports import JOB_COMPLETED, JOB_FAILED, AsyncReportError, AsyncReportRunner
+from flatten_actions import flatten_ad_chunk
+from insights_planner import InsightsPlanner
+from record_stream import AD_SCHEMA, RowChunker
+from synthetic_meta import SyntheticMeta
+
+DAY = date(2026, 1, 1)
+FIELDS = ['ad_id', 'campaign_id', 'impressions', 'video_play_actions']
+PARAMS = {'level': 'ad', 'time_increment': 1}
+
+
+class ScriptedJobs(SyntheticMeta):
+    """
+    SyntheticMeta con jobs que siguen un guion {(cuenta, since): [estado por envío]}:
+    JOB_FAILED falla al primer sondeo, 'never' no termina nunca, 'broken' termina
+    pero su cursor falla después de la primera página y JOB_COMPLETED (o sin
+    guion) termina después de job_latency_s.
+    """
+
+    def __init__(self, script=None, **kw):
+        super().__init__(**kw)
+        self.script = {k: list(v) for k, v in (script or {}).items()}
+        self.submitted = []
+        self.max_running = 0
+        self._running = set()
+
+    def submit(self, account_id, fields, params):
+        job = super().submit(account_id, fields, params)
+        key = (account_id, params['time_range']['since'])
+        queue = self.script.get(key)
+        job['outcome'] = queue.pop(0) if queue else JOB_COMPLETED
+        job['id'] = len(self.submitted)
+        self.submitted.append(key)
+        self._running.add(job['id'])
+        self.max_running = max(self.max_running, len(self._running))
+        return job
+
+    def status(self, job):
+        if job['outcome'] == JOB_FAILED:
+            self._running.discard(job['id'])
+            return JOB_FAILED, 0
+        if job['outcome'] == 'never':
+            return "Job Running", 50
+        status = super().status(job)
+        if status[0] == JOB_COMPLETED:
+            self._running.discard(job['id'])
+        return status
+
+    def results(self, job, page_size=500):
+        if job['outcome'] != 'broken':
+            return super().results(job, page_size)
+        cursor = super().results(job, page_size=2)
+
+        def broken():
+            for i, row in enumerate(cursor):
+                if i == 2:
+                    raise ConnectionError("página perdida")
+                yield row
+        return broken()
+
+
+def jobs(clock, script=None, **kw):
+    kw.setdefault('campaigns', 2)
+    kw.setdefault('ads', 1)
+    script = {(w[0], w[2].isoformat()): outcomes for w, outcomes in (script or {}).items()}
+    return ScriptedJobs(script=script, clock=clock, sleep=clock.sleep, **kw)
+
+
+def window(account, offset, days=1):
+    since = DAY + timedelta(days=offset)
+    return (account, account[-3:], since, since + timedelta(days=days - 1))
+
+
+def runner(client, clock, **kw):
+    kw.setdefault('poll_interval', 5.0)
+    return AsyncReportRunner(client, FIELDS, PARAMS, clock=clock, sleep=clock.sleep, **kw)
+
+
+def collect(results):
+    """Consume el generador (el cursor de cada ventana antes de pedir la siguiente)."""
+    return [(w, list(rows), error) for w, rows, error in results]
+
+
+STUCK = window('act_1', 0)
+
+
+def test_completed_jobs_match_sync_rows_within_max_in_flight(clock):
+    client = jobs(clock, campaigns=3, ads=2, job_latency_s=30)
+    windows = [window('act_1', i * 7, days=7) for i in range(5)]
+    out = collect(runner(client, clock, max_in_flight=2).run(windows))
+    assert [w for w, _, _ in out] == windows and all(e is None for _, _, e in out)
+    for w, rows, _ in out:
+        assert rows == client.rows(w[0], w[2], w[3], 'ad', FIELDS)
+    assert client.max_running == 2 and len(client.submitted) == 5
+    assert 3 * 30 <= clock.now <= 3 * 30 + 3 * 5  # 3 tandas de jobs, sondeo cada 5 s
+
+
+def test_failed_job_is_resubmitted_alone(clock):
+    bad = window('act_1', 7)
+    client = jobs(clock, {bad: [JOB_FAILED]})
+    windows = [window('act_1', 0), bad, window('act_2', 0)]
+    out = collect(runner(client, clock, max_attempts=3).run(windows))
+    # Las demás ventanas no esperan por la reenviada
+    assert [w for w, _, _ in out] == [windows[0], windows[2], bad]
+    assert all(e is None and rows for _, rows, e in out)
+    assert client.submitted.count((bad[0], bad[2].isoformat())) == 2 and len(client.submitted) == 4
+
+
+def test_job_past_timeout_ends_as_error(clock):
+    client = jobs(clock, {STUCK: ['never', 'never']})
+    out = collect(runner(client, clock, max_attempts=2, timeout=60).run([STUCK, window('act_2', 0)]))
+    assert out[0][0] == window('act_2', 0) and out[0][2] is None
+    assert out[1][0] == STUCK and out[1][1] == [] and isinstance(out[1][2], AsyncReportError)
+    assert len(client.submitted) == 3 and clock.now >= 2 * 60
+
+
+def test_sync_fallback_after_attempts(clock):
+    client = jobs(clock, {STUCK: ['never', JOB_FAILED]})
+    planner = InsightsPlanner(client, FIELDS, PARAMS)
+    r = runner(client, clock, max_attempts=2, timeout=60, fallback=planner.fetch_range)
+    out = collect(r.run([STUCK]))
+    assert out == [(STUCK, client.rows(STUCK[0], STUCK[2], STUCK[3], 'ad', FIELDS), None)]
+    assert r.fallbacks == 1 and planner.requests_made == 1
+
+
+def test_failing_fallback_error_reaches_the_run(clock):
+    client = jobs(clock, {STUCK: [JOB_FAILED]})
+
+    def broken(*_):
+        raise ConnectionError("sin red")
+
+    out = collect(runner(client, clock, max_attempts=1, fallback=broken).run([STUCK]))
+    assert out[0][1] == [] and isinstance(out[0][2], ConnectionError)
+
+
+@pytest.mark.parametrize("script, fallbacks", [(['broken'], 0), (['broken', 'broken'], 1)])
+def test_cursor_failing_mid_read_is_retried(clock, script, fallbacks):
+    # Como en a01.py: se descarta lo leído de la ventana y el job se reenvía;
+    # agotados los intentos, fallback síncrono
+    client = jobs(clock, {STUCK: script}, campaigns=3, ads=2)
+    planner = InsightsPlanner(client, FIELDS, PARAMS)
+    r = runner(client, clock, max_attempts=2, fallback=planner.fetch_range)
+    windows = [window('act_2', 0), STUCK]
+    chunker = RowChunker(flatten_ad_chunk, AD_SCHEMA, chunk_size=1)
+    errors = []
+    for w, rows, error in r.run(windows):
+        antes = len(chunker)
+        try:
+            chunker.extend(rows, w[1])
+        except ConnectionError as e:
+            chunker.truncate(antes)
+            r.read_failed(w, e)
+            continue
+        errors.append(error)
+    expected = [len(client.rows(w[0], w[2], w[3], 'ad', FIELDS)) for w in windows]
+    assert errors == [None, None] and len(chunker) == len(chunker.to_frame()) == sum(expected)
+    assert r.fallbacks == fallbacks and len(client.submitted) == 3
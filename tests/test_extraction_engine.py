@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""run_windows con hilos reales: errores aislados por ventana, max_workers y orden en secuencial."""
+
+import threading
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from extraction_engine import build_windows, run_windows
+
+DAY = date(2026, 1, 1)
+
+
+@pytest.fixture
+def windows():
+    return build_windows({'act_1': 'a', 'act_2': 'b', 'act_3': 'c'},
+                         [(DAY + timedelta(days=i), DAY + timedelta(days=i)) for i in range(4)])
+
+
+def make_fetch(windows, failing):
+    """fetch falso que falla en las ventanas de failing; las primeras tardan más."""
+    delay = {(w[0], w[2]): 0.002 * (len(windows) - i) for i, w in enumerate(windows)}
+    lock = threading.Lock()
+    running = [0, 0]  # en curso, máximo
+
+    def fetch(account_id, since, until):
+        with lock:
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+        try:
+            time.sleep(delay[(account_id, since)])
+            if any(w[0] == account_id and w[2] == since for w in failing):
+                raise ConnectionError(f"falla {account_id} {since}")
+            return [{'account_id': account_id, 'date_start': since.isoformat()}]
+        finally:
+            with lock:
+                running[0] -= 1
+
+    return fetch, running
+
+
+def test_failures_stay_with_their_window(windows):
+    failing = {windows[1], windows[6]}
+    fetch, running = make_fetch(windows, failing)
+    out = list(run_windows(fetch, windows, max_workers=3))
+    assert sorted(w for w, _, _ in out) == sorted(windows)  # todas, una vez cada una
+    assert running[1] <= 3
+    for w, rows, error in out:
+        if w in failing:
+            assert rows == [] and isinstance(error, ConnectionError) and str(w[2]) in str(error)
+        else:
+            assert error is None and rows == [{'account_id': w[0], 'date_start': w[2].isoformat()}]
+
+
+def test_sequential_keeps_plan_order(windows):
+    failing = {windows[1], windows[6]}
+    fetch, _ = make_fetch(windows, failing)
+    out = list(run_windows(fetch, windows, max_workers=1))
+    assert [w for w, _, _ in out] == windows
+    assert [w for w, _, e in out if e is not None] == [w for w in windows if w in failing]
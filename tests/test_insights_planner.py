@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""InsightsPlanner contra la API sintética: rangos contiguos, mismas filas que por día y partición."""
+
+import random
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from api_retry import RetryPolicy
+from flatten_actions import flatten_campaign_chunk
+from insights_planner import InsightsPlanner, contiguous_ranges
+from record_stream import CAMPAIGN_SCHEMA, chunk_rows
+from response_cache import ResponseCache
+from synthetic_meta import SyntheticMeta
+
+DAY = date(2026, 1, 1)
+FIELDS = ['campaign_id', 'spend']
+PARAMS = {'level': 'campaign', 'time_increment': 1}
+DAYS = [DAY + timedelta(days=i) for i in (0, 1, 2, 5, 6, 9)]
+
+
+def test_contiguous_ranges_with_gaps_and_duplicates():
+    d = DAYS
+    assert contiguous_ranges(d + d[:2]) == [(d[0], d[2]), (d[3], d[4]), (d[5], d[5])]
+    assert contiguous_ranges(d[:3], max_days=2) == [(d[0], d[1]), (d[2], d[2])]
+    assert contiguous_ranges([]) == []
+
+
+def test_one_request_per_range_same_rows_as_daily():
+    planner = InsightsPlanner(SyntheticMeta(campaigns=4, ads=1), FIELDS, PARAMS)
+    ranged = [r for _, _, rows in planner.fetch('act_1', DAYS) for r in rows]
+    assert planner.requests_made == 3
+    daily = [r for day in DAYS for r in planner.fetch_range('act_1', day, day)]
+    assert ranged == daily
+
+
+def test_too_large_response_is_split_in_halves():
+    client = SyntheticMeta(campaigns=4, ads=1, active_share=1.0, max_rows=4 * 4)
+    planner = InsightsPlanner(client, FIELDS, PARAMS)
+    rows = planner.fetch_range('act_1', DAY, DAY + timedelta(days=9))
+    assert len(rows) == 4 * 10
+    assert [r['date_start'] for r in rows] == sorted(r['date_start'] for r in rows)
+    # Entran 4 días por respuesta: 10 -> 5 + 5 (rechazados) -> 3 + 2 + 3 + 2
+    assert planner.requests_made == 1 + 2 + 4
+
+
+def consume(account_id, rows):
+    return chunk_rows(rows, 'tla', flatten_campaign_chunk, CAMPAIGN_SCHEMA, chunk_size=7)
+
+
+def test_consume_flattens_pages_including_split_halves():
+    client = SyntheticMeta(campaigns=4, ads=1, active_share=1.0, max_rows=4 * 4, page_size=3)
+    planner = InsightsPlanner(client, FIELDS, PARAMS)
+    until = DAY + timedelta(days=9)
+    chunks = planner.fetch_range('act_1', DAY, until, consume)
+    assert all(isinstance(c, pd.DataFrame) and len(c) <= 7 for c in chunks)
+    rows = planner.fetch_range('act_1', DAY, until)
+    expected = flatten_campaign_chunk(['tla'] * len(rows), rows)
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), expected)
+
+
+class BrokenPage(Exception):
+    def api_error_code(self):
+        return 2  # transitorio
+
+
+class BreaksOnce(SyntheticMeta):
+    """El primer cursor se corta después de la primera página."""
+
+    broken = False
+
+    def get_insights(self, account_id, fields, params):
+        cursor = super().get_insights(account_id, fields, params)
+        if self.broken:
+            return cursor
+        self.broken = True
+
+        def pages():
+            yield from list(cursor)[:self.page_size]
+            raise BrokenPage("conexión cortada")
+        return pages()
+
+
+def test_read_failure_retries_without_duplicates_or_cache_entry(tmp_path, clock):
+    client = BreaksOnce(campaigns=4, ads=1, active_share=1.0, page_size=3)
+    cache = ResponseCache(str(tmp_path), today=lambda: DAY + timedelta(days=30), clock=clock)
+    retry = RetryPolicy(clock=clock, sleep=clock.sleep, rng=random.Random(0))
+    planner = InsightsPlanner(client, FIELDS, PARAMS, cache=cache, retry=retry)
+    until = DAY + timedelta(days=2)
+    chunks = planner.fetch_range('act_1', DAY, until, consume)
+    assert planner.requests_made == 2 and sum(len(c) for c in chunks) == 4 * 3
+    assert cache.stored == 1 and not list(tmp_path.rglob('*.tmp'))
+
+    # Acierto del cache: las mismas filas, sin request
+    again = planner.fetch_range('act_1', DAY, until, consume)
+    assert planner.requests_made == 2 and cache.hits == 1
+    pd.testing.assert_frame_equal(pd.concat(again, ignore_index=True), pd.concat(chunks, ignore_index=True))
+
+
+def test_failed_read_without_retry_raises(tmp_path, clock):
+    client = BreaksOnce(campaigns=4, ads=1, active_share=1.0, page_size=3)
+    cache = ResponseCache(str(tmp_path), clock=clock)
+    planner = InsightsPlanner(client, FIELDS, PARAMS, cache=cache)
+    with pytest.raises(BrokenPage):
+        planner.fetch_range('act_1', DAY, DAY + timedelta(days=2), consume)
+    assert cache.stored == 0 and not [p for p in tmp_path.rglob('*') if p.is_file()]
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""TokenBucket con reloj falso: ráfaga, recarga, baja de tasa, pausa y headers de uso de Meta."""
+
+import json
+from datetime import date
+
+import pytest
+
+from insights_planner import InsightsPlanner
+from rate_limit import TokenBucket, parse_usage_headers
+from synthetic_meta import SyntheticMeta
+
+DAY = date(2026, 1, 1)
+
+
+def bucket(clock, **kw):
+    return TokenBucket(clock=clock, sleep=clock.sleep, **kw)
+
+
+def test_burst_then_one_token_per_interval(clock):
+    tb = bucket(clock, rate=2.0, capacity=3)
+    assert [tb.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert tb.acquire() == pytest.approx(0.5)
+    assert tb.acquire() == pytest.approx(0.5)
+    assert clock.now == pytest.approx(1.0)
+
+
+def test_refill_is_capped_at_capacity(clock):
+    tb = bucket(clock, rate=2.0, capacity=3)
+    for _ in range(5):
+        tb.acquire()
+    clock.now += 100
+    assert [tb.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert tb.acquire() == pytest.approx(0.5)
+    assert tb.total_wait == pytest.approx(1.5)
+
+
+def test_rate_drops_linearly_over_slow_pct(clock):
+    tb = bucket(clock, rate=1.0, capacity=1, slow_pct=50, pause_pct=90)
+    tb.observe_usage(40)
+    assert tb.current_rate == 1.0
+    tb.observe_usage(75)
+    assert tb.current_rate == pytest.approx(0.5)
+    tb.acquire()
+    assert tb.acquire() == pytest.approx(2.0)  # un token cada 1 / 0.5 s
+    tb.observe_usage(89.9)
+    assert tb.current_rate == pytest.approx((100 - 89.9) / 50)
+    tb.observe_usage(20)
+    assert tb.current_rate == 1.0
+
+
+def test_pause_over_pause_pct_or_regain_time(clock):
+    tb = bucket(clock, rate=1.0, capacity=4, pause_pct=90, pause_s=60)
+    tb.observe_usage(95)
+    assert tb.acquire() == pytest.approx(60.0)
+    # Tiempo de recuperación informado: pausa aunque el % sea bajo
+    tb.observe_usage(10, regain_s=300)
+    assert tb.acquire() == pytest.approx(300.0)
+
+
+@pytest.mark.parametrize("headers, expected", [
+    # Business use case (JSON, minutos de recuperación)
+    ({'X-Business-Use-Case-Usage': json.dumps({'123': [{
+        'type': 'ads_insights', 'call_count': 28, 'total_cputime': 61, 'total_time': 40,
+        'estimated_time_to_regain_access': 2}]})}, (61.0, 120.0)),
+    ({'x-ad-account-usage': {'acc_id_util_pct': 9.5, 'reset_time_duration': 0}}, (9.5, 0.0)),
+    ({'x-ad-account-usage': 'no es json'}, (0.0, 0.0)),
+    (None, (0.0, 0.0)),
+])
+def test_parse_usage_headers(headers, expected):
+    assert parse_usage_headers(headers) == expected
+
+
+def test_planner_feeds_usage_headers_to_limiter(clock):
+    tb = bucket(clock, rate=1.0, capacity=2, slow_pct=50, pause_pct=90, pause_s=60)
+    client = SyntheticMeta(campaigns=2, ads=1, usage_pct=80.0, clock=clock, sleep=clock.sleep)
+    planner = InsightsPlanner(client, ['spend'], {'level': 'campaign'}, limiter=tb)
+    planner.fetch_range('act_1', DAY, DAY)
+    assert tb.last_usage_pct == 80.0
+    assert tb.current_rate == pytest.approx(0.4)
+    client.usage_pct = 95.0
+    planner.fetch_range('act_1', DAY, DAY)
+    t0 = clock.now
+    planner.fetch_range('act_1', DAY, DAY)
+    assert clock.now - t0 >= 60.0  # pausa por uso alto antes del siguiente request
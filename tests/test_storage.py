@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""upsert_csv y DatasetStore.upsert con filas de actions sintéticas."""
+
+import json
+
+import pandas as pd
+
+from flatten_actions import DEFAULT_CAMPAIGN_ACTIONS, flatten_campaign_chunk, load_action_mapping
+from storage import DatasetStore, upsert_csv
+from synthetic_payloads import synthetic_campaign_rows
+
+KEYS = ['account_id', 'date', 'campaign_id']
+
+
+def test_new_mapping_column_is_added_empty_for_history(tmp_path):
+    """Mapeo con un evento más: upsert sobre un CSV y un store con el esquema anterior."""
+    rows = list(synthetic_campaign_rows(200))
+    for r in rows[100:]:
+        r['actions'].append({'action_type': 'lead', 'value': '3'})
+    mapping_path = tmp_path / "action_mapping.json"
+    mapping_path.write_text(json.dumps(DEFAULT_CAMPAIGN_ACTIONS + [
+        {'column': 'leads', 'field': 'actions', 'action_types': ['lead'], 'agg': 'sum'}]), encoding='utf-8')
+    mapping = load_action_mapping(str(mapping_path))
+
+    before = flatten_campaign_chunk(['tla'] * 100, rows[:100])
+    after = flatten_campaign_chunk(['tla'] * 100, rows[100:], mapping)
+    # Una fila del histórico se re-extrae con el mapeo nuevo
+    after = pd.concat([after, flatten_campaign_chunk(['tla'], rows[:1], mapping)], ignore_index=True)
+    for frame in (before, after):
+        frame['date'] = pd.to_datetime(frame['date']).dt.date
+    assert 'leads' not in before.columns and 'leads' in after.columns
+    expected = pd.concat([before, after]).drop_duplicates(subset=KEYS).shape[0]
+
+    csv_path = str(tmp_path / "campaign_1d")
+    upsert_csv(csv_path, before, KEYS)
+    stats = upsert_csv(csv_path, after, KEYS)
+    assert stats['added_columns'] == ['leads'] and stats['updated'] == 1
+    out = pd.read_csv(csv_path, encoding='utf-8-sig')
+    assert list(out.columns) == list(before.columns) + ['leads'] and len(out) == expected
+    assert out['leads'].isna().sum() == len(out) - 101 and (out['leads'].dropna() == 3).sum() == 100
+    # Siguiente corrida con el esquema ya ampliado: sin columnas nuevas
+    assert not upsert_csv(csv_path, after.tail(5), KEYS)['added_columns']
+
+    store = DatasetStore(str(tmp_path / "store"), 'account_id', 'date', keys=KEYS,
+                         text_cols=['campaign_id', 'campaign_name'])
+    store.write(before)
+    store.upsert(after)
+    out = store.read()
+    assert 'leads' in out.columns and len(out) == expected
+    assert out['leads'].notna().sum() == 101
+
+
+def days_frame(days, spend):
+    return pd.DataFrame([
+        {'date': pd.Timestamp('2024-01-01') + pd.Timedelta(days=d), 'campaign_id': str(c), 'name': f'c{c}', 'spend': spend}
+        for d in days for c in range(3)
+    ])
+
+
+class CsvReference:
+    """upsert_csv contra el resultado de concat + drop_duplicates leyendo todo."""
+
+    def __init__(self, path):
+        self.path = path
+        self.expected = pd.DataFrame()
+
+    def upsert(self, df):
+        stats = upsert_csv(self.path, df, ['date', 'campaign_id'])
+        new = df.assign(date=df['date'].dt.strftime('%Y-%m-%d')).astype(str)
+        self.expected = pd.concat([self.expected, new]).drop_duplicates(['date', 'campaign_id'], keep='last')
+        got = pd.read_csv(self.path, encoding='utf-8-sig', dtype=str, keep_default_na=False)
+        order = lambda d: d.sort_values(['date', 'campaign_id']).reset_index(drop=True)
+        pd.testing.assert_frame_equal(order(got), order(self.expected.fillna(''))[got.columns])
+        return stats
+
+
+def test_upsert_csv_appends_and_rewrites_only_the_tail(tmp_path):
+    ref = CsvReference(str(tmp_path / "campaign_1d"))
+    ref.upsert(days_frame(range(10), 1))
+    assert not (tmp_path / "campaign_1d.key_index.npz").exists()  # se arma en el siguiente upsert
+    stats = ref.upsert(days_frame(range(10, 15), 2))
+    assert stats['inserted'] == 15 and stats['tail_rows'] == 0 and not stats['rewritten']
+    # Re-extracción de los últimos días: solo la cola desde la primera fila pisada
+    stats = ref.upsert(days_frame(range(12, 18), 3))
+    assert stats['updated'] == 9 and stats['inserted'] == 9 and stats['tail_rows'] == 0
+    stats = ref.upsert(days_frame([2, 20], 4))
+    assert stats['updated'] == 3 and stats['tail_rows'] == 3 * 15 and not stats['rewritten']
+
+
+def test_upsert_csv_rebuilds_stale_index_and_handles_multiline_fields(tmp_path):
+    path = tmp_path / "campaign_1d"
+    ref = CsvReference(str(path))
+    ref.upsert(days_frame(range(5), 1))
+    ref.upsert(days_frame(range(5, 7), 1))
+    # Edición externa con un campo de varias líneas: el índice no coincide y se rearma sin offsets
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('2024-03-01,9,"varias\nlíneas",5\n')
+    ref.expected = pd.concat([ref.expected, pd.DataFrame([
+        {'date': '2024-03-01', 'campaign_id': '9', 'name': 'varias\nlíneas', 'spend': '5'}])])
+    assert not ref.upsert(days_frame([8], 2))['rewritten']
+    # Pisar filas sin offsets: reescritura completa
+    assert ref.upsert(days_frame([6, 9], 3))['rewritten']
+
+
+def test_upsert_csv_restores_interrupted_tail_rewrite(tmp_path, capsys):
+    path = tmp_path / "campaign_1d"
+    ref = CsvReference(str(path))
+    ref.upsert(days_frame(range(5), 1))
+    ref.upsert(days_frame(range(5, 7), 1))
+    # Corte a mitad de _rewrite_tail: quedó el journal con la cola original y basura en el CSV
+    data = path.read_bytes()
+    offset = len(data) - 20
+    (tmp_path / "campaign_1d.tail").write_bytes(b"%d\n" % offset + data[offset:])
+    with open(path, 'r+b') as f:
+        f.truncate(offset)
+        f.seek(offset)
+        f.write(b'basura')
+    ref.upsert(days_frame([7], 2))
+    assert "restaurado" in capsys.readouterr().out
+    assert not (tmp_path / "campaign_1d.tail").exists()
+
+
+def test_upsert_csv_new_column_rewrites_file(tmp_path):
+    ref = CsvReference(str(tmp_path / "campaign_1d"))
+    ref.upsert(days_frame(range(3), 1))
+    stats = ref.upsert(days_frame([2, 3], 2).assign(extra='x'))
+    assert stats['added_columns'] == ['extra'] and stats['rewritten']
+    stats = ref.upsert(days_frame([3, 4], 3).assign(extra='y'))
+    assert not stats['added_columns'] and not stats['rewritten']